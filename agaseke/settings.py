@@ -71,6 +71,7 @@ INSTALLED_APPS = [
     'authentication',
     'products',
     'posts',
+    'notifications',
 ]
 
 MIDDLEWARE = [
@@ -191,6 +192,45 @@ DEFAULT_FROM_EMAIL = 'Agaseke <noreply@agaseke.com>'
 # QR Code Settings
 QR_CODE_UPDATE_INTERVAL = 600  # 10 minutes in seconds
 
+# Notification Settings
+# How queued notifications (notifications/outbox.py) are delivered:
+#   'thread'   - a background thread in each web process, woken after every commit
+#   'inline'   - right after the request's transaction commits (development/tests)
+#   'external' - only by `python manage.py dispatch_notifications`
+NOTIFICATION_DISPATCH_MODE = 'thread'
+NOTIFICATION_DISPATCH_BATCH_SIZE = 100  # outbox rows delivered per bulk insert
+NOTIFICATION_DISPATCH_INTERVAL = 5  # seconds between outbox polls in 'thread' mode
+NOTIFICATION_CLAIM_TIMEOUT = 300  # seconds before a dispatcher's unfinished batch is retried
+NOTIFICATION_MAX_ATTEMPTS = 5  # failed deliveries before an outbox row is given up on
+NOTIFICATION_PREFERENCES_CACHE_TTL = 300  # seconds a worker trusts its cached preferences
+
+# Real-time stream (/notifications/stream, needs the ASGI application in agaseke/asgi.py)
+# 'notifications.broker.LocalBroker' only reaches streams in the same process;
+# use 'notifications.broker.DatabaseBroker' when running several workers
+NOTIFICATION_BROKER = 'notifications.broker.LocalBroker'
+NOTIFICATION_BROKER_POLL_INTERVAL = 2  # seconds, DatabaseBroker only
+NOTIFICATION_STREAM_HEARTBEAT = 15  # seconds between keep-alive comments
+NOTIFICATION_STREAM_TIMEOUT = 1800  # seconds before a stream is closed and the client reconnects
+NOTIFICATION_STREAM_MAX_REPLAY = 1000  # missed notifications replayed on reconnect before sending a gap event
+
+# Retention (`python manage.py purge_notifications`, run daily from cron)
+NOTIFICATION_RETENTION_DAYS = 90  # seen notifications older than this are archived and deleted
+NOTIFICATION_UNSEEN_RETENTION_DAYS = None  # same for unseen ones; None keeps them forever
+NOTIFICATION_OUTBOX_RETENTION_DAYS = 7  # delivered outbox rows are deleted after this
+NOTIFICATION_ARCHIVE_DIR = os.path.join(BASE_DIR, 'archive', 'notifications')
+
+# Sales statistics
+SALES_TREND_CACHE_TTL = 300  # seconds a computed /v1/sales-trend/ series is reused
+
+# PDF report exports (authentication/reports.py)
+# 'process' renders in a pool of REPORT_WORKERS processes; 'inline' renders in the request
+REPORT_RENDER_MODE = 'process'
+REPORT_WORKERS = 2
+REPORT_JOB_TIMEOUT = 600  # seconds before a pending report is assumed lost and queued again
+
+# Cart badge summaries (products/cart_cache.py)
+CART_SUMMARY_CACHE_TTL = 600  # seconds a summary is reused; dropped earlier when the cart or its products change
+
 # REST Framework removed - only keeping rest_framework for authtoken (used in v1 API)
 
 # JWT Settings for API Authentication
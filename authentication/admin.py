@@ -1,6 +1,22 @@
 from django.contrib import admin
-from .models import UserQRCode, OTPVerification
+from .models import UserQRCode, OTPVerification, ReportJob, VendorStatement
 
 # Register authentication app models only
 admin.site.register(UserQRCode)
 admin.site.register(OTPVerification)
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ('report_type', 'user', 'status', 'created_at', 'finished_at')
+    list_filter = ('status', 'report_type')
+    search_fields = ('user__username',)
+    readonly_fields = ('id', 'version', 'created_at', 'finished_at')
+
+
+@admin.register(VendorStatement)
+class VendorStatementAdmin(admin.ModelAdmin):
+    list_display = ('vendor', 'month', 'sales_count', 'revenue', 'generated_at')
+    list_filter = ('month',)
+    search_fields = ('vendor__username',)
+    readonly_fields = ('generated_at',)
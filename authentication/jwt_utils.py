@@ -51,6 +51,28 @@ def refresh_access_token(refresh_token):
         raise InvalidToken(f"Invalid refresh token: {str(e)}")
 
 
+def get_user_id_from_token(token):
+    """
+    Get the user ID from a JWT access token without loading the user
+    
+    Args:
+        token: JWT access token string
+        
+    Returns:
+        int: User ID or None if the token is invalid, expired or not an
+        access token (refresh tokens are rejected)
+    """
+    from rest_framework_simplejwt.settings import api_settings
+    from rest_framework_simplejwt.tokens import AccessToken
+    
+    try:
+        access = AccessToken(token)
+        # simplejwt may encode the claim as a string
+        return int(access[api_settings.USER_ID_CLAIM])
+    except (TokenError, KeyError, TypeError, ValueError):
+        return None
+
+
 def get_user_from_token(token):
     """
     Get user from JWT access token
@@ -0,0 +1,188 @@
+"""
+Find and remove media files that no model references any more.
+
+Every FileField/ImageField in the project is discovered through the app
+registry. For each upload directory, the filesystem is streamed in batches,
+and each batch is checked against the database with one `__in` query per
+field that writes to that directory. Memory stays bounded by --batch-size no
+matter how many files or rows exist.
+
+Usage:
+    python manage.py cleanup_orphaned_media --dry-run
+    python manage.py cleanup_orphaned_media --quarantine /var/backups/agaseke-orphans
+    python manage.py cleanup_orphaned_media --dir qr_codes --min-age 120
+"""
+import os
+import shutil
+import time
+from collections import defaultdict
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+
+
+class Command(BaseCommand):
+    help = 'Delete or quarantine media files that are not referenced by any FileField/ImageField'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report orphaned files, do not touch them',
+        )
+        parser.add_argument(
+            '--quarantine',
+            metavar='PATH',
+            help='Move orphans under PATH (keeping their relative path) instead of deleting them',
+        )
+        parser.add_argument(
+            '--dir',
+            action='append',
+            dest='dirs',
+            metavar='UPLOAD_DIR',
+            help='Only scan this upload directory (e.g. qr_codes). Can be repeated.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of files checked against the database per query (default: 500)',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60,
+            help='Skip files modified less than this many minutes ago, so uploads '
+                 'whose rows are not committed yet are never removed (default: 60)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        self.verbosity = options['verbosity']
+        dry_run = options['dry_run']
+        quarantine = options['quarantine']
+        cutoff = time.time() - options['min_age'] * 60
+
+        targets = self.collect_upload_dirs()
+        if options['dirs']:
+            wanted = {d.strip('/') for d in options['dirs']}
+            unknown = wanted - {upload_dir for _, upload_dir in targets}
+            if unknown:
+                raise CommandError(f"No file field uploads to: {', '.join(sorted(unknown))}")
+            targets = {key: fields for key, fields in targets.items() if key[1] in wanted}
+
+        total_scanned = total_orphans = total_bytes = 0
+        for (storage, upload_dir), fields in sorted(targets.items(), key=lambda item: item[0][1]):
+            scanned = orphans = reclaimed = 0
+            for batch in self.iter_batches(storage, upload_dir, cutoff, batch_size):
+                scanned += len(batch)
+                for name in sorted(self.find_orphans(batch, fields)):
+                    path = storage.path(name)
+                    try:
+                        size = os.path.getsize(path)
+                    except OSError:
+                        continue  # Removed by someone else in the meantime
+                    orphans += 1
+                    reclaimed += size
+                    self.handle_orphan(storage, name, path, dry_run, quarantine)
+
+            total_scanned += scanned
+            total_orphans += orphans
+            total_bytes += reclaimed
+            self.stdout.write(
+                f'{upload_dir}/: {scanned} file(s) scanned, {orphans} orphaned ({self.format_size(reclaimed)})'
+            )
+
+        if dry_run:
+            action = 'would be removed'
+        elif quarantine:
+            action = f'moved to {quarantine}'
+        else:
+            action = 'deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{total_orphans} of {total_scanned} file(s) {action} ({self.format_size(total_bytes)})'
+        ))
+
+    def collect_upload_dirs(self):
+        """Map (storage, upload_dir) -> [(model, field_name), ...] for every file field"""
+        targets = defaultdict(list)
+        for model in apps.get_models():
+            for field in model._meta.get_fields():
+                if not isinstance(field, models.FileField):
+                    continue
+                if callable(field.upload_to) or not isinstance(field.storage, FileSystemStorage):
+                    self.stderr.write(f'Skipping {model._meta.label}.{field.name}: unsupported upload_to/storage')
+                    continue
+                upload_dir = field.upload_to.strip('/')
+                targets[(field.storage, upload_dir)].append((model, field.attname))
+        return targets
+
+    def iter_batches(self, storage, upload_dir, cutoff, batch_size):
+        """Stream file names under upload_dir in lists of at most batch_size"""
+        root = storage.path(upload_dir)
+        batch = []
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            try:
+                entries = os.scandir(current)
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    if entry.stat().st_mtime > cutoff:
+                        continue
+                    # Stored names are relative to the storage root with forward slashes
+                    name = os.path.relpath(entry.path, storage.location).replace(os.sep, '/')
+                    batch.append(name)
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+        if batch:
+            yield batch
+
+    def find_orphans(self, batch, fields):
+        """Return the names in batch that no field references"""
+        candidates = set(batch)
+        for model, attname in fields:
+            referenced = model._default_manager.filter(
+                **{f'{attname}__in': candidates}
+            ).values_list(attname, flat=True)
+            candidates.difference_update(referenced)
+            if not candidates:
+                break
+        return candidates
+
+    def handle_orphan(self, storage, name, path, dry_run, quarantine):
+        if self.verbosity >= 2 or dry_run:
+            self.stdout.write(f'  orphan: {name}')
+        if dry_run:
+            return
+        try:
+            if quarantine:
+                destination = os.path.join(quarantine, name)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                shutil.move(path, destination)
+            else:
+                storage.delete(name)
+        except OSError as e:
+            self.stderr.write(f'  could not remove {name}: {e}')
+
+    @staticmethod
+    def format_size(num_bytes):
+        size = float(num_bytes)
+        for unit in ['B', 'KB', 'MB']:
+            if size < 1024:
+                return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+            size /= 1024
+        return f'{size:.1f} GB'
@@ -0,0 +1,107 @@
+"""
+Pre-build every vendor's monthly sales statement.
+
+The month's figures for all vendors are read with one grouped query; the CSV
+and PDF files are then rendered in parallel by --workers processes and stored
+under MEDIA_ROOT/statements/, where the statements endpoint serves them from.
+Run it from cron shortly after the month ends; re-running a month replaces
+its statements.
+
+Usage:
+    python manage.py generate_vendor_statements
+    python manage.py generate_vendor_statements --month 2025-01 --workers 4
+    python manage.py generate_vendor_statements --vendor 12 --vendor 15
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.models import VendorStatement
+from authentication.statements import (
+    parse_month, previous_month, render_statement, statement_file_names, statement_report, statement_rows
+)
+
+
+class Command(BaseCommand):
+    help = 'Render the monthly CSV/PDF sales statement of every vendor'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--month',
+            help='Month to build, as YYYY-MM (default: last month)',
+        )
+        parser.add_argument(
+            '--vendor',
+            type=int,
+            action='append',
+            dest='vendor_ids',
+            help='Only build this vendor id (can be repeated)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'REPORT_WORKERS', 2),
+            help='Processes rendering statements in parallel',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if options['workers'] <= 0:
+            raise CommandError('--workers must be positive')
+        try:
+            month = parse_month(options['month']) if options['month'] else previous_month()
+        except ValueError:
+            raise CommandError('--month must look like YYYY-MM')
+
+        statements = statement_rows(month, options['vendor_ids'])
+        if not statements:
+            self.stdout.write(f"No completed sales in {month:%Y-%m}; nothing to build")
+            return
+
+        # Workers are spawned with Django set up, so they can import the app
+        # modules render_statement() lives in
+        built = failed = 0
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        ) as pool:
+            jobs = {}
+            for vendor_id, statement in statements.items():
+                report = statement_report(statement['name'], month, statement['rows'])
+                names = statement_file_names(vendor_id, month)
+                future = pool.submit(render_statement, names, {
+                    key: report[key] for key in ('data', 'title', 'headers', 'summary_data')
+                })
+                jobs[future] = (vendor_id, names, report)
+
+            for future in as_completed(jobs):
+                vendor_id, names, report = jobs[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"Vendor {vendor_id}: {e}")
+                    continue
+
+                VendorStatement.objects.update_or_create(
+                    vendor_id=vendor_id,
+                    month=month,
+                    defaults={
+                        'sales_count': report['total_sales'],
+                        'revenue': report['total_revenue'],
+                        'csv_file': names['csv'],
+                        'pdf_file': names['pdf'],
+                    },
+                )
+                built += 1
+                if self.verbosity >= 2:
+                    self.stdout.write(f"  built statement for vendor {vendor_id}")
+
+        message = f"Built {built} statement(s) for {month:%Y-%m}"
+        if failed:
+            raise CommandError(f"{message}; {failed} failed")
+        self.stdout.write(self.style.SUCCESS(message))
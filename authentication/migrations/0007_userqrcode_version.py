@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0006_otpverification_session_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userqrcode",
+            name="rendered_version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="userqrcode",
+            name="version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0009_vendorstatement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userqrcode',
+            name='image_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userqrcode',
+            name='image_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0010_userqrcode_image_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userqrcode',
+            name='image_data',
+            field=models.TextField(blank=True),
+        ),
+    ]
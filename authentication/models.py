@@ -1,6 +1,7 @@
 from django.db import models
 from django.utils import timezone
 from users.models import User
+import uuid
 
 class UserQRCode(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='qr_code')
@@ -10,11 +11,36 @@ class UserQRCode(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     expires_at = models.DateTimeField()
     
+    # Bumped whenever the user's purchases change; the QR code is only
+    # regenerated (lazily, on its next read) once rendered_version falls behind
+    version = models.PositiveIntegerField(default=0)
+    rendered_version = models.PositiveIntegerField(default=0)
+    
+    # The stored PNG is only re-rendered on default-size requests, so it
+    # keeps the data it encodes, with its version and expiry, separately
+    image_data = models.TextField(blank=True)
+    image_version = models.PositiveIntegerField(default=0)
+    image_expires_at = models.DateTimeField(blank=True, null=True)
+    
     def __str__(self):
         return f"QR Code for {self.user.username}"
     
     def is_expired(self):
         return timezone.now() > self.expires_at
+    
+    def is_stale(self, margin=timezone.timedelta(0)):
+        """Check if the QR data is outdated or expires within margin"""
+        return self.rendered_version != self.version or timezone.now() + margin > self.expires_at
+    
+    def is_image_stale(self, margin=timezone.timedelta(0)):
+        """Check if the stored PNG is missing, outdated or expires within margin"""
+        return (
+            not self.qr_image
+            or not self.image_data
+            or self.image_expires_at is None
+            or self.image_version != self.version
+            or timezone.now() + margin > self.image_expires_at
+        )
 
 class OTPVerification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='otp_verifications')
@@ -36,3 +62,61 @@ class OTPVerification(models.Model):
             # Set expiration to 10 minutes from creation
             self.expires_at = timezone.now() + timezone.timedelta(minutes=10)
         super().save(*args, **kwargs)
+
+class ReportJob(models.Model):
+    """
+    A PDF export rendered in the background (see authentication/reports.py).
+    
+    Finished jobs double as the cache: a report is only rendered again when
+    its data version changes.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_jobs')
+    report_type = models.CharField(max_length=50)
+    version = models.CharField(max_length=100, help_text="Fingerprint of the data the report was built from")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    filename = models.CharField(max_length=255, help_text="Download name")
+    file = models.FileField(upload_to='reports/', blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['user', 'report_type', 'version'])]
+    
+    def __str__(self):
+        return f"{self.report_type} report for {self.user.username} ({self.status})"
+    
+    def is_stale(self, timeout):
+        """Whether a pending job has waited longer than timeout seconds (its worker died)."""
+        return self.status == 'pending' and timezone.now() - self.created_at > timezone.timedelta(seconds=timeout)
+
+
+class VendorStatement(models.Model):
+    """
+    A vendor's pre-built monthly sales statement (CSV and PDF).
+    
+    Written by the generate_vendor_statements command; the statements
+    endpoint only serves these files.
+    """
+    vendor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='statements')
+    month = models.DateField(help_text="First day of the month the statement covers")
+    sales_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    csv_file = models.FileField(upload_to='statements/', blank=True)
+    pdf_file = models.FileField(upload_to='statements/', blank=True)
+    generated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-month']
+        unique_together = ['vendor', 'month']
+    
+    def __str__(self):
+        return f"Statement for {self.vendor.username} ({self.month:%Y-%m})"
@@ -6,6 +6,7 @@ import jwt
 from datetime import datetime, timedelta
 from django.conf import settings
 from django.core.files.base import ContentFile
+from django.db.models import F
 from django.utils import timezone
 from .models import UserQRCode
 from products.models import Purchase
@@ -47,26 +48,78 @@ def generate_user_qr_data(user):
     token = jwt.encode(token_data, settings.SECRET_KEY, algorithm='HS256')
     return token
 
-def create_qr_image(data):
+QR_DEFAULT_BOX_SIZE = 10
+QR_MIN_BOX_SIZE = 1
+QR_MAX_BOX_SIZE = 40
+QR_BORDER = 4
+
+
+def build_qr_matrix(data):
+    """Build the QR module matrix (border included) for data"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        border=QR_BORDER,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+def render_qr_png(data, box_size=QR_DEFAULT_BOX_SIZE):
+    """Render QR data as PNG bytes with box_size pixels per module"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=QR_BORDER,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    
+    with io.BytesIO() as buffer:
+        img.save(buffer, format='PNG')
+        return buffer.getvalue()
+
+def render_qr_svg(data, module_size=QR_DEFAULT_BOX_SIZE):
+    """
+    Render QR data as a compact SVG document.
+    
+    The matrix is built once and every horizontal run of dark modules becomes
+    a single stroked path segment (relative moves within a row), so the output
+    is one <path> with no raster encoding.
+    """
+    matrix = build_qr_matrix(data)
+    size = len(matrix)
+    segments = []
+    for y, row in enumerate(matrix):
+        x = 0
+        cursor = None
+        while x < size:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < size and row[x]:
+                x += 1
+            if cursor is None:
+                segments.append(f'M{start} {y}.5h{x - start}')
+            else:
+                segments.append(f'm{start - cursor} 0h{x - start}')
+            cursor = x
+    
+    pixels = size * module_size
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" '
+        f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/>'
+        f'<path stroke="#000" d="{"".join(segments)}"/></svg>'
+    )
+
+def create_qr_image(data, box_size=QR_DEFAULT_BOX_SIZE):
     """Create QR code image from data"""
     try:
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(data)
-        qr.make(fit=True)
-        
-        # Create image
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convert to bytes using a context manager
-        with io.BytesIO() as buffer:
-            img.save(buffer, format='PNG')
-            buffer.seek(0)
-            image_content = buffer.getvalue()
+        image_content = render_qr_png(data, box_size=box_size)
             
         # Generate a unique filename that's platform-independent
         filename = f'qr_code_{datetime.now().strftime("%Y%m%d_%H%M%S")}.png'
@@ -77,12 +130,18 @@ def create_qr_image(data):
         traceback.print_exc()
         raise IOError(f"Failed to create QR code image: {str(e)}")
 
-def update_user_qr_code(user):
-    """Update or create QR code for user"""
+# Regenerate a little before expiry so scanners never receive a dying token
+QR_REFRESH_MARGIN = timedelta(minutes=1)
+
+def update_user_qr_code(user, render_image=True):
+    """
+    Update or create QR code for user
+    
+    With render_image=False only the QR data is refreshed; callers that
+    render their own output (SVG, custom PNG sizes) skip the PNG file, and
+    the stored one is kept for default-size requests while it is still valid.
+    """
     try:
-        qr_data = generate_user_qr_data(user)
-        qr_image = create_qr_image(qr_data)
-        
         # Get or create user QR code with expires_at set for new records
         expires_at = timezone.now() + timedelta(minutes=10)
         user_qr, created = UserQRCode.objects.get_or_create(
@@ -90,22 +149,38 @@ def update_user_qr_code(user):
             defaults={'expires_at': expires_at}
         )
         
-        # Update the QR code
-        # Use a unique filename based on timestamp
-        filename = f'qr_{user.username}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.png'
-        
-        # Clear old image if it exists
-        if user_qr.qr_image:
-            try:
-                user_qr.qr_image.delete(save=False)
-            except Exception as e:
-                print(f"Warning: Could not delete old QR image: {str(e)}")
+        # Remember which version this render covers; purchases made while
+        # rendering bump the version again and keep the code dirty
+        rendered_version = user_qr.version
         
-        # Save new image
+        qr_data = generate_user_qr_data(user)
         user_qr.qr_data = qr_data
-        user_qr.qr_image.save(filename, qr_image, save=False)
         user_qr.expires_at = expires_at
-        user_qr.save()
+        user_qr.rendered_version = rendered_version
+        update_fields = ['qr_data', 'expires_at', 'rendered_version', 'updated_at']
+        
+        if render_image:
+            qr_image = create_qr_image(qr_data)
+            
+            # Use a unique filename based on timestamp
+            filename = f'qr_{user.username}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.png'
+            
+            # Clear old image if it exists
+            if user_qr.qr_image:
+                try:
+                    user_qr.qr_image.delete(save=False)
+                except Exception as e:
+                    print(f"Warning: Could not delete old QR image: {str(e)}")
+            
+            # Save new image
+            user_qr.qr_image.save(filename, qr_image, save=False)
+            user_qr.image_data = qr_data
+            user_qr.image_version = rendered_version
+            user_qr.image_expires_at = expires_at
+            update_fields += ['qr_image', 'image_data', 'image_version', 'image_expires_at']
+        
+        # Never write `version` back: it may have been bumped concurrently
+        user_qr.save(update_fields=update_fields)
         
         return user_qr
     except Exception as e:
@@ -114,6 +189,27 @@ def update_user_qr_code(user):
         traceback.print_exc()
         raise IOError(f"Failed to update QR code: {str(e)}")
 
+def get_user_qr_code(user, render_image=True):
+    """Return the user's QR code, regenerating it only when it is stale"""
+    user_qr = UserQRCode.objects.filter(user=user).first()
+    if user_qr is None:
+        return update_user_qr_code(user, render_image=render_image)
+    if render_image:
+        # Default-size PNG requests are served the stored image
+        if user_qr.is_image_stale(margin=QR_REFRESH_MARGIN):
+            return update_user_qr_code(user)
+    elif user_qr.is_stale(margin=QR_REFRESH_MARGIN):
+        return update_user_qr_code(user, render_image=False)
+    return user_qr
+
+def mark_user_qr_code_dirty(user):
+    """
+    Flag the user's QR code for regeneration without rendering anything.
+    
+    A single UPDATE; the next get_user_qr_code() call does the actual work.
+    """
+    UserQRCode.objects.filter(user=user).update(version=F('version') + 1)
+
 def decode_qr_data(token):
     """Decode QR code token and return user data"""
     try:
@@ -0,0 +1,189 @@
+"""
+Background rendering of PDF reports.
+
+PDF exports are drawn by utils.build_pdf_report() in a pool of worker
+processes, so reportlab's table layout neither blocks the request nor holds
+the web worker's GIL. Each export is a ReportJob keyed by (report type, user,
+data version): while the data is unchanged, the finished file is served again
+instead of being rebuilt, and repeated clicks on a pending export share one
+job. Clients poll the job's status URL and fetch the file from its download
+URL once it is done.
+
+How reports are rendered is set with settings.REPORT_RENDER_MODE:
+    'process' - in a ProcessPoolExecutor of REPORT_WORKERS processes
+    'inline'  - in the request, which then gets the file directly
+                (development/tests)
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Max
+from django.http import FileResponse, JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import ReportJob
+from .utils import build_pdf_report
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def get_executor():
+    """The process-wide pool reports are rendered in."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # Workers are spawned, not forked, so they don't inherit the
+                # web process's threads or database connections
+                _executor = ProcessPoolExecutor(
+                    max_workers=_setting('REPORT_WORKERS', 2),
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+    return _executor
+
+
+def data_version(queryset, *extra):
+    """
+    Fingerprint of the purchases a report is built from.
+
+    Row count plus the newest updated_at, so any insert, update or delete
+    changes it; extra values (e.g. the current month for monthly figures)
+    are appended.
+    """
+    fingerprint = queryset.order_by().aggregate(count=Count('id'), latest=Max('updated_at'))
+    latest = fingerprint['latest'].timestamp() if fingerprint['latest'] else 0
+    return ':'.join(str(part) for part in (fingerprint['count'], latest, *extra))
+
+
+def request_pdf_report(user, report_type, version, build):
+    """
+    Serve a PDF report from the cache or queue it for rendering.
+
+    Args:
+        user: User the report belongs to
+        report_type: name of the report, e.g. 'purchase_history'
+        version: data version from data_version()
+        build: callable returning a dict with data, filename, title, headers
+            and summary_data for build_pdf_report(); only called on a miss
+
+    Returns:
+        The PDF file when it is ready, otherwise a 202 JSON response with the
+        job's status
+    """
+    job = ReportJob.objects.filter(
+        user=user, report_type=report_type, version=version
+    ).exclude(status='failed').first()
+
+    if job and job.is_stale(_setting('REPORT_JOB_TIMEOUT', 600)):
+        _finish(job.pk, error='Rendering timed out')
+        job = None
+
+    if job is None:
+        report = build()
+        job = ReportJob.objects.create(
+            user=user,
+            report_type=report_type,
+            version=version,
+            filename=f"{report['filename']}.pdf",
+        )
+        _render(job, report)
+        job.refresh_from_db()
+
+    if job.status == 'done':
+        return report_file_response(job)
+    return JsonResponse({
+        'success': True,
+        'message': 'Report is being generated',
+        'data': serialize_report_job(job),
+    }, status=202)
+
+
+def _render(job, report):
+    name = f'reports/{job.pk}.pdf'
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    args = (path, report['data'], report['title'], report['headers'], report.get('summary_data'))
+
+    if _setting('REPORT_RENDER_MODE', 'process') == 'inline':
+        try:
+            build_pdf_report(*args)
+        except Exception as e:
+            logger.error(f"Error rendering report {job.pk}: {e}", exc_info=True)
+            _finish(job.pk, error=str(e))
+        else:
+            _finish(job.pk, name=name)
+        return
+
+    # The job row must be committed before a worker can finish it
+    transaction.on_commit(
+        lambda: get_executor().submit(build_pdf_report, *args).add_done_callback(partial(_on_rendered, job.pk, name))
+    )
+
+
+def _on_rendered(job_id, name, future):
+    # Runs in the pool's management thread of the web process
+    try:
+        error = future.exception()
+        if error:
+            logger.error(f"Error rendering report {job_id}: {error}")
+            _finish(job_id, error=str(error))
+        else:
+            _finish(job_id, name=name)
+    finally:
+        close_old_connections()
+
+
+def _finish(job_id, name=None, error=None):
+    now = timezone.now()
+    if error is not None:
+        ReportJob.objects.filter(pk=job_id).update(status='failed', error=error, finished_at=now)
+        return
+
+    ReportJob.objects.filter(pk=job_id).update(status='done', file=name, finished_at=now)
+
+    # Older versions of the same report are no longer served; when a newer
+    # job finished first, it already cleaned up and this one is left alone
+    job = ReportJob.objects.get(pk=job_id)
+    same_report = ReportJob.objects.filter(user_id=job.user_id, report_type=job.report_type)
+    if same_report.filter(status='done', created_at__gt=job.created_at).exists():
+        return
+    superseded = same_report.filter(status__in=['done', 'failed'], created_at__lt=job.created_at)
+    for old in superseded:
+        if old.file:
+            old.file.delete(save=False)
+    superseded.delete()
+
+
+def serialize_report_job(job):
+    """Status payload for a report job."""
+    return {
+        'job_id': str(job.pk),
+        'report_type': job.report_type,
+        'status': job.status,
+        'filename': job.filename,
+        'error': job.error or None,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'status_url': reverse('report_job_status', args=[job.pk]),
+        'download_url': reverse('report_job_download', args=[job.pk]) if job.status == 'done' else None,
+    }
+
+
+def report_file_response(job):
+    """Download response for a finished job."""
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=job.filename,
+                        content_type='application/pdf')
@@ -110,6 +110,64 @@ def serialize_purchase(purchase):
     }
 
 
+def serialize_purchase_card(purchase):
+    """
+    Serialize a Purchase for operator queues without extra queries.
+    
+    Only reads the purchase and its select_related buyer, product,
+    product__user and agaseke_user; the product is a summary instead of the
+    full serialize_post() payload.
+    """
+    product = purchase.product
+    vendor = product.user
+    return {
+        'id': purchase.id,
+        'order_id': purchase.order_id,
+        'product': {
+            'id': product.id,
+            'title': product.title,
+            'price': float(product.price) if product.price else None,
+            'inventory': product.inventory,
+            'image_url': product.image.url if product.image else None,
+            'vendor': {
+                'id': vendor.id,
+                'username': vendor.username,
+                'first_name': vendor.first_name,
+                'last_name': vendor.last_name,
+                'phone_number': vendor.phone_number or '',
+            },
+        },
+        'quantity': purchase.quantity,
+        'purchase_price': float(purchase.purchase_price) if purchase.purchase_price else None,
+        'status': purchase.status,
+        'status_display': purchase.get_status_display(),
+        'delivery_method': purchase.delivery_method,
+        'delivery_method_display': purchase.get_delivery_method_display(),
+        'payment_method': purchase.payment_method,
+        'payment_method_display': purchase.get_payment_method_display(),
+        'delivery_fee': float(purchase.delivery_fee) if purchase.delivery_fee else None,
+        'delivery_address': purchase.delivery_address,
+        'delivery_latitude': float(purchase.delivery_latitude) if purchase.delivery_latitude else None,
+        'delivery_longitude': float(purchase.delivery_longitude) if purchase.delivery_longitude else None,
+        'created_at': purchase.created_at.isoformat(),
+        'updated_at': purchase.updated_at.isoformat(),
+        'buyer': {
+            'id': purchase.buyer.id,
+            'username': purchase.buyer.username,
+            'first_name': purchase.buyer.first_name,
+            'last_name': purchase.buyer.last_name,
+            'email': purchase.buyer.email,
+        },
+        'vendor_payment_amount': float(purchase.vendor_payment_amount) if purchase.vendor_payment_amount else None,
+        'agaseke_commission_amount': float(purchase.agaseke_commission_amount) if purchase.agaseke_commission_amount else None,
+        'pickup_confirmed_at': purchase.pickup_confirmed_at.isoformat() if purchase.pickup_confirmed_at else None,
+        'agaseke_user': {
+            'id': purchase.agaseke_user.id,
+            'username': purchase.agaseke_user.username,
+        } if purchase.agaseke_user else None,
+    }
+
+
 def serialize_review(review):
     """Serialize a ProductReview object to JSON"""
     return {
@@ -0,0 +1,150 @@
+"""
+Monthly vendor statements.
+
+generate_vendor_statements builds every vendor's statement for a month at
+once: the figures come from one grouped query over completed purchases
+(statement_rows()), and the CSV and PDF files are rendered in a pool of
+worker processes (render_statement()) and stored under MEDIA_ROOT. Vendors
+then download the stored files instead of running sales_statistics at month
+end.
+
+A purchase belongs to the month it was completed in (pickup_confirmed_at, or
+created_at when that is missing), as in the VendorDailyStats rollup.
+"""
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Avg, Count, Q, Sum
+
+from products.models import Purchase
+from products.statistics import date_range_filter, month_range
+
+from .utils import build_pdf_report, write_csv_report
+
+STATEMENT_HEADERS = ['Product', 'Total Sales', 'Total Revenue', 'Average Price']
+
+STATEMENT_FORMATS = ('csv', 'pdf')
+
+
+def parse_month(value):
+    """First day of the month for a 'YYYY-MM' string; raises ValueError if malformed."""
+    return datetime.strptime(value, '%Y-%m').date()
+
+
+def previous_month(today=None):
+    """First day of the month before today's."""
+    first, _ = month_range(today)
+    return (first - timedelta(days=1)).replace(day=1)
+
+
+def statement_rows(month, vendor_ids=None):
+    """
+    Per-product figures for every vendor with completed sales in a month.
+
+    One query grouped by vendor and product.
+
+    Returns:
+        Dict of vendor id -> {'name': display name, 'rows': [product dicts
+        with product__title, total_sales, total_revenue and avg_price,
+        highest revenue first]}
+    """
+    start, end = month_range(month)
+    completed_in_month = (
+        date_range_filter('pickup_confirmed_at', start, end)
+        | (Q(pickup_confirmed_at__isnull=True) & date_range_filter('created_at', start, end))
+    )
+    purchases = Purchase.objects.filter(completed_in_month, status='completed')
+    if vendor_ids:
+        purchases = purchases.filter(product__user_id__in=vendor_ids)
+
+    grouped = purchases.values(
+        'product__user_id', 'product__user__username', 'product__user__first_name',
+        'product__user__last_name', 'product__title',
+    ).annotate(
+        total_sales=Count('id'),
+        total_revenue=Sum('vendor_payment_amount'),
+        avg_price=Avg('vendor_payment_amount'),
+    ).order_by('product__user_id', '-total_revenue')
+
+    statements = {}
+    for row in grouped:
+        statement = statements.setdefault(row['product__user_id'], {
+            'name': (f"{row['product__user__first_name']} {row['product__user__last_name']}".strip()
+                     or row['product__user__username']),
+            'rows': [],
+        })
+        statement['rows'].append(row)
+    return statements
+
+
+def statement_report(vendor_name, month, rows):
+    """Table, title and summary for one vendor's statement, in plain values a worker can take."""
+    total_sales = sum(row['total_sales'] for row in rows)
+    total_revenue = sum((row['total_revenue'] or Decimal('0') for row in rows), Decimal('0'))
+    return {
+        'data': [
+            [
+                row['product__title'],
+                row['total_sales'],
+                f"RWF {row['total_revenue'] or 0:,.1f}",
+                f"RWF {row['avg_price'] or 0:,.1f}",
+            ]
+            for row in rows
+        ],
+        'title': f"Vendor Statement {month:%B %Y} - {vendor_name}",
+        'headers': STATEMENT_HEADERS,
+        'summary_data': {
+            'Period': f"{month:%B %Y}",
+            'Total Sales': total_sales,
+            'Total Revenue': f"RWF {total_revenue:,.1f}",
+            'Commission Rate': '80%',
+            'Report Generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        },
+        'total_sales': total_sales,
+        'total_revenue': total_revenue,
+    }
+
+
+def statement_file_names(vendor_id, month):
+    """Storage names (relative to MEDIA_ROOT) of a statement's files, by format."""
+    return {
+        file_format: f'statements/{month:%Y-%m}/vendor_{vendor_id}.{file_format}'
+        for file_format in STATEMENT_FORMATS
+    }
+
+
+def render_statement(names, report):
+    """
+    Write a statement's CSV and PDF files (runs in a worker process).
+
+    Each file is written next to its final name and moved into place, so a
+    download never sees a half-written statement.
+    """
+    for file_format, name in names.items():
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial_path = f'{path}.partial'
+        if file_format == 'csv':
+            write_csv_report(partial_path, report['data'], report['headers'])
+        else:
+            build_pdf_report(partial_path, report['data'], report['title'], report['headers'],
+                             report['summary_data'])
+        os.replace(partial_path, path)
+
+
+def statement_download_name(statement, file_format):
+    return f"vendor_statement_{statement.vendor.username}_{statement.month:%Y-%m}.{file_format}"
+
+
+def serialize_statement(statement):
+    """List entry for a vendor statement."""
+    return {
+        'month': f"{statement.month:%Y-%m}",
+        'sales_count': statement.sales_count,
+        'revenue': float(statement.revenue),
+        'formats': [file_format for file_format in STATEMENT_FORMATS
+                    if getattr(statement, f'{file_format}_file')],
+        'generated_at': statement.generated_at.isoformat(),
+    }
@@ -32,16 +32,24 @@ api_endpoints = [
     path('v1/dashboard/', views.dashboard_api, name='dashboard_api'),
     
     # QR Code
-    path('v1/qr-code/', views.user_qr_code_api, name='user_qr_code_api'),  # GET/POST - Get QR code in base64
+    path('v1/qr-code/', views.user_qr_code_api, name='user_qr_code_api'),  # GET/POST - Get QR code as base64 PNG or SVG
     
     # Agaseke Dashboard
     path('v1/agaseke-dashboard/', views.agaseke_dashboard_api, name='agaseke_dashboard_api'),
+    path('v1/sales-trend/', views.sales_trend_api, name='sales_trend_api'),
+    
+    # Report exports
+    path('v1/reports/<uuid:job_id>/', views.report_job_status_api, name='report_job_status'),
+    path('v1/reports/<uuid:job_id>/download/', views.report_job_download, name='report_job_download'),
+    path('v1/statements/', views.vendor_statements_api, name='vendor_statements_api'),
+    path('v1/statements/<str:month>/download/', views.vendor_statement_download, name='vendor_statement_download'),
     
     # Categories
     path('v1/categories/', product_views.categories_api, name='categories_api'),
     
     # Cart
     path('v1/cart/', cart_views.view_cart_api, name='view_cart_api'),
+    path('v1/cart/summary/', cart_views.cart_summary_api, name='cart_summary_api'),
     path('v1/cart/add/', cart_views.add_to_cart_api, name='add_to_cart_api'),
     path('v1/cart/item/<int:item_id>/', cart_views.update_cart_item_api, name='update_cart_item_api'),
     path('v1/cart/item/<int:item_id>/remove/', cart_views.remove_from_cart_api, name='remove_from_cart_api'),
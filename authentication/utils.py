@@ -1,10 +1,10 @@
 """Shared utility functions for report generation"""
 import csv
 from datetime import datetime
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, LongTable, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER
 
@@ -19,13 +19,59 @@ def generate_csv_report(data, filename, headers):
     
     return response
 
+# Rows fetched from the database at a time by streamed exports
+CSV_EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """File-like object whose write() returns the line instead of storing it."""
+    def write(self, value):
+        return value
+
+
+def stream_csv_report(rows, filename, headers):
+    """
+    Stream a CSV report row by row.
+    
+    rows can be any iterable of row sequences; it is consumed lazily while the
+    response is sent, so a generator over queryset.iterator(CSV_EXPORT_CHUNK_SIZE)
+    keeps memory constant and the first bytes go out before the last rows
+    are read.
+    """
+    writer = csv.writer(_Echo())
+    
+    def lines():
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow(row)
+    
+    response = StreamingHttpResponse(lines(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+def write_csv_report(path, data, headers):
+    """Write a CSV report to a file, in the same layout as generate_csv_report()."""
+    with open(path, 'w', newline='', encoding='utf-8') as target:
+        writer = csv.writer(target)
+        writer.writerow(headers)
+        writer.writerows(data)
+
 def generate_pdf_report(data, filename, title, headers, summary_data=None):
     """Generate PDF report from data"""
     response = HttpResponse(content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="{filename}.pdf"'
+    build_pdf_report(response, data, title, headers, summary_data)
+    return response
+
+def build_pdf_report(target, data, title, headers, summary_data=None):
+    """
+    Draw a PDF report into target (a file path or file-like object).
     
+    Only takes plain lists and strings, so it can run in a worker process
+    (see authentication/reports.py).
+    """
     # Create the PDF object
-    doc = SimpleDocTemplate(response, pagesize=A4)
+    doc = SimpleDocTemplate(target, pagesize=A4)
     elements = []
     
     # Get styles
@@ -54,9 +100,10 @@ def generate_pdf_report(data, filename, title, headers, summary_data=None):
             elements.append(Paragraph(f"<b>{key}:</b> {value}", summary_style))
         elements.append(Spacer(1, 20))
     
-    # Create table
+    # Create table; LongTable lays out long tables page by page and repeats
+    # the header row on every page
     if data:
-        table = Table([headers] + data)
+        table = LongTable([headers] + data, repeatRows=1, splitByRow=1)
         table.setStyle(TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
@@ -76,7 +123,6 @@ def generate_pdf_report(data, filename, title, headers, summary_data=None):
     
     # Build PDF
     doc.build(elements)
-    return response
 
 def get_token_user(request):
     """Helper function to get user from JWT token authentication"""
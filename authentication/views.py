@@ -12,7 +12,9 @@ from django.contrib.auth.forms import AuthenticationForm
 from django.http import HttpResponse, JsonResponse, Http404
 from django.views.decorators.csrf import ensure_csrf_cookie, csrf_protect, csrf_exempt
 from django.views.decorators.http import require_http_methods, require_POST
-from django.db.models import Q, Sum, Count, Avg
+from django.db import transaction
+from django.db.models import Q, Sum, Count, Avg, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
@@ -25,11 +27,15 @@ from reportlab.lib.units import inch
 from reportlab.pdfgen import canvas
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 
+from users import counters
 from users.models import User
 from posts.models import Post, ProductReview, Bookmark
-from products.models import Purchase, ProductImage
+from products.ledger import record_sales
+from products.models import Purchase, ProductImage, VendorDailyStats
+from products.signals import purchases_status_changed
+from products.statistics import GRANULARITIES, compute_statistics, sales_trend
 from .models import UserQRCode, OTPVerification
-from .qr_utils import update_user_qr_code, decode_qr_data, get_user_purchases_from_qr
+from .qr_utils import mark_user_qr_code_dirty, decode_qr_data, get_user_purchases_from_qr
 from .otp_utils import create_otp, verify_otp as verify_otp_util
 from .jwt_utils import get_tokens_for_user, get_user_from_token, refresh_access_token
 
@@ -705,57 +711,47 @@ def agaseke_dashboard_api(request):
                 'errors': {'role': ['You need to be an agaseke operator to access this dashboard']}
             }, status=403)
         
-        # Get all purchases awaiting pickup
-        awaiting_purchases = Purchase.objects.filter(
-            status='awaiting_pickup'
-        ).select_related('buyer', 'product', 'product__user').order_by('-created_at')
-        
-        # Get all purchases awaiting delivery
-        awaiting_deliveries = Purchase.objects.filter(
-            status='awaiting_delivery'
-        ).select_related('buyer', 'product', 'product__user').order_by('-created_at')
-        
-        # Get orders out for delivery
-        out_for_delivery = Purchase.objects.filter(
-            status='out_for_delivery'
-        ).select_related('buyer', 'product', 'product__user').order_by('-created_at')
-        
-        # Get completed purchases for revenue tracking
-        completed_purchases = Purchase.objects.filter(
-            status='completed',
-            agaseke_user=user
-        ).select_related('buyer', 'product')
-        
-        # Calculate revenue statistics
-        total_commission = completed_purchases.aggregate(
-            total=Sum('agaseke_commission_amount')
-        )['total'] or 0
-        
-        monthly_commission = completed_purchases.filter(
-            pickup_confirmed_at__month=timezone.now().month,
-            pickup_confirmed_at__year=timezone.now().year
-        ).aggregate(total=Sum('agaseke_commission_amount'))['total'] or 0
+        # All counters and commission totals in one conditional aggregate
+        now = timezone.localtime()
+        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        queued = Q(status__in=['awaiting_pickup', 'awaiting_delivery', 'out_for_delivery'])
+        completed_by_user = Q(status='completed', agaseke_user=user)
+        statistics = Purchase.objects.filter(queued | completed_by_user).aggregate(
+            awaiting_pickup_count=Count('id', filter=Q(status='awaiting_pickup')),
+            awaiting_delivery_count=Count('id', filter=Q(status='awaiting_delivery')),
+            out_for_delivery_count=Count('id', filter=Q(status='out_for_delivery')),
+            total_completed=Count('id', filter=completed_by_user),
+            total_commission=Sum('agaseke_commission_amount', filter=completed_by_user),
+            monthly_commission=Sum(
+                'agaseke_commission_amount',
+                filter=completed_by_user & Q(pickup_confirmed_at__gte=month_start)
+            ),
+        )
+        statistics['total_commission'] = float(statistics['total_commission'] or 0)
+        statistics['monthly_commission'] = float(statistics['monthly_commission'] or 0)
+        
+        # Queues of purchase cards (no per-purchase queries)
+        queue = Purchase.objects.select_related(
+            'buyer', 'product', 'product__user', 'agaseke_user'
+        ).order_by('-created_at')
+        awaiting_purchases = queue.filter(status='awaiting_pickup')
+        awaiting_deliveries = queue.filter(status='awaiting_delivery')
+        out_for_delivery = queue.filter(status='out_for_delivery')
+        completed_purchases = queue.filter(status='completed', agaseke_user=user)
         
         # Serialize purchases
-        from authentication.serializers_helpers import serialize_purchase, serialize_user
-        awaiting_purchases_data = [serialize_purchase(p) for p in awaiting_purchases[:20]]
-        awaiting_deliveries_data = [serialize_purchase(p) for p in awaiting_deliveries[:20]]
-        out_for_delivery_data = [serialize_purchase(p) for p in out_for_delivery[:20]]
-        completed_purchases_data = [serialize_purchase(p) for p in completed_purchases[:20]]
+        from authentication.serializers_helpers import serialize_purchase_card, serialize_user
+        awaiting_purchases_data = [serialize_purchase_card(p) for p in awaiting_purchases[:20]]
+        awaiting_deliveries_data = [serialize_purchase_card(p) for p in awaiting_deliveries[:20]]
+        out_for_delivery_data = [serialize_purchase_card(p) for p in out_for_delivery[:20]]
+        completed_purchases_data = [serialize_purchase_card(p) for p in completed_purchases[:20]]
         
         return JsonResponse({
             'success': True,
             'message': 'agaseke dashboard data retrieved successfully',
             'data': {
                 'operator': serialize_user(user),
-                'statistics': {
-                    'awaiting_pickup_count': awaiting_purchases.count(),
-                    'awaiting_delivery_count': awaiting_deliveries.count(),
-                    'out_for_delivery_count': out_for_delivery.count(),
-                    'total_completed': completed_purchases.count(),
-                    'total_commission': float(total_commission) if total_commission else 0.0,
-                    'monthly_commission': float(monthly_commission) if monthly_commission else 0.0,
-                },
+                'statistics': statistics,
                 'awaiting_pickup': awaiting_purchases_data,
                 'awaiting_delivery': awaiting_deliveries_data,
                 'out_for_delivery': out_for_delivery_data,
@@ -777,10 +773,14 @@ def user_qr_code_api(request):
     """
     API endpoint to get user's QR code in base64 format
     
-    GET - Get existing QR code
-    POST - Generate/refresh QR code
+    GET - Get existing QR code (regenerated only if purchases changed or it is expiring)
+    POST - Force a fresh QR code
+    
+    Query parameters:
+    - format: png (default) or svg
+    - size: Pixels per QR module (default: 10, range 1-40)
     
-    Returns QR code as base64 string
+    Returns QR code as base64 PNG, or as inline SVG markup when format=svg
     """
     try:
         # Get user from token
@@ -792,29 +792,62 @@ def user_qr_code_api(request):
                 'errors': {'auth': ['Please provide valid authentication credentials']}
             }, status=401)
         
-        # Generate or update QR code
-        from .qr_utils import update_user_qr_code
+        from .qr_utils import (
+            update_user_qr_code, get_user_qr_code, render_qr_png, render_qr_svg,
+            QR_DEFAULT_BOX_SIZE, QR_MIN_BOX_SIZE, QR_MAX_BOX_SIZE,
+        )
         import base64
-        from io import BytesIO
         
-        # Update/create QR code for the user
-        user_qr = update_user_qr_code(user)
+        image_format = request.GET.get('format', 'png').lower()
+        if image_format not in ['png', 'svg']:
+            return JsonResponse({
+                'success': False,
+                'message': 'Invalid format',
+                'errors': {'format': ['Must be either "png" or "svg"']}
+            }, status=400)
+        
+        try:
+            module_size = int(request.GET.get('size', QR_DEFAULT_BOX_SIZE))
+        except (ValueError, TypeError):
+            return JsonResponse({
+                'success': False,
+                'message': 'Invalid size',
+                'errors': {'size': ['Size must be an integer']}
+            }, status=400)
+        module_size = max(QR_MIN_BOX_SIZE, min(module_size, QR_MAX_BOX_SIZE))
+        
+        # The stored PNG is only useful for the default size; every other
+        # variant is rendered in memory straight from the QR data
+        use_stored_image = image_format == 'png' and module_size == QR_DEFAULT_BOX_SIZE
+        
+        # POST always refreshes; GET reuses the stored code until it is stale
+        if request.method == 'POST':
+            user_qr = update_user_qr_code(user, render_image=use_stored_image)
+        else:
+            user_qr = get_user_qr_code(user, render_image=use_stored_image)
         
-        # Read the QR code image and convert to base64
         qr_image_base64 = None
-        if user_qr.qr_image:
-            try:
-                # Read the image file
-                user_qr.qr_image.open('rb')
-                image_data = user_qr.qr_image.read()
-                user_qr.qr_image.close()
-                
-                # Convert to base64
-                qr_image_base64 = base64.b64encode(image_data).decode('utf-8')
-            except Exception as e:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(f"Error reading QR image: {str(e)}")
+        qr_image_svg = None
+        if image_format == 'svg':
+            qr_image_svg = render_qr_svg(user_qr.qr_data, module_size=module_size)
+        elif use_stored_image:
+            # Read the QR code image and convert to base64
+            if user_qr.qr_image:
+                try:
+                    # Read the image file
+                    user_qr.qr_image.open('rb')
+                    image_data = user_qr.qr_image.read()
+                    user_qr.qr_image.close()
+                    
+                    # Convert to base64
+                    qr_image_base64 = base64.b64encode(image_data).decode('utf-8')
+                except Exception as e:
+                    import logging
+                    logger = logging.getLogger(__name__)
+                    logger.error(f"Error reading QR image: {str(e)}")
+        else:
+            image_data = render_qr_png(user_qr.qr_data, box_size=module_size)
+            qr_image_base64 = base64.b64encode(image_data).decode('utf-8')
         
         # Get pending purchases count
         pending_purchases = Purchase.objects.filter(
@@ -822,17 +855,30 @@ def user_qr_code_api(request):
             status__in=['awaiting_pickup', 'awaiting_delivery']
         )
         
+        # The stored PNG may predate a data-only refresh; describe the token it encodes
+        if use_stored_image:
+            qr_data, expires_at = user_qr.image_data, user_qr.image_expires_at
+        else:
+            qr_data, expires_at = user_qr.qr_data, user_qr.expires_at
+        
+        data = {
+            'qr_code_data': qr_data,    # Raw QR data (JWT token)
+            'expires_at': expires_at.isoformat(),
+            'pending_purchases_count': pending_purchases.count(),
+            'image_format': image_format,
+            'module_size': module_size,
+        }
+        if image_format == 'svg':
+            data['qr_code_svg'] = qr_image_svg  # Inline SVG markup
+            data['encoding'] = 'utf-8'
+        else:
+            data['qr_code_base64'] = qr_image_base64  # Base64 encoded PNG image
+            data['encoding'] = 'base64'
+        
         return JsonResponse({
             'success': True,
             'message': 'QR code generated successfully',
-            'data': {
-                'qr_code_base64': qr_image_base64,  # Base64 encoded PNG image
-                'qr_code_data': user_qr.qr_data,    # Raw QR data (JWT token)
-                'expires_at': user_qr.expires_at.isoformat(),
-                'pending_purchases_count': pending_purchases.count(),
-                'image_format': 'png',
-                'encoding': 'base64'
-            }
+            'data': data
         }, status=200)
         
     except Exception as e:
@@ -1090,28 +1136,33 @@ def complete_purchase_pickup(request):
             print(f"DEBUG: Invalid purchase status. Expected 'awaiting_pickup' or 'awaiting_delivery', got '{purchase.status}'")
             return JsonResponse({'error': f'Invalid purchase status: {purchase.status}. Expected: awaiting_pickup or awaiting_delivery'}, status=400)
         
-        # Complete the purchase
-        purchase.status = 'completed'
-        purchase.agaseke_user = agaseke_user
-        purchase.pickup_confirmed_at = timezone.now()
-        purchase.save()
-        
-        # Update vendor and buyer stats
-        vendor = purchase.product.user
-        vendor.total_sales += purchase.vendor_payment_amount
-        vendor.save()
-        
-        buyer = purchase.buyer
-        buyer.total_purchases += (purchase.purchase_price * purchase.quantity)
-        buyer.save()
+        with transaction.atomic():
+            previous_statuses = {purchase.pk: purchase.status}
+            
+            # Complete the purchase only if it is still awaiting, so a
+            # concurrent confirmation cannot post its sale twice
+            if not Purchase.complete_many([purchase], agaseke_user):
+                transaction.set_rollback(True)
+                return JsonResponse({'error': 'Purchase was already updated by another request'}, status=409)
+            
+            # Update vendor and buyer stats
+            vendor = purchase.product.user
+            counters.increment(vendor, total_sales=purchase.vendor_payment_amount)
+            
+            buyer = purchase.buyer
+            counters.increment(buyer, total_purchases=purchase.purchase_price * purchase.quantity)
+            
+            VendorDailyStats.record([purchase])
+            record_sales([purchase])
+            
+            purchases_status_changed.send(
+                sender=Purchase,
+                purchases=[purchase],
+                previous_statuses=previous_statuses
+            )
         
-        # Regenerate buyer's QR code to remove completed purchase
-        try:
-            from .qr_utils import update_user_qr_code
-            update_user_qr_code(buyer)
-            print(f"DEBUG: Updated QR code for buyer {buyer.username}")
-        except Exception as e:
-            print(f"DEBUG: Failed to update QR code for buyer: {str(e)}")
+        # Flag buyer's QR code so the completed purchase drops off on its next read
+        mark_user_qr_code_dirty(buyer)
         
         return JsonResponse({
             'success': True,
@@ -1143,9 +1194,6 @@ def complete_purchases_bulk(request):
         }, status=403)
     
     try:
-        from django.db import transaction
-        from decimal import Decimal
-        
         data = json.loads(request.body)
         purchase_ids = data.get('purchase_ids', [])
         
@@ -1163,25 +1211,6 @@ def complete_purchases_bulk(request):
                 'failed': []
             }, status=400)
         
-        # Fetch all purchases
-        purchases = Purchase.objects.filter(id__in=purchase_ids).select_related('buyer', 'product', 'product__user')
-        
-        if not purchases.exists():
-            return JsonResponse({
-                'error': 'No valid purchases found',
-                'completed': [],
-                'failed': []
-            }, status=404)
-        
-        # Validate all purchases belong to the same buyer
-        buyer_ids = set(p.buyer_id for p in purchases)
-        if len(buyer_ids) > 1:
-                return JsonResponse({
-                'error': 'All purchases must belong to the same buyer',
-                'completed': [],
-                'failed': []
-            }, status=400)
-        
         # Validate all purchases are in valid status
         completed_purchases = []
         failed_purchases = []
@@ -1190,6 +1219,30 @@ def complete_purchases_bulk(request):
         
         # Use atomic transaction to ensure all-or-nothing completion
         with transaction.atomic():
+            # Fetch all purchases, locking them until the batch is written
+            purchases = list(
+                Purchase.objects.select_for_update(of=('self',))
+                .filter(id__in=purchase_ids)
+                .select_related('buyer', 'product', 'product__user')
+            )
+            
+            if not purchases:
+                return JsonResponse({
+                    'error': 'No valid purchases found',
+                    'completed': [],
+                    'failed': []
+                }, status=404)
+            
+            # Validate all purchases belong to the same buyer
+            buyer_ids = set(p.buyer_id for p in purchases)
+            if len(buyer_ids) > 1:
+                return JsonResponse({
+                    'error': 'All purchases must belong to the same buyer',
+                    'completed': [],
+                    'failed': []
+                }, status=400)
+            
+            eligible = []
             for purchase in purchases:
                 # Check if purchase is awaiting pickup or delivery
                 if purchase.status not in ['awaiting_pickup', 'awaiting_delivery']:
@@ -1200,17 +1253,26 @@ def complete_purchases_bulk(request):
                         'product': purchase.product.title
                     })
                     continue
-                
-                # Complete the purchase
-                purchase.status = 'completed'
-                purchase.agaseke_user = agaseke_user
-                purchase.pickup_confirmed_at = timezone.now()
-                purchase.save()
-                
-                # Update vendor stats
-                vendor = purchase.product.user
-                vendor.total_sales += purchase.vendor_payment_amount
-                vendor.save()
+                eligible.append(purchase)
+            
+            previous_statuses = {purchase.pk: purchase.status for purchase in eligible}
+            
+            # Complete every eligible purchase in one UPDATE
+            if not Purchase.complete_many(eligible, agaseke_user):
+                transaction.set_rollback(True)
+                return JsonResponse({
+                    'error': 'Some purchases were updated by another request, please try again',
+                    'completed': [],
+                    'failed': []
+                }, status=409)
+            
+            # Aggregate vendor earnings so each vendor gets a single increment
+            vendor_sales = {}
+            total_buyer_spent = Decimal('0.00')
+            for purchase in eligible:
+                vendor_id = purchase.product.user_id
+                vendor_sales[vendor_id] = vendor_sales.get(vendor_id, Decimal('0.00')) + purchase.vendor_payment_amount
+                total_buyer_spent += purchase.purchase_price * purchase.quantity
                 
                 # Track totals
                 total_vendor_payment += purchase.vendor_payment_amount
@@ -1224,21 +1286,27 @@ def complete_purchases_bulk(request):
                     'agaseke_commission': str(purchase.agaseke_commission_amount)
                 })
             
-            # If at least one purchase was completed, update buyer stats
-            if completed_purchases:
-                buyer = purchases.first().buyer
-                total_buyer_spent = sum(p.purchase_price * p.quantity for p in purchases if p.status == 'completed')
-                buyer.total_purchases += total_buyer_spent
-                buyer.save()
-        
-        # Regenerate buyer's QR code to remove completed purchases
+            # Update vendor and buyer stats in the database, not from stale copies
+            counters.increment_many(User, {
+                vendor_id: {'total_sales': amount} for vendor_id, amount in vendor_sales.items()
+            })
+            
+            if eligible:
+                buyer = eligible[0].buyer
+                counters.increment(buyer, total_purchases=total_buyer_spent)
+                VendorDailyStats.record(eligible)
+                record_sales(eligible)
+                
+                # Notification events for the whole batch are queued in this transaction
+                purchases_status_changed.send(
+                    sender=Purchase,
+                    purchases=eligible,
+                    previous_statuses=previous_statuses
+                )
+        
+        # Flag buyer's QR code so completed purchases drop off on its next read
         if completed_purchases:
-            try:
-                from .qr_utils import update_user_qr_code
-                buyer = purchases.first().buyer
-                update_user_qr_code(buyer)
-            except Exception as e:
-                print(f"Failed to update QR code for buyer: {str(e)}")
+            mark_user_qr_code_dirty(buyer)
         
         # Prepare response
         response_data = {
@@ -1293,21 +1361,7 @@ def get_vendor_statistics_modal(request, vendor_id):
         ).select_related('product', 'buyer', 'agaseke_user')
         
         # Calculate vendor statistics
-        total_sales = purchases.count()
-        total_revenue = purchases.aggregate(
-            total=Sum('vendor_payment_amount')
-        )['total'] or 0
-        
-        # Monthly statistics
-        current_month = timezone.now().month
-        current_year = timezone.now().year
-        monthly_purchases = purchases.filter(
-            pickup_confirmed_at__month=current_month,
-            pickup_confirmed_at__year=current_year
-        )
-        monthly_revenue = monthly_purchases.aggregate(
-            total=Sum('vendor_payment_amount')
-        )['total'] or 0
+        stats = compute_statistics('vendor', vendor)
         
         # Product-wise breakdown
         product_stats = list(purchases.values('product__title').annotate(
@@ -1316,16 +1370,6 @@ def get_vendor_statistics_modal(request, vendor_id):
             avg_price=Avg('vendor_payment_amount')
         ).order_by('-total_revenue')[:5])  # Limit to top 5 products
         
-        # agaseke commission from this vendor
-        agaseke_commission = purchases.aggregate(
-            total=Sum('agaseke_commission_amount')
-        )['total'] or 0
-        
-        # Monthly agaseke commission
-        monthly_agaseke_commission = monthly_purchases.aggregate(
-            total=Sum('agaseke_commission_amount')
-        )['total'] or 0
-        
         # Recent transactions
         recent_transactions = list(purchases.order_by('-pickup_confirmed_at')[:5].values(
             'product__title', 'buyer__username', 'order_id', 'quantity', 
@@ -1333,15 +1377,8 @@ def get_vendor_statistics_modal(request, vendor_id):
         ))
         
         # Commission breakdown
-        total_product_price = purchases.aggregate(total=Sum('purchase_price'))['total'] or 0
-        total_delivery_fees = purchases.aggregate(total=Sum('delivery_fee'))['total'] or 0
-        
         commission_breakdown = {
-            'vendor_earnings': float(total_revenue),
-            'agaseke_commission': float(agaseke_commission),
-            'product_commission': float(total_product_price * Decimal('0.2')),
-            'delivery_fees': float(total_delivery_fees),
-            'total_transaction_value': float(total_product_price + total_delivery_fees)
+            name: float(value) for name, value in stats['commission_breakdown'].items()
         }
         
         # Format dates for JSON serialization
@@ -1359,12 +1396,12 @@ def get_vendor_statistics_modal(request, vendor_id):
                 'email': vendor.email
             },
             'statistics': {
-                'total_sales': total_sales,
-                'total_revenue': float(total_revenue),
-                'monthly_revenue': float(monthly_revenue),
-                'monthly_sales': monthly_purchases.count(),
-                'agaseke_commission': float(agaseke_commission),
-                'monthly_agaseke_commission': float(monthly_agaseke_commission),
+                'total_sales': stats['total_sales_count'],
+                'total_revenue': float(stats['total_revenue']),
+                'monthly_revenue': float(stats['monthly_revenue']),
+                'monthly_sales': stats['monthly_sales_count'],
+                'agaseke_commission': float(stats['total_commission']),
+                'monthly_agaseke_commission': float(stats['monthly_commission']),
                 'commission_rate': 80,
                 'agaseke_rate': 20
             },
@@ -1403,12 +1440,23 @@ def get_all_vendors_api(request):
         search_query = request.GET.get('search', '').strip()
         sort_by = request.GET.get('sort', '-total_sales')  # Default: highest sales first
         
-        # Get all vendors
-        vendors = User.objects.filter(is_vendor_role=True)
+        # Get all vendors with their statistics computed in the same query;
+        # sales figures come from the daily rollup
+        month_start = timezone.localdate().replace(day=1)
+        vendor_days = VendorDailyStats.objects.filter(vendor=OuterRef('pk')).order_by().values('vendor')
+        vendors = User.objects.filter(is_vendor_role=True).annotate(
+            sales_count=Coalesce(Subquery(
+                vendor_days.annotate(total=Sum('sales_count')).values('total')
+            ), 0),
+            monthly_sales=Coalesce(Subquery(
+                vendor_days.filter(date__gte=month_start).annotate(total=Sum('sales_count')).values('total')
+            ), 0),
+            total_products=Count('posts'),
+            in_stock_products=Count('posts', filter=Q(posts__inventory__gt=0)),
+        )
         
         # Apply search filter
         if search_query:
-            from django.db.models import Q
             vendors = vendors.filter(
                 Q(username__icontains=search_query) |
                 Q(first_name__icontains=search_query) |
@@ -1416,12 +1464,14 @@ def get_all_vendors_api(request):
                 Q(email__icontains=search_query)
             )
         
-        # Apply sorting
-        valid_sorts = ['total_sales', '-total_sales', 'username', '-username', 'date_joined', '-date_joined']
-        if sort_by in valid_sorts:
-            vendors = vendors.order_by(sort_by)
-        else:
-            vendors = vendors.order_by('-total_sales')
+        # Apply sorting (id keeps pages stable between ties)
+        valid_sorts = [
+            'total_sales', 'username', 'date_joined',
+            'sales_count', 'monthly_sales', 'total_products', 'in_stock_products',
+        ]
+        if sort_by.lstrip('-') not in valid_sorts:
+            sort_by = '-total_sales'
+        vendors = vendors.order_by(sort_by, 'id')
         
         # Paginate
         paginator = Paginator(vendors, limit)
@@ -1430,24 +1480,6 @@ def get_all_vendors_api(request):
         # Serialize vendor data
         vendors_data = []
         for vendor in page_obj:
-            # Get vendor statistics
-            vendor_purchases = Purchase.objects.filter(
-                product__user=vendor,
-                status='completed'
-            )
-            
-            total_sales = vendor_purchases.count()
-            total_products = Post.objects.filter(user=vendor).count()
-            in_stock_products = Post.objects.filter(user=vendor, inventory__gt=0).count()
-            
-            # Calculate monthly stats
-            current_month = timezone.now().month
-            current_year = timezone.now().year
-            monthly_sales = vendor_purchases.filter(
-                pickup_confirmed_at__month=current_month,
-                pickup_confirmed_at__year=current_year
-            ).count()
-            
             vendors_data.append({
                 'id': vendor.id,
                 'username': vendor.username,
@@ -1458,11 +1490,11 @@ def get_all_vendors_api(request):
                 'profile_picture': vendor.profile_picture.url if vendor.profile_picture else None,
                 'date_joined': vendor.date_joined.isoformat(),
                 'statistics': {
-                    'total_sales': total_sales,
+                    'total_sales': vendor.sales_count,
                     'total_revenue': float(vendor.total_sales),
-                    'total_products': total_products,
-                    'in_stock_products': in_stock_products,
-                    'monthly_sales': monthly_sales
+                    'total_products': vendor.total_products,
+                    'in_stock_products': vendor.in_stock_products,
+                    'monthly_sales': vendor.monthly_sales
                 }
             })
         
@@ -1510,22 +1542,7 @@ def get_vendor_profile_api(request, vendor_id):
         ).select_related('product', 'buyer', 'agaseke_user')
         
         # Calculate vendor statistics
-        total_sales = purchases.count()
-        total_revenue = purchases.aggregate(
-            total=Sum('vendor_payment_amount')
-        )['total'] or 0
-        
-        # Monthly statistics
-        current_month = timezone.now().month
-        current_year = timezone.now().year
-        monthly_purchases = purchases.filter(
-            pickup_confirmed_at__month=current_month,
-            pickup_confirmed_at__year=current_year
-        )
-        monthly_revenue = monthly_purchases.aggregate(
-            total=Sum('vendor_payment_amount')
-        )['total'] or 0
-        monthly_sales = monthly_purchases.count()
+        stats = compute_statistics('vendor', vendor)
         
         # Product statistics
         all_products = Post.objects.filter(user=vendor)
@@ -1540,16 +1557,6 @@ def get_vendor_profile_api(request, vendor_id):
             total_quantity=Sum('quantity')
         ).order_by('-total_revenue')[:10])
         
-        # agaseke commission from this vendor
-        agaseke_commission = purchases.aggregate(
-            total=Sum('agaseke_commission_amount')
-        )['total'] or 0
-        
-        # Monthly agaseke commission
-        monthly_agaseke_commission = monthly_purchases.aggregate(
-            total=Sum('agaseke_commission_amount')
-        )['total'] or 0
-        
         # Recent transactions (last 20)
         recent_transactions = []
         for purchase in purchases.order_by('-pickup_confirmed_at')[:20]:
@@ -1565,20 +1572,11 @@ def get_vendor_profile_api(request, vendor_id):
                 'created_at': purchase.created_at.isoformat()
             })
         
-        # Weekly sales trend (last 7 days)
+        # Weekly sales trend (last 7 days), uncached so it agrees with the totals above
         from datetime import timedelta
-        today = timezone.now().date()
-        weekly_trend = []
-        for i in range(6, -1, -1):
-            day = today - timedelta(days=i)
-            day_purchases = purchases.filter(
-                pickup_confirmed_at__date=day
-            )
-            weekly_trend.append({
-                'date': day.isoformat(),
-                'sales': day_purchases.count(),
-                'revenue': float(day_purchases.aggregate(total=Sum('vendor_payment_amount'))['total'] or 0)
-            })
+        today = timezone.localdate()
+        weekly_trend = sales_trend('vendor', vendor, today - timedelta(days=6), today + timedelta(days=1),
+                                   use_cache=False)
         
         # Get vendor's products (limited to 10 recent)
         from authentication.serializers_helpers import serialize_post
@@ -1601,15 +1599,15 @@ def get_vendor_profile_api(request, vendor_id):
                     'is_vendor': True
                 },
                 'statistics': {
-                    'total_sales': total_sales,
-                    'total_revenue': str(total_revenue),
-                    'monthly_sales': monthly_sales,
-                    'monthly_revenue': str(monthly_revenue),
+                    'total_sales': stats['total_sales_count'],
+                    'total_revenue': str(stats['total_revenue']),
+                    'monthly_sales': stats['monthly_sales_count'],
+                    'monthly_revenue': str(stats['monthly_revenue']),
                     'total_products': total_products,
                     'in_stock_products': in_stock_products,
                     'out_of_stock_products': out_of_stock_products,
-                    'agaseke_commission': str(agaseke_commission),
-                    'monthly_agaseke_commission': str(monthly_agaseke_commission)
+                    'agaseke_commission': str(stats['total_commission']),
+                    'monthly_agaseke_commission': str(stats['monthly_commission'])
                 },
                 'top_products': product_stats,
                 'recent_transactions': recent_transactions,
@@ -1626,3 +1624,273 @@ def get_vendor_profile_api(request, vendor_id):
         import traceback
         print('Error in get_vendor_profile_api:', traceback.format_exc())
         return JsonResponse({'error': f'Error processing request: {str(e)}'}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(['GET'])
+def sales_trend_api(request):
+    """
+    API endpoint for sales, revenue and commission over time.
+    
+    Query parameters:
+        scope: 'vendor' (default for vendors), 'agaseke' (default for
+            operators) or 'platform' (staff only)
+        vendor_id: vendor to report on (agaseke operators and staff only)
+        granularity: 'day' (default), 'week' or 'month'
+        start, end: YYYY-MM-DD, both inclusive; default is the last `days`
+            days (30) up to today
+    """
+    user = get_token_user(request)
+    if not user:
+        return JsonResponse({
+            'success': False,
+            'message': 'Authentication required',
+            'errors': {'auth': ['Please provide valid authentication credentials']}
+        }, status=401)
+    
+    try:
+        from datetime import date, timedelta
+        
+        # Resolve the scope and whose sales it covers
+        default_scope = 'vendor' if user.is_vendor_role else 'agaseke' if user.is_agaseke() else 'platform'
+        scope = request.GET.get('scope', default_scope)
+        target = user
+        if scope == 'vendor':
+            vendor_id = request.GET.get('vendor_id')
+            if vendor_id and str(vendor_id) != str(user.id):
+                if not (user.is_agaseke() or user.is_staff):
+                    return JsonResponse({
+                        'success': False,
+                        'message': 'Access denied',
+                        'errors': {'role': ['Only agaseke operators can view other vendors']}
+                    }, status=403)
+                target = User.objects.filter(id=vendor_id, is_vendor_role=True).first()
+                if not target:
+                    return JsonResponse({
+                        'success': False,
+                        'message': 'Vendor not found',
+                        'errors': {'vendor_id': ['No vendor with this id']}
+                    }, status=404)
+            elif not user.is_vendor_role:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Vendor role required',
+                    'errors': {'role': ['You need to be a vendor to view your sales']}
+                }, status=403)
+        elif scope == 'agaseke':
+            if not user.is_agaseke():
+                return JsonResponse({
+                    'success': False,
+                    'message': 'agaseke role required',
+                    'errors': {'role': ['You need to be an agaseke operator to view commissions']}
+                }, status=403)
+        elif scope == 'platform':
+            if not user.is_staff:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Admin access required',
+                    'errors': {'role': ['Only staff can view platform sales']}
+                }, status=403)
+        else:
+            return JsonResponse({
+                'success': False,
+                'message': 'Invalid scope',
+                'errors': {'scope': ["Must be one of 'vendor', 'agaseke' or 'platform'"]}
+            }, status=400)
+        
+        granularity = request.GET.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            return JsonResponse({
+                'success': False,
+                'message': 'Invalid granularity',
+                'errors': {'granularity': [f"Must be one of {', '.join(GRANULARITIES)}"]}
+            }, status=400)
+        
+        # Date range (inclusive), capped so a request can't ask for unbounded buckets
+        try:
+            end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else timezone.localdate()
+            if request.GET.get('start'):
+                start = date.fromisoformat(request.GET['start'])
+            else:
+                start = end - timedelta(days=int(request.GET.get('days', 30)) - 1)
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Invalid date range',
+                'errors': {'range': ['Use YYYY-MM-DD for start/end and a whole number for days']}
+            }, status=400)
+        max_days = 366 if granularity == 'day' else 366 * 5
+        if start > end or (end - start).days >= max_days:
+            return JsonResponse({
+                'success': False,
+                'message': 'Invalid date range',
+                'errors': {'range': [f'start must not be after end, and the range can cover at most {max_days} days']}
+            }, status=400)
+        
+        trend = sales_trend(scope, target, start, end + timedelta(days=1), granularity)
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Sales trend retrieved successfully',
+            'data': {
+                'scope': scope,
+                'vendor_id': target.id if scope == 'vendor' else None,
+                'granularity': granularity,
+                'start': start.isoformat(),
+                'end': end.isoformat(),
+                'totals': {
+                    'sales': sum(bucket['sales'] for bucket in trend),
+                    'revenue': sum(bucket['revenue'] for bucket in trend),
+                    'commission': sum(bucket['commission'] for bucket in trend),
+                },
+                'trend': trend,
+            }
+        }, status=200)
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': 'Error retrieving sales trend',
+            'errors': {'server': [str(e)]}
+        }, status=500)
+
+
+def _download_user(request):
+    """The requesting user (token or session auth), or an error response."""
+    user = get_token_user(request) or (request.user if request.user.is_authenticated else None)
+    if not user:
+        return None, JsonResponse({
+            'success': False,
+            'message': 'Authentication required',
+            'errors': {'auth': ['Please provide valid authentication credentials']}
+        }, status=401)
+    return user, None
+
+
+def _report_job_for(request, job_id):
+    """The requesting user's ReportJob, or an error response."""
+    user, error = _download_user(request)
+    if error:
+        return None, error
+    
+    from .models import ReportJob
+    job = ReportJob.objects.filter(pk=job_id, user=user).first()
+    if not job:
+        return None, JsonResponse({
+            'success': False,
+            'message': 'Report not found',
+            'errors': {'job_id': ['No report with this id']}
+        }, status=404)
+    return job, None
+
+
+@csrf_exempt
+@require_http_methods(['GET'])
+def report_job_status_api(request, job_id):
+    """API endpoint to poll a PDF report job"""
+    from .reports import serialize_report_job
+    
+    job, error = _report_job_for(request, job_id)
+    if error:
+        return error
+    
+    return JsonResponse({
+        'success': True,
+        'message': f'Report is {job.get_status_display().lower()}',
+        'data': serialize_report_job(job)
+    }, status=200)
+
+
+@csrf_exempt
+@require_http_methods(['GET'])
+def report_job_download(request, job_id):
+    """Download a finished PDF report"""
+    from .reports import report_file_response, serialize_report_job
+    
+    job, error = _report_job_for(request, job_id)
+    if error:
+        return error
+    
+    if job.status != 'done':
+        return JsonResponse({
+            'success': False,
+            'message': 'Report is not ready',
+            'errors': {'status': [job.error or f'Report is {job.get_status_display().lower()}']},
+            'data': serialize_report_job(job)
+        }, status=409)
+    
+    return report_file_response(job)
+
+
+@csrf_exempt
+@require_http_methods(['GET'])
+def vendor_statements_api(request):
+    """API endpoint listing the vendor's pre-built monthly statements"""
+    from .models import VendorStatement
+    from .statements import serialize_statement
+    
+    user, error = _download_user(request)
+    if error:
+        return error
+    
+    if not user.is_vendor_role:
+        return JsonResponse({
+            'success': False,
+            'message': 'Only vendors have statements',
+            'errors': {'permission': ['Vendor access required']}
+        }, status=403)
+    
+    statements = VendorStatement.objects.filter(vendor=user)
+    return JsonResponse({
+        'success': True,
+        'message': 'Statements retrieved successfully',
+        'data': {
+            'statements': [serialize_statement(statement) for statement in statements]
+        }
+    }, status=200)
+
+
+@csrf_exempt
+@require_http_methods(['GET'])
+def vendor_statement_download(request, month):
+    """Download a pre-built monthly statement (?format=pdf or csv)"""
+    from django.http import FileResponse
+    from .models import VendorStatement
+    from .statements import STATEMENT_FORMATS, parse_month, statement_download_name
+    
+    user, error = _download_user(request)
+    if error:
+        return error
+    
+    file_format = request.GET.get('format', 'pdf')
+    if file_format not in STATEMENT_FORMATS:
+        return JsonResponse({
+            'success': False,
+            'message': 'Invalid format',
+            'errors': {'format': [f"Must be one of: {', '.join(STATEMENT_FORMATS)}"]}
+        }, status=400)
+    
+    try:
+        first_day = parse_month(month)
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'message': 'Invalid month',
+            'errors': {'month': ['Use the YYYY-MM format']}
+        }, status=400)
+    
+    statement = VendorStatement.objects.filter(vendor=user, month=first_day).select_related('vendor').first()
+    statement_file = getattr(statement, f'{file_format}_file', None)
+    if not statement_file:
+        return JsonResponse({
+            'success': False,
+            'message': 'Statement not found',
+            'errors': {'month': ['No statement has been generated for this month']}
+        }, status=404)
+    
+    return FileResponse(
+        statement_file.open('rb'),
+        as_attachment=True,
+        filename=statement_download_name(statement, file_format),
+        content_type='application/pdf' if file_format == 'pdf' else 'text/csv',
+    )
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Notification, NotificationPreferences
+from .models import Notification, NotificationOutbox, NotificationPreferences
 
 
 @admin.register(Notification)
@@ -64,3 +64,11 @@ class NotificationPreferencesAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at')
         }),
     )
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'notification_type', 'created_at', 'processed_at', 'attempts']
+    list_filter = ['notification_type', 'processed_at']
+    search_fields = ['user__username', 'title']
+    readonly_fields = ['created_at', 'processed_at', 'claim_token', 'claimed_at', 'attempts', 'last_error']
@@ -0,0 +1,185 @@
+"""
+Brokers that push new notifications to open /notifications/stream connections.
+
+The broker class is set with settings.NOTIFICATION_BROKER:
+    'notifications.broker.LocalBroker'    - in-process fan-out; only reaches
+                                            streams served by the same process
+    'notifications.broker.DatabaseBroker' - each stream polls the Notification
+                                            table, so every worker sees every
+                                            notification (no extra services)
+
+Other backends (e.g. Redis pub/sub) can subclass BaseBroker and be named there.
+"""
+import asyncio
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class BaseBroker:
+    """Interface for notification brokers."""
+
+    def publish(self, user_id, payload):
+        """
+        Send a serialized notification to the user's open streams.
+
+        Called from synchronous code (requests, the outbox dispatcher), after
+        the notification row is committed.
+        """
+        raise NotImplementedError
+
+    def subscribe(self, user_id, after_id=0):
+        """
+        Start listening for a user's notifications.
+
+        Must be called from the event loop that will consume the subscription.
+        after_id is the newest notification the client already has.
+        """
+        raise NotImplementedError
+
+
+class BaseSubscription:
+    """One open stream's view of a broker."""
+
+    async def get(self, timeout):
+        """Wait up to timeout seconds and return a list of payloads (possibly empty)."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class LocalSubscription(BaseSubscription):
+    def __init__(self, broker, user_id, maxsize):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def put(self, payload):
+        # Runs on the subscription's event loop
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            logger.warning(f"Notification stream for user {self.user_id} is falling behind; dropping an event")
+
+    async def get(self, timeout):
+        try:
+            payloads = [await asyncio.wait_for(self.queue.get(), timeout)]
+        except asyncio.TimeoutError:
+            return []
+        while not self.queue.empty():
+            payloads.append(self.queue.get_nowait())
+        return payloads
+
+    def close(self):
+        self.broker._unsubscribe(self)
+
+
+class LocalBroker(BaseBroker):
+    """Fan-out to the streams served by this process."""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, payload):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, payload)
+            except RuntimeError:
+                # The stream's event loop has already shut down
+                self._unsubscribe(subscription)
+
+    def subscribe(self, user_id, after_id=0):
+        subscription = LocalSubscription(self, user_id, self.queue_size)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+
+class DatabaseSubscription(BaseSubscription):
+    def __init__(self, user_id, after_id, interval):
+        self.user_id = user_id
+        self.after_id = after_id
+        self.interval = interval
+
+    async def get(self, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            payloads = await fetch_notifications_after(self.user_id, self.after_id)
+            if payloads:
+                self.after_id = payloads[-1]['id']
+                return payloads
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return []
+            await asyncio.sleep(min(self.interval, remaining))
+
+
+class DatabaseBroker(BaseBroker):
+    """Streams poll the Notification table by id; works across any number of workers."""
+
+    def __init__(self, interval=None):
+        self.interval = interval or getattr(settings, 'NOTIFICATION_BROKER_POLL_INTERVAL', 2)
+
+    def publish(self, user_id, payload):
+        # Subscribers find committed notifications on their next poll
+        pass
+
+    def subscribe(self, user_id, after_id=0):
+        return DatabaseSubscription(user_id, after_id, self.interval)
+
+
+@sync_to_async
+def fetch_notifications_after(user_id, after_id, limit=100):
+    """Serialized notifications for a user with id > after_id, oldest first."""
+    from .models import Notification
+    from .notification_utils import serialize_notification
+
+    notifications = Notification.objects.filter(user_id=user_id, id__gt=after_id).order_by('id')[:limit]
+    return [serialize_notification(notification) for notification in notifications]
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """The process-wide broker named by settings.NOTIFICATION_BROKER."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'NOTIFICATION_BROKER', 'notifications.broker.LocalBroker')
+                _broker = import_string(path)()
+    return _broker
+
+
+def publish_notifications(notifications):
+    """Push freshly committed Notification rows to their users' open streams."""
+    from .notification_utils import serialize_notification
+
+    broker = get_broker()
+    for notification in notifications:
+        try:
+            broker.publish(notification.user_id, serialize_notification(notification))
+        except Exception as e:
+            logger.error(f"Error publishing notification {notification.id}: {e}", exc_info=True)
@@ -0,0 +1,54 @@
+"""
+Deliver queued notifications from the outbox.
+
+Use this when NOTIFICATION_DISPATCH_MODE is 'external' (e.g. from a separate
+worker process or a supervisor), or once to flush the outbox after downtime.
+
+Usage:
+    python manage.py dispatch_notifications --once
+    python manage.py dispatch_notifications --interval 2 --batch-size 200
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from notifications.outbox import dispatch_pending
+
+
+class Command(BaseCommand):
+    help = 'Deliver pending notifications from the outbox in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Deliver everything that is pending and exit instead of polling',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=getattr(settings, 'NOTIFICATION_DISPATCH_BATCH_SIZE', 100),
+            help='Outbox rows delivered per bulk insert',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=getattr(settings, 'NOTIFICATION_DISPATCH_INTERVAL', 5),
+            help='Seconds to sleep when the outbox is empty',
+        )
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+
+        while True:
+            close_old_connections()
+            delivered = dispatch_pending(batch_size=options['batch_size'])
+            if delivered and verbosity >= 1:
+                self.stdout.write(f'Delivered {delivered} notification(s)')
+
+            if options['once']:
+                break
+            if not delivered:
+                time.sleep(options['interval'])
@@ -0,0 +1,183 @@
+"""
+Archive and delete old notifications so the Notification table stays small.
+
+Seen notifications older than NOTIFICATION_RETENTION_DAYS (and, if set,
+unseen ones older than NOTIFICATION_UNSEEN_RETENTION_DAYS) are written to
+gzipped NDJSON files under NOTIFICATION_ARCHIVE_DIR and deleted in batches of
+--batch-size rows. Each batch is archived and flushed before its own short
+DELETE transaction runs, so locks are never held for the whole purge and an
+interrupted run loses nothing. Delivered outbox rows older than
+NOTIFICATION_OUTBOX_RETENTION_DAYS are deleted (not archived) the same way.
+
+Usage:
+    python manage.py purge_notifications --dry-run
+    python manage.py purge_notifications --days 30 --batch-size 5000
+    python manage.py purge_notifications --no-archive
+"""
+import gzip
+import json
+import os
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from notifications.models import Notification, NotificationCounter, NotificationOutbox
+
+ARCHIVE_FIELDS = (
+    'id', 'user_id', 'notification_type', 'title', 'body', 'purchase_id',
+    'seen', 'seen_at', 'data', 'created_at',
+)
+
+
+class Command(BaseCommand):
+    help = 'Archive and delete notifications older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90),
+            help='Purge seen notifications older than this many days',
+        )
+        parser.add_argument(
+            '--unseen-days',
+            type=int,
+            default=getattr(settings, 'NOTIFICATION_UNSEEN_RETENTION_DAYS', None),
+            help='Also purge unseen notifications older than this many days (default: keep them)',
+        )
+        parser.add_argument(
+            '--outbox-days',
+            type=int,
+            default=getattr(settings, 'NOTIFICATION_OUTBOX_RETENTION_DAYS', 7),
+            help='Delete delivered outbox rows older than this many days',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows archived and deleted per transaction (default: 1000)',
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default=getattr(settings, 'NOTIFICATION_ARCHIVE_DIR', None),
+            help='Directory for the NDJSON archive files',
+        )
+        parser.add_argument(
+            '--no-archive',
+            action='store_true',
+            help='Delete without writing an archive',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='Seconds to pause between batches, to leave room for other writers',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows would be purged',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+        if not options['no_archive'] and not options['archive_dir'] and not options['dry_run']:
+            raise CommandError('Set NOTIFICATION_ARCHIVE_DIR, pass --archive-dir or use --no-archive')
+
+        now = timezone.now()
+        expired = Q(seen=True, created_at__lt=now - timedelta(days=options['days']))
+        if options['unseen_days'] is not None:
+            expired |= Q(seen=False, created_at__lt=now - timedelta(days=options['unseen_days']))
+        outbox_expired = Q(
+            processed_at__isnull=False,
+            processed_at__lt=now - timedelta(days=options['outbox_days']),
+        )
+
+        if options['dry_run']:
+            self.stdout.write(f"Would purge {Notification.objects.filter(expired).count()} notification(s) "
+                              f"and {NotificationOutbox.objects.filter(outbox_expired).count()} outbox row(s)")
+            return
+
+        archive = None
+        archive_path = None
+        if not options['no_archive']:
+            os.makedirs(options['archive_dir'], exist_ok=True)
+            archive_path = os.path.join(
+                options['archive_dir'], f"notifications-{now.strftime('%Y%m%d-%H%M%S')}.ndjson.gz"
+            )
+            archive = gzip.open(archive_path, 'wt', encoding='utf-8')
+
+        try:
+            purged = self.purge_notifications(expired, archive, options)
+        finally:
+            if archive:
+                archive.close()
+
+        if archive_path and not purged:
+            os.remove(archive_path)
+            archive_path = None
+
+        outbox_purged = self.purge_outbox(outbox_expired, options)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {purged} notification(s) and {outbox_purged} outbox row(s)"
+            + (f"; archived to {archive_path}" if archive_path else '')
+        ))
+
+    def purge_notifications(self, expired, archive, options):
+        purged = 0
+        while True:
+            rows = list(
+                Notification.objects.filter(expired).order_by('id').values(*ARCHIVE_FIELDS)[:options['batch_size']]
+            )
+            if not rows:
+                break
+
+            # The archive is on disk before anything is deleted
+            if archive:
+                for row in rows:
+                    archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+                archive.flush()
+
+            ids = [row['id'] for row in rows]
+            with transaction.atomic():
+                # Unseen counts come from the locked rows being deleted, not
+                # the snapshot above: a notification seen in the meantime has
+                # already been taken off its user's counter
+                locked = list(
+                    Notification.objects.select_for_update().filter(expired, id__in=ids).values_list('id', 'user_id', 'seen')
+                )
+                deleted, _ = Notification.objects.filter(id__in=[row_id for row_id, _, _ in locked]).delete()
+                unseen = Counter(user_id for _, user_id, seen in locked if not seen)
+                for user_id, count in unseen.items():
+                    NotificationCounter.decrement(user_id, count)
+
+            purged += deleted
+            if self.verbosity >= 2:
+                self.stdout.write(f"  purged {purged} notification(s) so far")
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        return purged
+
+    def purge_outbox(self, expired, options):
+        purged = 0
+        while True:
+            ids = list(
+                NotificationOutbox.objects.filter(expired).order_by('id').values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            deleted, _ = NotificationOutbox.objects.filter(id__in=ids).delete()
+            purged += deleted
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        return purged
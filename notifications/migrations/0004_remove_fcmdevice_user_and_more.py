@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_remove_notification_notificatio_user_id_427e4b_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='fcmdevice',
+            name='user',
+        ),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notificatio_already_7c4ab3_idx',
+        ),
+        migrations.RemoveField(
+            model_name='notification',
+            name='already_sent',
+        ),
+        migrations.RemoveField(
+            model_name='notification',
+            name='fcm_error',
+        ),
+        migrations.RemoveField(
+            model_name='notification',
+            name='fcm_sent',
+        ),
+        migrations.RemoveField(
+            model_name='notification',
+            name='fcm_success',
+        ),
+        migrations.DeleteModel(
+            name='FCMDevice',
+        ),
+    ]
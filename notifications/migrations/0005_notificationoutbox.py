@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_remove_fcmdevice_user_and_more'),
+        ('products', '0006_ledgerentry_unique_sale'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('purchase_created', 'Purchase Created'), ('purchase_pending', 'Purchase Pending'), ('purchase_processing', 'Purchase Processing'), ('purchase_awaiting_pickup', 'Purchase Awaiting Pickup'), ('purchase_awaiting_delivery', 'Purchase Awaiting Delivery'), ('purchase_out_for_delivery', 'Purchase Out for Delivery'), ('purchase_completed', 'Purchase Completed'), ('purchase_cancelled', 'Purchase Cancelled'), ('product_purchased', 'Product Purchased (Vendor)'), ('product_purchase_completed', 'Product Purchase Completed (Vendor)')], max_length=50)),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, help_text='When the notification was delivered or skipped', null=True)),
+                ('claim_token', models.CharField(blank=True, help_text='Dispatcher currently delivering this row', max_length=32, null=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('purchase', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.purchase')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_outbox', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['processed_at', 'id'], name='notificatio_process_6d1505_idx')],
+            },
+        ),
+    ]
@@ -22,9 +22,30 @@ class NotificationPreferences(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Which toggle controls each notification type; unknown types are always allowed
+    TYPE_FIELDS = {
+        'purchase_created': 'purchase_created_enabled',
+        'purchase_pending': 'purchase_status_changed_enabled',
+        'purchase_processing': 'purchase_status_changed_enabled',
+        'purchase_awaiting_pickup': 'purchase_status_changed_enabled',
+        'purchase_awaiting_delivery': 'purchase_status_changed_enabled',
+        'purchase_out_for_delivery': 'purchase_status_changed_enabled',
+        'purchase_completed': 'purchase_completed_enabled',
+        'purchase_cancelled': 'purchase_status_changed_enabled',
+        'product_purchased': 'product_purchased_enabled',
+        'product_purchase_completed': 'product_purchase_completed_enabled',
+    }
+    
     def __str__(self):
         return f"Notification preferences for {self.user.username}"
     
+    def allows(self, notification_type):
+        """Check the master toggle and the toggle for this notification type"""
+        if not self.notifications_enabled:
+            return False
+        field = self.TYPE_FIELDS.get(notification_type)
+        return getattr(self, field) if field else True
+    
     class Meta:
         verbose_name_plural = "Notification preferences"
 
@@ -76,4 +97,106 @@ class Notification(models.Model):
         if not self.seen:
             self.seen = True
             self.seen_at = timezone.now()
-            self.save(update_fields=['seen', 'seen_at'])
+            # Conditional update, so concurrent calls only decrement the counter once
+            updated = Notification.objects.filter(pk=self.pk, seen=False).update(
+                seen=True, seen_at=self.seen_at
+            )
+            if updated:
+                NotificationCounter.decrement(self.user_id, updated)
+
+
+class NotificationCounter(models.Model):
+    """
+    Number of unseen notifications per user, kept up to date on every change
+    so badge polling is a primary-key read instead of a COUNT.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.unread_count} unread"
+    
+    @classmethod
+    def get_unread(cls, user_id):
+        """Unseen notification count for a user (0 if they never had one)"""
+        return cls.objects.filter(user_id=user_id).values_list('unread_count', flat=True).first() or 0
+    
+    @classmethod
+    def increment(cls, counts):
+        """
+        Add new unseen notifications.
+        
+        Args:
+            counts: dict of user id -> number of notifications created
+        """
+        from django.db import IntegrityError, transaction
+        
+        for user_id, count in counts.items():
+            if not count:
+                continue
+            if cls.objects.filter(user_id=user_id).update(
+                unread_count=models.F('unread_count') + count, updated_at=timezone.now()
+            ):
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(user_id=user_id, unread_count=count)
+            except IntegrityError:
+                # Created by a concurrent request in the meantime
+                cls.objects.filter(user_id=user_id).update(
+                    unread_count=models.F('unread_count') + count, updated_at=timezone.now()
+                )
+    
+    @classmethod
+    def decrement(cls, user_id, count=1):
+        """Remove seen notifications from the count, never going below zero"""
+        from django.db.models.functions import Greatest
+        
+        cls.objects.filter(user_id=user_id).update(
+            unread_count=Greatest(models.F('unread_count') - count, 0), updated_at=timezone.now()
+        )
+    
+    @classmethod
+    def recount(cls, user_ids):
+        """Recompute the counters of these users from the Notification table"""
+        unseen = dict(
+            Notification.objects.filter(user_id__in=user_ids, seen=False)
+            .values('user_id').annotate(total=models.Count('id')).values_list('user_id', 'total')
+        )
+        for user_id in user_ids:
+            cls.objects.update_or_create(user_id=user_id, defaults={'unread_count': unseen.get(user_id, 0)})
+
+
+class NotificationOutbox(models.Model):
+    """
+    Notification events waiting to be delivered.
+    
+    Rows are written in the same transaction as the purchase change that
+    caused them and turned into Notification rows by the dispatcher
+    (notifications/outbox.py) after commit, so a rolled-back request never
+    leaves notifications behind.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notification_outbox')
+    notification_type = models.CharField(max_length=50, choices=Notification.NOTIFICATION_TYPES)
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    purchase = models.ForeignKey('products.Purchase', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    data = models.JSONField(default=dict, blank=True)
+    
+    # Delivery bookkeeping
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True, help_text="When the notification was delivered or skipped")
+    claim_token = models.CharField(max_length=32, null=True, blank=True, help_text="Dispatcher currently delivering this row")
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['processed_at', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.notification_type} - {'processed' if self.processed_at else 'pending'}"
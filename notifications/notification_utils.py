@@ -8,6 +8,21 @@ from typing import Dict, Optional
 logger = logging.getLogger(__name__)
 
 
+def serialize_notification(notification) -> Dict:
+    """Serialize a Notification for the list and stream endpoints (no related-object loads)."""
+    return {
+        'id': notification.id,
+        'type': notification.notification_type,
+        'title': notification.title,
+        'body': notification.body,
+        'seen': notification.seen,
+        'seen_at': notification.seen_at.isoformat() if notification.seen_at else None,
+        'created_at': notification.created_at.isoformat(),
+        'data': notification.data,
+        'purchase_id': notification.purchase_id,
+    }
+
+
 def send_notification_to_user(
     user,
     title: str,
@@ -30,20 +45,16 @@ def send_notification_to_user(
     Returns:
         Dictionary with notification instance (if saved)
     """
-    from .models import Notification, NotificationPreferences
+    from .models import Notification
+    from .preferences import MASTER_BIT, get_mask
     
-    # Check if user has notifications enabled
-    try:
-        prefs = NotificationPreferences.objects.get(user=user)
-        if not prefs.notifications_enabled:
-            logger.info(f"Notifications disabled for user {user.username}")
-            return {
-                'success': False,
-                'error': 'Notifications disabled by user'
-            }
-    except NotificationPreferences.DoesNotExist:
-        # Create default preferences if they don't exist
-        prefs = NotificationPreferences.objects.create(user=user)
+    # Check if user has notifications enabled (users without preferences get everything)
+    if not get_mask(user) & MASTER_BIT:
+        logger.info(f"Notifications disabled for user {user.username}")
+        return {
+            'success': False,
+            'error': 'Notifications disabled by user'
+        }
     
     # Create in-app notification
     logger.info(f"Creating in-app notification for user {user.username}: {title}")
@@ -59,6 +70,11 @@ def send_notification_to_user(
             data=data or {},
         )
         logger.info(f"✓ Notification created successfully (ID: {notification.id})")
+        
+        # Push to open streams once the row is visible to other connections
+        from django.db import transaction
+        from .broker import publish_notifications
+        transaction.on_commit(lambda: publish_notifications([notification]))
     
     return {
         'success': True,
@@ -0,0 +1,221 @@
+"""
+Transactional outbox for in-app notifications.
+
+Signal receivers call enqueue_notifications() inside the transaction that
+changes the purchase, so the outbox rows commit or roll back together with it.
+After commit, the dispatcher turns pending rows into Notification rows in
+batches: at most one query for the batch's preferences, one bulk_create, one
+UPDATE to mark the rows processed.
+
+How the dispatcher runs is controlled by settings.NOTIFICATION_DISPATCH_MODE:
+    'thread'   - a daemon thread per process, woken after every commit
+    'inline'   - right after the commit, in the request (development/tests)
+    'external' - only by `python manage.py dispatch_notifications`
+"""
+import logging
+import threading
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue_notifications(events):
+    """
+    Append notification events to the outbox.
+
+    Args:
+        events: iterable of dicts with user, title, body, notification_type
+                and optionally data and purchase
+
+    Returns:
+        List of created NotificationOutbox rows
+    """
+    from .models import NotificationOutbox
+
+    rows = [
+        NotificationOutbox(
+            user=event['user'],
+            notification_type=event['notification_type'],
+            title=event['title'],
+            body=event['body'],
+            data=event.get('data') or {},
+            purchase=event.get('purchase'),
+        )
+        for event in events
+    ]
+    if not rows:
+        return rows
+
+    NotificationOutbox.objects.bulk_create(rows)
+    transaction.on_commit(wake_dispatcher)
+    return rows
+
+
+def enqueue_notification(user, title, body, notification_type, data=None, purchase=None):
+    """Append a single notification event to the outbox."""
+    return enqueue_notifications([{
+        'user': user,
+        'title': title,
+        'body': body,
+        'notification_type': notification_type,
+        'data': data,
+        'purchase': purchase,
+    }])[0]
+
+
+def claim_batch(batch_size=None):
+    """
+    Claim up to batch_size pending rows for this dispatcher.
+
+    Claims older than NOTIFICATION_CLAIM_TIMEOUT seconds are taken over, so a
+    crashed dispatcher never strands its rows. Returns (token, rows).
+    """
+    from .models import NotificationOutbox
+
+    batch_size = batch_size or _setting('NOTIFICATION_DISPATCH_BATCH_SIZE', 100)
+    now = timezone.now()
+    stale = now - timedelta(seconds=_setting('NOTIFICATION_CLAIM_TIMEOUT', 300))
+    claimable = Q(processed_at__isnull=True) & (Q(claim_token__isnull=True) | Q(claimed_at__lt=stale))
+
+    ids = list(
+        NotificationOutbox.objects.filter(claimable).order_by('id').values_list('id', flat=True)[:batch_size]
+    )
+    if not ids:
+        return None, []
+
+    # The claim is a conditional UPDATE, so two dispatchers never get the same row
+    token = uuid.uuid4().hex
+    NotificationOutbox.objects.filter(claimable, id__in=ids).update(claim_token=token, claimed_at=now)
+    rows = list(NotificationOutbox.objects.filter(claim_token=token).order_by('id'))
+    return token, rows
+
+
+def deliver_batch(rows):
+    """
+    Turn claimed outbox rows into Notification rows.
+
+    Preferences come from the per-process cache, with one query for all
+    recipients it does not hold yet.
+
+    Returns:
+        List of created Notification objects
+    """
+    from .broker import publish_notifications
+    from .models import Notification, NotificationCounter, NotificationOutbox
+    from .preferences import allows, get_masks
+
+    masks = get_masks(row.user_id for row in rows)
+
+    notifications = []
+    for row in rows:
+        if not allows(masks[row.user_id], row.notification_type):
+            continue
+        notifications.append(Notification(
+            user_id=row.user_id,
+            notification_type=row.notification_type,
+            title=row.title,
+            body=row.body,
+            purchase_id=row.purchase_id,
+            data=row.data,
+        ))
+
+    unread = Counter(notification.user_id for notification in notifications)
+
+    with transaction.atomic():
+        Notification.objects.bulk_create(notifications)
+        NotificationCounter.increment(unread)
+        NotificationOutbox.objects.filter(id__in=[row.id for row in rows]).update(
+            processed_at=timezone.now(), claim_token=None, last_error=''
+        )
+        transaction.on_commit(lambda: publish_notifications(notifications))
+
+    return notifications
+
+
+def dispatch_pending(batch_size=None, max_batches=None):
+    """
+    Deliver pending outbox rows until none are left (or max_batches is hit).
+
+    Returns:
+        Number of notifications created
+    """
+    from .models import NotificationOutbox
+
+    max_attempts = _setting('NOTIFICATION_MAX_ATTEMPTS', 5)
+    delivered = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        token, rows = claim_batch(batch_size)
+        if not rows:
+            break
+        batches += 1
+
+        try:
+            delivered += len(deliver_batch(rows))
+        except Exception as e:
+            logger.error(f"Error delivering notification batch: {e}", exc_info=True)
+            # Release the claim; rows that keep failing are parked as processed
+            NotificationOutbox.objects.filter(claim_token=token).update(
+                claim_token=None, attempts=F('attempts') + 1, last_error=str(e)
+            )
+            NotificationOutbox.objects.filter(
+                id__in=[row.id for row in rows], attempts__gte=max_attempts
+            ).update(processed_at=timezone.now())
+            break
+
+    return delivered
+
+
+class _DispatcherThread(threading.Thread):
+    """Background thread delivering the outbox for this process."""
+
+    def __init__(self):
+        super().__init__(name='notification-dispatcher', daemon=True)
+        self.wakeup = threading.Event()
+
+    def run(self):
+        interval = _setting('NOTIFICATION_DISPATCH_INTERVAL', 5)
+        while True:
+            self.wakeup.wait(timeout=interval)
+            self.wakeup.clear()
+            try:
+                close_old_connections()
+                dispatch_pending()
+            except Exception as e:
+                logger.error(f"Notification dispatcher error: {e}", exc_info=True)
+            finally:
+                connection.close()
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def wake_dispatcher():
+    """Called after commit: deliver the new outbox rows according to NOTIFICATION_DISPATCH_MODE."""
+    global _dispatcher
+
+    mode = _setting('NOTIFICATION_DISPATCH_MODE', 'thread')
+    if mode == 'inline':
+        try:
+            dispatch_pending()
+        except Exception as e:
+            logger.error(f"Error dispatching notifications: {e}", exc_info=True)
+    elif mode == 'thread':
+        with _dispatcher_lock:
+            if _dispatcher is None or not _dispatcher.is_alive():
+                _dispatcher = _DispatcherThread()
+                _dispatcher.start()
+        _dispatcher.wakeup.set()
@@ -0,0 +1,124 @@
+"""
+Cached notification preference lookups.
+
+Each user's NotificationPreferences row is reduced to a bitmask: one bit for
+the master toggle and one per type toggle. Masks are cached per process for
+NOTIFICATION_PREFERENCES_CACHE_TTL seconds and dropped locally as soon as a
+preferences row is saved or deleted (see signals.py), so checking a type is a
+dict lookup plus a bit test. Users without a preferences row get every
+notification, as before.
+
+Other processes pick up a change when their cached mask expires.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from .models import NotificationPreferences
+
+MASTER_BIT = 1
+
+# Per-type toggles on NotificationPreferences, one bit each after the master bit
+TOGGLE_FIELDS = (
+    'purchase_created_enabled',
+    'purchase_status_changed_enabled',
+    'purchase_completed_enabled',
+    'product_purchased_enabled',
+    'product_purchase_completed_enabled',
+)
+FIELD_BITS = {field: 1 << position for position, field in enumerate(TOGGLE_FIELDS, start=1)}
+
+ALL_ENABLED = MASTER_BIT | sum(FIELD_BITS.values())
+
+# Bits that must all be set for each notification type; unknown types only need the master bit
+TYPE_BITS = {
+    notification_type: MASTER_BIT | FIELD_BITS[field]
+    for notification_type, field in NotificationPreferences.TYPE_FIELDS.items()
+}
+
+# Upper bound on cached users; the cache is simply emptied when it is reached
+MAX_CACHED_USERS = 10000
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _ttl():
+    return getattr(settings, 'NOTIFICATION_PREFERENCES_CACHE_TTL', 300)
+
+
+def mask_for(preferences):
+    """Build the bitmask for a NotificationPreferences instance (or values dict)."""
+    get = preferences.get if isinstance(preferences, dict) else lambda name: getattr(preferences, name)
+    mask = MASTER_BIT if get('notifications_enabled') else 0
+    for field, bit in FIELD_BITS.items():
+        if get(field):
+            mask |= bit
+    return mask
+
+
+def allows(mask, notification_type):
+    """Check a preference mask against a notification type."""
+    required = TYPE_BITS.get(notification_type, MASTER_BIT)
+    return mask & required == required
+
+
+def get_masks(user_ids):
+    """
+    Preference masks for several users, with at most one query for all misses.
+
+    Args:
+        user_ids: iterable of user ids
+
+    Returns:
+        Dict of user id -> mask
+    """
+    user_ids = set(user_ids)
+    now = time.monotonic()
+    masks = {}
+
+    with _lock:
+        for user_id in user_ids:
+            cached = _cache.get(user_id)
+            if cached and cached[1] > now:
+                masks[user_id] = cached[0]
+
+    missing = user_ids - masks.keys()
+    if missing:
+        loaded = {user_id: ALL_ENABLED for user_id in missing}
+        rows = NotificationPreferences.objects.filter(user_id__in=missing).values(
+            'user_id', 'notifications_enabled', *FIELD_BITS
+        )
+        for row in rows:
+            loaded[row['user_id']] = mask_for(row)
+
+        expires = now + _ttl()
+        with _lock:
+            if len(_cache) + len(loaded) > MAX_CACHED_USERS:
+                _cache.clear()
+            for user_id, mask in loaded.items():
+                _cache[user_id] = (mask, expires)
+        masks.update(loaded)
+
+    return masks
+
+
+def get_mask(user):
+    """Preference mask for one user (instance or id)."""
+    user_id = getattr(user, 'pk', user)
+    return get_masks([user_id])[user_id]
+
+
+def is_enabled(user, notification_type):
+    """Whether user (instance or id) wants notifications of this type."""
+    return allows(get_mask(user), notification_type)
+
+
+def invalidate(user_id=None):
+    """Forget the cached mask for one user, or for everyone."""
+    with _lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(user_id, None)
@@ -1,12 +1,19 @@
 """
 Signals for automatically sending notifications when purchase events occur.
+
+Receivers run inside the transaction that changes the purchase and only append
+events to the outbox; the dispatcher in outbox.py creates the Notification rows
+after commit, applying each user's preferences.
 """
 
-from django.db.models.signals import post_save, pre_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from products.models import Purchase
-from .notification_utils import send_notification_to_user
-from .models import NotificationPreferences
+from products.signals import purchases_created, purchases_status_changed
+from .models import Notification, NotificationCounter, NotificationPreferences
+from .outbox import enqueue_notifications
+from . import preferences
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,32 +30,23 @@ def should_send_notification(user, notification_type):
     Returns:
         Boolean indicating whether to send notification
     """
-    try:
-        prefs = NotificationPreferences.objects.get(user=user)
-        
-        # Check master toggle first
-        if not prefs.notifications_enabled:
-            return False
-        
-        # Check specific notification type
-        notification_map = {
-            'purchase_created': prefs.purchase_created_enabled,
-            'purchase_pending': prefs.purchase_status_changed_enabled,
-            'purchase_processing': prefs.purchase_status_changed_enabled,
-            'purchase_awaiting_pickup': prefs.purchase_status_changed_enabled,
-            'purchase_awaiting_delivery': prefs.purchase_status_changed_enabled,
-            'purchase_out_for_delivery': prefs.purchase_status_changed_enabled,
-            'purchase_completed': prefs.purchase_completed_enabled,
-            'purchase_cancelled': prefs.purchase_status_changed_enabled,
-            'product_purchased': prefs.product_purchased_enabled,
-            'product_purchase_completed': prefs.product_purchase_completed_enabled,
-        }
-        
-        return notification_map.get(notification_type, True)
-        
-    except NotificationPreferences.DoesNotExist:
-        # If preferences don't exist, allow notifications (default behavior)
-        return True
+    return preferences.is_enabled(user, notification_type)
+
+
+@receiver(post_save, sender=NotificationPreferences)
+@receiver(post_delete, sender=NotificationPreferences)
+def invalidate_cached_preferences(sender, instance, **kwargs):
+    """Drop the cached preference mask when a user's preferences change."""
+    preferences.invalidate(instance.user_id)
+    # Again after commit, in case another thread cached the old row meanwhile
+    transaction.on_commit(lambda: preferences.invalidate(instance.user_id))
+
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, **kwargs):
+    """Keep the unread counter in step with notifications created one at a time."""
+    if created and not instance.seen:
+        NotificationCounter.increment({instance.user_id: 1})
 
 
 @receiver(post_save, sender=Purchase)
@@ -63,64 +61,60 @@ def notify_on_purchase_created(sender, instance, created, **kwargs):
     if not created:
         return  # Only trigger on creation, not updates
     
-    purchase = instance
+    enqueue_notifications(purchase_created_events(instance))
+
+
+@receiver(purchases_created)
+def notify_on_purchases_created(sender, purchases, **kwargs):
+    """
+    Send creation notifications for purchases written with bulk_create().
+    """
+    events = []
+    for purchase in purchases:
+        events.extend(purchase_created_events(purchase))
+    enqueue_notifications(coalesce_events(events))
+
+
+def purchase_created_events(purchase):
+    """Notification events for the buyer and the vendor of a new purchase."""
     buyer = purchase.buyer
     vendor = purchase.product.user  # Assuming Post model has a 'user' field for vendor
     
-    try:
-        # 1. Notify buyer about purchase confirmation
-        if should_send_notification(buyer, 'purchase_created'):
-            send_notification_to_user(
-                user=buyer,
-                title="Purchase Confirmed! 🎉",
-                body=f"Your order #{purchase.order_id} for {purchase.product.title} has been confirmed.",
-                notification_type='purchase_created',
-                data={
-                    'purchase_id': str(purchase.id),
-                    'order_id': purchase.order_id,
-                    'product_id': str(purchase.product.id),
-                    'status': purchase.status,
-                    'type': 'purchase_created'
-                },
-                save_to_db=True
-            )
-            logger.info(f"Sent purchase confirmation notification to buyer {buyer.username}")
-        
-        # 2. Notify vendor about new purchase (only if not completed yet)
-        if purchase.status != 'completed' and should_send_notification(vendor, 'product_purchased'):
-            send_notification_to_user(
-                user=vendor,
-                title="New Product Purchase! 🛍️",
-                body=f"Your product '{purchase.product.title}' has been purchased (Order #{purchase.order_id}).",
-                notification_type='product_purchased',
-                data={
-                    'purchase_id': str(purchase.id),
-                    'order_id': purchase.order_id,
-                    'product_id': str(purchase.product.id),
-                    'status': purchase.status,
-                    'buyer_username': buyer.username,
-                    'type': 'product_purchased'
-                },
-                save_to_db=True
-            )
-            logger.info(f"Sent new purchase notification to vendor {vendor.username}")
-            
-    except Exception as e:
-        logger.error(f"Error sending purchase creation notifications: {e}", exc_info=True)
-
-
-# Store previous status to detect changes
-_purchase_previous_status = {}
-
-@receiver(pre_save, sender=Purchase)
-def store_previous_status(sender, instance, **kwargs):
-    """Store the previous status before save to detect changes."""
-    if instance.pk:  # Only for existing instances
-        try:
-            old_instance = Purchase.objects.get(pk=instance.pk)
-            _purchase_previous_status[instance.pk] = old_instance.status
-        except Purchase.DoesNotExist:
-            pass
+    # 1. Notify buyer about purchase confirmation
+    events = [{
+        'user': buyer,
+        'title': "Purchase Confirmed! 🎉",
+        'body': f"Your order #{purchase.order_id} for {purchase.product.title} has been confirmed.",
+        'notification_type': 'purchase_created',
+        'purchase': purchase,
+        'data': {
+            'purchase_id': str(purchase.id),
+            'order_id': purchase.order_id,
+            'product_id': str(purchase.product.id),
+            'status': purchase.status,
+            'type': 'purchase_created'
+        },
+    }]
+    
+    # 2. Notify vendor about new purchase (only if not completed yet)
+    if purchase.status != 'completed':
+        events.append({
+            'user': vendor,
+            'title': "New Product Purchase! 🛍️",
+            'body': f"Your product '{purchase.product.title}' has been purchased (Order #{purchase.order_id}).",
+            'notification_type': 'product_purchased',
+            'purchase': purchase,
+            'data': {
+                'purchase_id': str(purchase.id),
+                'order_id': purchase.order_id,
+                'product_id': str(purchase.product.id),
+                'status': purchase.status,
+                'buyer_username': buyer.username,
+                'type': 'product_purchased'
+            },
+        })
+    
+    return events
 
 
 @receiver(post_save, sender=Purchase)
@@ -138,96 +132,164 @@ def notify_on_purchase_status_changed(sender, instance, created, **kwargs):
     if created:
         return  # Already handled by notify_on_purchase_created
     
-    purchase = instance
-    buyer = purchase.buyer
-    vendor = purchase.product.user
+    # Purchase keeps the status it was loaded with until the save completes
+    enqueue_notifications(status_change_events(instance, instance.previous_status))
+
+
+@receiver(purchases_status_changed)
+def notify_on_purchases_status_changed(sender, purchases, previous_statuses, **kwargs):
+    """
+    Send status change notifications for purchases updated in one batch.
+    """
+    events = []
+    for purchase in purchases:
+        events.extend(status_change_events(purchase, previous_statuses.get(purchase.pk)))
+    enqueue_notifications(coalesce_events(events))
+
+
+# Titles and bodies for several same-type events to one user from one batch
+COALESCED_MESSAGES = {
+    'purchase_created': {
+        'title': "Order Confirmed! 🎉",
+        'body': "Your order of {count} items has been confirmed.",
+    },
+    'product_purchased': {
+        'title': "New Product Purchases! 🛍️",
+        'body': "{count} of your products have been purchased by {buyer_username}.",
+    },
+    'purchase_completed': {
+        'title': "Order Completed ✅",
+        'body': "{count} items from your order have been completed. Thank you for shopping with Agaseke!",
+    },
+    'product_purchase_completed': {
+        'title': "Purchases Completed! 🎉",
+        'body': "{count} purchases of your products by {buyer_username} have been completed.",
+    },
+}
+
+
+def coalesce_events(events):
+    """
+    Merge same-type events for the same user into one notification.
     
-    # Get previous status
-    previous_status = _purchase_previous_status.get(purchase.pk)
+    Used for batches (one checkout, one bulk completion), so a buyer gets a
+    single "order confirmed" and each vendor one notification per basket.
+    The merged event keeps every purchase, order and product id in data;
+    purchase_id/order_id point at the first one for older clients.
+    """
+    groups = {}
+    for event in events:
+        groups.setdefault((event['user'].pk, event['notification_type']), []).append(event)
     
-    # Clear stored status
-    if purchase.pk in _purchase_previous_status:
-        del _purchase_previous_status[purchase.pk]
+    coalesced = []
+    for (user_id, notification_type), group in groups.items():
+        message = COALESCED_MESSAGES.get(notification_type)
+        if len(group) == 1 or message is None:
+            coalesced.extend(group)
+            continue
+        
+        first = group[0]['data']
+        data = {
+            'purchase_id': first['purchase_id'],
+            'order_id': first['order_id'],
+            'purchase_ids': [event['data']['purchase_id'] for event in group],
+            'order_ids': [event['data']['order_id'] for event in group],
+            'product_ids': [event['data']['product_id'] for event in group],
+            'item_count': len(group),
+            'status': first['status'],
+            'type': first['type'],
+        }
+        if 'buyer_username' in first:
+            data['buyer_username'] = first['buyer_username']
+        
+        coalesced.append({
+            'user': group[0]['user'],
+            'title': message['title'],
+            'body': message['body'].format(count=len(group), buyer_username=first.get('buyer_username', '')),
+            'notification_type': notification_type,
+            'data': data,
+        })
     
+    return coalesced
+
+
+# Map status to user-friendly messages
+STATUS_MESSAGES = {
+    'pending': {
+        'title': 'Order Pending',
+        'body': "Your order #{order_id} is pending confirmation."
+    },
+    'processing': {
+        'title': 'Order Processing ⚙️',
+        'body': "Your order #{order_id} is being processed."
+    },
+    'awaiting_pickup': {
+        'title': 'Ready for Pickup 📦',
+        'body': "Your order #{order_id} is ready for pickup at Agaseke."
+    },
+    'awaiting_delivery': {
+        'title': 'Ready for Delivery 🚚',
+        'body': "Your order #{order_id} is ready for delivery."
+    },
+    'out_for_delivery': {
+        'title': 'Out for Delivery 🚚',
+        'body': "Your order #{order_id} is out for delivery."
+    },
+    'completed': {
+        'title': 'Order Completed ✅',
+        'body': "Your order #{order_id} has been completed. Thank you for shopping with Agaseke!"
+    },
+    'cancelled': {
+        'title': 'Order Cancelled ❌',
+        'body': "Your order #{order_id} has been cancelled."
+    }
+}
+
+
+def status_change_events(purchase, previous_status):
+    """Notification events for the buyer (and the vendor on completion) after a status change."""
     # If status hasn't changed, don't send notifications
     if previous_status == purchase.status:
-        return
-    
-    try:
-        # Map status to user-friendly messages
-        status_messages = {
-            'pending': {
-                'title': 'Order Pending',
-                'body': f"Your order #{purchase.order_id} is pending confirmation."
-            },
-            'processing': {
-                'title': 'Order Processing ⚙️',
-                'body': f"Your order #{purchase.order_id} is being processed."
-            },
-            'awaiting_pickup': {
-                'title': 'Ready for Pickup 📦',
-                'body': f"Your order #{purchase.order_id} is ready for pickup at Agaseke."
-            },
-            'awaiting_delivery': {
-                'title': 'Ready for Delivery 🚚',
-                'body': f"Your order #{purchase.order_id} is ready for delivery."
-            },
-            'out_for_delivery': {
-                'title': 'Out for Delivery 🚚',
-                'body': f"Your order #{purchase.order_id} is out for delivery."
+        return []
+    
+    buyer = purchase.buyer
+    events = []
+    
+    # 1. Notify buyer about status change
+    if purchase.status in STATUS_MESSAGES:
+        message = STATUS_MESSAGES[purchase.status]
+        events.append({
+            'user': buyer,
+            'title': message['title'],
+            'body': message['body'].format(order_id=purchase.order_id),
+            'notification_type': f"purchase_{purchase.status}",
+            'purchase': purchase,
+            'data': {
+                'purchase_id': str(purchase.id),
+                'order_id': purchase.order_id,
+                'product_id': str(purchase.product.id),
+                'status': purchase.status,
+                'previous_status': previous_status or 'unknown',
+                'type': 'status_change'
             },
-            'completed': {
-                'title': 'Order Completed ✅',
-                'body': f"Your order #{purchase.order_id} has been completed. Thank you for shopping with Agaseke!"
+        })
+    
+    # 2. If status changed to 'completed', notify vendor
+    if purchase.status == 'completed':
+        events.append({
+            'user': purchase.product.user,
+            'title': "Purchase Completed! 🎉",
+            'body': f"Purchase of your product '{purchase.product.title}' (Order #{purchase.order_id}) has been completed.",
+            'notification_type': 'product_purchase_completed',
+            'purchase': purchase,
+            'data': {
+                'purchase_id': str(purchase.id),
+                'order_id': purchase.order_id,
+                'product_id': str(purchase.product.id),
+                'status': purchase.status,
+                'buyer_username': buyer.username,
+                'type': 'purchase_completed'
             },
-            'cancelled': {
-                'title': 'Order Cancelled ❌',
-                'body': f"Your order #{purchase.order_id} has been cancelled."
-            }
-        }
-        
-        # Get notification type based on status
-        notification_type = f"purchase_{purchase.status}"
-        
-        # 1. Notify buyer about status change
-        if purchase.status in status_messages and should_send_notification(buyer, notification_type):
-            message = status_messages[purchase.status]
-            send_notification_to_user(
-                user=buyer,
-                title=message['title'],
-                body=message['body'],
-                notification_type=notification_type,
-                data={
-                    'purchase_id': str(purchase.id),
-                    'order_id': purchase.order_id,
-                    'product_id': str(purchase.product.id),
-                    'status': purchase.status,
-                    'previous_status': previous_status or 'unknown',
-                    'type': 'status_change'
-                },
-                save_to_db=True
-            )
-            logger.info(f"Sent status change notification to buyer {buyer.username}: {previous_status} -> {purchase.status}")
-        
-        # 2. If status changed to 'completed', notify vendor
-        if purchase.status == 'completed' and should_send_notification(vendor, 'product_purchase_completed'):
-            send_notification_to_user(
-                user=vendor,
-                title="Purchase Completed! 🎉",
-                body=f"Purchase of your product '{purchase.product.title}' (Order #{purchase.order_id}) has been completed.",
-                notification_type='product_purchase_completed',
-                data={
-                    'purchase_id': str(purchase.id),
-                    'order_id': purchase.order_id,
-                    'product_id': str(purchase.product.id),
-                    'status': purchase.status,
-                    'buyer_username': buyer.username,
-                    'type': 'purchase_completed'
-                },
-                save_to_db=True
-            )
-            logger.info(f"Sent purchase completed notification to vendor {vendor.username}")
-            
-    except Exception as e:
-        logger.error(f"Error sending status change notifications: {e}", exc_info=True)
-
+        })
+    
+    return events
@@ -13,6 +13,8 @@ urlpatterns = [
     
     # Notification list and management
     path('list', views.list_notifications, name='list_notifications'),
+    path('unread-count', views.unread_count, name='unread_count'),
+    path('stream', views.notification_stream, name='notification_stream'),
     path('<int:notification_id>/seen', views.mark_notification_seen, name='mark_notification_seen'),
     path('seen-all', views.mark_all_notifications_seen, name='mark_all_notifications_seen'),
     
@@ -1,17 +1,29 @@
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from datetime import datetime, timezone as dt_timezone
+from asgiref.sync import sync_to_async
+import asyncio
+import base64
+import binascii
 import json
 import logging
 
-from .models import Notification, NotificationPreferences
-from .notification_utils import send_notification_to_user, get_pending_notifications
+from .models import Notification, NotificationCounter, NotificationPreferences
+from .notification_utils import send_notification_to_user, get_pending_notifications, serialize_notification
 from authentication.decorators import jwt_required
+from authentication.jwt_utils import get_user_id_from_token
 
 logger = logging.getLogger(__name__)
 
+# Upper bound for the limit parameter of list_notifications
+MAX_NOTIFICATIONS_PAGE_SIZE = 100
+
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -152,52 +164,98 @@ def notification_preferences(request):
         }, status=500)
 
 
+def _encode_cursor(notification):
+    """Opaque cursor pointing just past this notification in newest-first order"""
+    raw = f"{notification.created_at.isoformat()}|{notification.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    """Return (created_at, id) from a cursor, or raise ValueError"""
+    try:
+        created_at, notification_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(notification_id)
+    except (TypeError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError(str(e))
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
 @jwt_required
 def list_notifications(request):
     """
-    Get list of notifications for the authenticated user.
+    Get list of notifications for the authenticated user, newest first.
     
     Query parameters:
-    - limit: Number of notifications to return (default: 20)
-    - offset: Offset for pagination (default: 0)
+    - limit: Number of notifications to return (default: 20, max: 100)
+    - cursor: next_cursor from the previous page (keyset pagination)
+    - since: ISO 8601 timestamp; only notifications created after it are returned
+    - offset: Offset for pagination (legacy clients; ignored when cursor is given)
     - unseen_only: Return only unseen notifications (default: false)
+    
+    total_count is not computed for cursor pages (it is null there); clients
+    take it from the first page.
     """
     user = request.user
     
     try:
-        limit = int(request.GET.get('limit', 20))
-        offset = int(request.GET.get('offset', 0))
+        try:
+            limit = min(max(int(request.GET.get('limit', 20)), 1), MAX_NOTIFICATIONS_PAGE_SIZE)
+            offset = int(request.GET.get('offset', 0))
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'error': 'limit and offset must be integers'
+            }, status=400)
         unseen_only = request.GET.get('unseen_only', 'false').lower() == 'true'
+        cursor = request.GET.get('cursor')
+        since = request.GET.get('since')
         
-        # Query notifications
-        notifications = Notification.objects.filter(user=user)
+        # Query notifications; (created_at, id) order is served by the (user, -created_at) index
+        notifications = Notification.objects.filter(user=user).order_by('-created_at', '-id')
         
         if unseen_only:
             notifications = notifications.filter(seen=False)
         
-        # Get total count and stats
-        total_count = notifications.count()
-        unseen_count = Notification.objects.filter(user=user, seen=False).count()
+        if since:
+            since_at = parse_datetime(since.replace(' ', '+'))
+            if since_at is None:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'since must be an ISO 8601 timestamp'
+                }, status=400)
+            if timezone.is_naive(since_at):
+                since_at = timezone.make_aware(since_at, dt_timezone.utc)
+            notifications = notifications.filter(created_at__gt=since_at)
         
-        # Apply pagination
-        notifications = notifications[offset:offset + limit]
+        # Get total count and stats (unseen comes from the counter row)
+        unseen_count = NotificationCounter.get_unread(user.id)
+        if cursor:
+            total_count = None
+        elif unseen_only and not since:
+            total_count = unseen_count
+        else:
+            total_count = notifications.count()
+        
+        # Apply pagination; one extra row tells whether there is another page
+        if cursor:
+            try:
+                cursor_at, cursor_id = _decode_cursor(cursor)
+            except ValueError:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Invalid cursor'
+                }, status=400)
+            notifications = notifications.filter(
+                Q(created_at__lt=cursor_at) | Q(created_at=cursor_at, id__lt=cursor_id)
+            )
+            offset = 0
+        page = list(notifications[offset:offset + limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
         
         # Serialize notifications
-        notifications_data = []
-        for notif in notifications:
-            notifications_data.append({
-                'id': notif.id,
-                'type': notif.notification_type,
-                'title': notif.title,
-                'body': notif.body,
-                'seen': notif.seen,
-                'seen_at': notif.seen_at.isoformat() if notif.seen_at else None,
-                'created_at': notif.created_at.isoformat(),
-                'data': notif.data,
-                'purchase_id': notif.purchase.id if notif.purchase else None,
-            })
+        notifications_data = [serialize_notification(notif) for notif in page]
         
         return JsonResponse({
             'success': True,
@@ -205,7 +263,9 @@ def list_notifications(request):
             'total_count': total_count,
             'unseen_count': unseen_count,
             'limit': limit,
-            'offset': offset
+            'offset': offset,
+            'has_more': has_more,
+            'next_cursor': _encode_cursor(page[-1]) if has_more else None,
         })
         
     except Exception as e:
@@ -216,6 +276,145 @@ def list_notifications(request):
         }, status=500)
 
 
+@csrf_exempt
+@require_http_methods(["GET"])
+def unread_count(request):
+    """
+    Get the number of unseen notifications, for badge polling.
+    
+    Reads the user's counter row by primary key; the token is verified but
+    the user itself is not loaded.
+    """
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return JsonResponse({
+            'success': False,
+            'message': 'Authentication required',
+            'errors': {'auth': ['Please provide a valid JWT token in Authorization header']}
+        }, status=401)
+    
+    user_id = get_user_id_from_token(auth_header.replace('Bearer ', ''))
+    if not user_id:
+        return JsonResponse({
+            'success': False,
+            'message': 'Invalid or expired token',
+            'errors': {'auth': ['Invalid or expired JWT token']}
+        }, status=401)
+    
+    try:
+        return JsonResponse({
+            'success': True,
+            'unseen_count': NotificationCounter.get_unread(user_id)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error reading unread notification count: {e}", exc_info=True)
+        return JsonResponse({
+            'success': False,
+            'error': 'Internal server error'
+        }, status=500)
+
+
+# Notifications fetched per query while replaying a reconnected stream
+REPLAY_PAGE_SIZE = 100
+
+
+@sync_to_async
+def _latest_notification_id(user_id):
+    return Notification.objects.filter(user_id=user_id).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+async def notification_stream(request):
+    """
+    Server-Sent Events stream of new notifications (serve under ASGI).
+    
+    Authentication: Authorization: Bearer <token> header, or ?token= for
+    EventSource clients that cannot set headers.
+    
+    Each notification is sent as an event with its id, so browsers resume
+    from the Last-Event-ID header automatically after a reconnect (or pass
+    ?last_event_id=); anything missed in between is replayed first, page by
+    page. If more than NOTIFICATION_STREAM_MAX_REPLAY were missed, a "gap"
+    event is sent instead of the rest, and the client should refetch through
+    list_notifications; the stream then continues from the newest one. A comment
+    line is sent every NOTIFICATION_STREAM_HEARTBEAT seconds to keep proxies
+    from closing the connection, and the stream ends after
+    NOTIFICATION_STREAM_TIMEOUT seconds so clients reconnect with a fresh token.
+    """
+    from django.conf import settings
+    from .broker import fetch_notifications_after, get_broker
+    
+    auth_header = request.headers.get('Authorization', '')
+    token = auth_header.replace('Bearer ', '') if auth_header.startswith('Bearer ') else request.GET.get('token')
+    user_id = get_user_id_from_token(token) if token else None
+    if not user_id:
+        return JsonResponse({
+            'success': False,
+            'message': 'Authentication required',
+            'errors': {'auth': ['Please provide a valid JWT token']}
+        }, status=401)
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_id = None
+    
+    heartbeat = getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT', 15)
+    timeout = getattr(settings, 'NOTIFICATION_STREAM_TIMEOUT', 1800)
+    max_replay = getattr(settings, 'NOTIFICATION_STREAM_MAX_REPLAY', 1000)
+    
+    async def events():
+        nonlocal last_id
+        replay = last_id is not None
+        if not replay:
+            last_id = await _latest_notification_id(user_id)
+        
+        # Subscribe before replaying so nothing published in between is missed
+        subscription = get_broker().subscribe(user_id, after_id=last_id)
+        try:
+            yield "retry: 5000\n\n"
+            if replay:
+                # Page until caught up with the subscription; later
+                # notifications arrive through it
+                replayed = 0
+                while True:
+                    page = await fetch_notifications_after(user_id, last_id, limit=REPLAY_PAGE_SIZE)
+                    if replayed + len(page) > max_replay:
+                        # Too many missed to stream; the client refetches the list
+                        last_id = await _latest_notification_id(user_id)
+                        yield f"id: {last_id}\nevent: gap\ndata: {json.dumps({'last_event_id': last_id})}\n\n"
+                        break
+                    for payload in page:
+                        last_id = payload['id']
+                        yield f"id: {payload['id']}\nevent: notification\ndata: {json.dumps(payload)}\n\n"
+                    replayed += len(page)
+                    if len(page) < REPLAY_PAGE_SIZE:
+                        break
+            
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            while loop.time() < deadline:
+                payloads = await subscription.get(timeout=min(heartbeat, max(deadline - loop.time(), 0)))
+                if not payloads:
+                    yield ": heartbeat\n\n"
+                    continue
+                for payload in payloads:
+                    if payload['id'] <= last_id:
+                        continue  # Already sent during replay
+                    last_id = payload['id']
+                    yield f"id: {payload['id']}\nevent: notification\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            subscription.close()
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 @jwt_required
@@ -258,13 +457,17 @@ def mark_all_notifications_seen(request):
     
     try:
         from django.utils import timezone
-        updated_count = Notification.objects.filter(
-            user=user,
-            seen=False
-        ).update(
-            seen=True,
-            seen_at=timezone.now()
-        )
+        with transaction.atomic():
+            updated_count = Notification.objects.filter(
+                user=user,
+                seen=False
+            ).update(
+                seen=True,
+                seen_at=timezone.now()
+            )
+            # Subtract what was marked rather than zeroing, so notifications
+            # created meanwhile still count
+            NotificationCounter.decrement(user.id, updated_count)
         
         return JsonResponse({
             'success': True,
@@ -1,5 +1,6 @@
 from django.db import models
 from users.models import User
+from users import counters
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
@@ -108,6 +109,48 @@ class Post(models.Model):
     def is_sold_out(self):
         return self.inventory <= 0
     
+    def reserve_stock(self, quantity):
+        """
+        Atomically take quantity units out of stock and count the purchase.
+        
+        Issues a single conditional UPDATE, so concurrent buyers can never push
+        inventory below zero and no other column is rewritten. Returns False
+        when fewer than quantity units are left.
+        """
+        from products.cart_cache import invalidate_products
+        reserved = counters.increment(
+            self, condition=models.Q(inventory__gte=quantity), inventory=-quantity, total_purchases=1
+        )
+        if reserved:
+            invalidate_products([self.pk])
+        return reserved
+    
+    @classmethod
+    def reserve_basket(cls, items):
+        """
+        Reserve stock for a whole basket in one conditional UPDATE.
+        
+        items maps product id -> (quantity, purchase_count). Every row is only
+        decremented while it still holds enough stock, and the call returns
+        False unless all of them were; run it inside transaction.atomic() and
+        roll back on False so a partial reservation is never committed.
+        """
+        if not items:
+            return True
+        
+        in_stock = models.Q()
+        deltas = {}
+        for product_id, (quantity, purchase_count) in items.items():
+            in_stock |= models.Q(pk=product_id, inventory__gte=quantity)
+            deltas[product_id] = {'inventory': -quantity, 'total_purchases': purchase_count}
+        
+        from products.cart_cache import invalidate_products
+        reserved = counters.increment_many(cls, deltas, condition=in_stock) == len(items)
+        if reserved:
+            # Other carts holding these products may now be short of stock
+            invalidate_products(list(items))
+        return reserved
+    
     def discount_percentage(self):
         """Calculate discount percentage if this is a great deal"""
         if self.is_great_deal and self.original_price and self.original_price > 0:
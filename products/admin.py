@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Purchase, ProductImage, Cart, CartItem
+from .models import Purchase, ProductImage, Cart, CartItem, VendorDailyStats, LedgerEntry, VendorBalance, VendorPayout
 
 class PurchaseAdmin(admin.ModelAdmin):
     list_display = ('buyer', 'product', 'quantity', 'status', 'created_at')
@@ -70,6 +70,51 @@ class CartItemAdmin(admin.ModelAdmin):
     is_available_display.short_description = 'Stock Status'
 
 
+@admin.register(VendorDailyStats)
+class VendorDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('vendor', 'date', 'sales_count', 'quantity', 'revenue', 'commission', 'delivery_fees')
+    list_filter = ('date',)
+    search_fields = ('vendor__username',)
+    date_hierarchy = 'date'
+    readonly_fields = ('updated_at',)
+
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    """Read-only: the ledger is append-only."""
+    list_display = ('id', 'entry_type', 'account', 'vendor', 'amount', 'balance_after', 'purchase', 'created_at')
+    list_filter = ('entry_type', 'account')
+    search_fields = ('vendor__username', 'purchase__order_id', 'transaction_id')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(VendorBalance)
+class VendorBalanceAdmin(admin.ModelAdmin):
+    list_display = ('vendor', 'balance', 'total_earned', 'total_paid', 'updated_at')
+    search_fields = ('vendor__username',)
+    readonly_fields = ('balance', 'total_earned', 'total_paid', 'last_entry', 'updated_at')
+
+
+@admin.register(VendorPayout)
+class VendorPayoutAdmin(admin.ModelAdmin):
+    list_display = ('vendor', 'amount', 'reference', 'created_at')
+    search_fields = ('vendor__username', 'reference')
+    readonly_fields = ('vendor', 'amount', 'created_at')
+    
+    def has_add_permission(self, request):
+        # Payouts are recorded with pay_vendors so they reach the ledger
+        return False
+
+
 # Register your models here.
 admin.site.register(Purchase, PurchaseAdmin)
 admin.site.register(ProductImage)
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""
+Cached cart summaries for the cart badge.
+
+A user's summary (lines, item count, total price and whether any line is no
+longer in stock) is computed with one aggregate query and kept in the Django
+cache for CART_SUMMARY_CACHE_TTL seconds, so polling the badge costs no query
+while the cart is unchanged. It is dropped when the cart changes (the cart
+endpoints and checkout, via invalidate()) and when a product in it is saved
+or its stock is reserved (invalidate_products()).
+
+Like the notification preference cache, entries are dropped both right away
+and again after commit, so a reader racing the transaction cannot keep the
+old summary cached.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from posts.models import Post
+
+from .models import CartItem
+
+KEY = 'cart-summary:{}'
+
+
+def _ttl():
+    return getattr(settings, 'CART_SUMMARY_CACHE_TTL', 600)
+
+
+def cart_totals(items):
+    """
+    Item count and total price of cart lines in one aggregate query.
+
+    Args:
+        items: CartItem queryset
+
+    Returns:
+        Dict with item_count (lines), total_items (units), total_price
+        (Decimal) and unavailable_count (lines with too little stock)
+    """
+    totals = items.order_by().aggregate(
+        item_count=Count('id'),
+        total_items=Sum('quantity'),
+        total_price=Sum(F('quantity') * F('product__price'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+        unavailable_count=Count('id', filter=Q(product__inventory__lt=F('quantity'))),
+    )
+    return {
+        'item_count': totals['item_count'],
+        'total_items': totals['total_items'] or 0,
+        'total_price': totals['total_price'] or Decimal('0.00'),
+        'unavailable_count': totals['unavailable_count'],
+    }
+
+
+def get_summary(user_id):
+    """Cart badge summary for a user id, from the cache when possible."""
+    key = KEY.format(user_id)
+    summary = cache.get(key)
+    if summary is None:
+        totals = cart_totals(CartItem.objects.filter(cart__user_id=user_id))
+        summary = {
+            'item_count': totals['item_count'],
+            'total_items': totals['total_items'],
+            'total_price': float(totals['total_price']),
+            'has_unavailable_items': totals['unavailable_count'] > 0,
+        }
+        cache.set(key, summary, _ttl())
+    return summary
+
+
+def invalidate(user_id):
+    """Drop a user's cached summary after their cart changed."""
+    key = KEY.format(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def invalidate_products(product_ids):
+    """Drop the cached summary of every user with one of these products in their cart."""
+    user_ids = set(
+        CartItem.objects.filter(product_id__in=product_ids).values_list('cart__user_id', flat=True)
+    )
+    if not user_ids:
+        return
+    keys = [KEY.format(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+@receiver(post_save, sender=Post)
+@receiver(pre_delete, sender=Post)
+def invalidate_carts_with_product(sender, instance, created=False, **kwargs):
+    """A product's price or stock may have changed (or it is going away with its cart lines)."""
+    if not created:
+        invalidate_products([instance.pk])
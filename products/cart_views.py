@@ -7,8 +7,10 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.shortcuts import get_object_or_404
 
+from products.cart_cache import get_summary, invalidate as invalidate_cart_summary
 from products.models import Cart, CartItem
 from posts.models import Post
+from authentication.jwt_utils import get_user_id_from_token
 from authentication.utils import get_token_user
 from authentication.serializers_helpers import serialize_post
 
@@ -30,12 +32,17 @@ def view_cart_api(request):
         # Get or create cart for user
         cart, created = Cart.objects.get_or_create(user=user)
         
-        # Serialize cart items
+        # Serialize cart items, adding up the totals in the same pass
         cart_items_data = []
+        total_items = 0
+        total_price = Decimal('0.00')
         for item in cart.items.all().select_related('product', 'product__category', 'product__user'):
             # Check if product is still available
             is_available = item.product.inventory >= item.quantity
             is_sold_out = item.product.inventory == 0
+            subtotal = item.subtotal()
+            total_items += item.quantity
+            total_price += subtotal
             
             cart_items_data.append({
                 'id': item.id,
@@ -60,7 +67,7 @@ def view_cart_api(request):
                     }
                 },
                 'quantity': item.quantity,
-                'subtotal': float(item.subtotal()),
+                'subtotal': float(subtotal),
                 'is_available': is_available,
                 'is_sold_out': is_sold_out,
                 'added_at': item.added_at.isoformat(),
@@ -73,8 +80,8 @@ def view_cart_api(request):
             'data': {
                 'cart_id': cart.id,
                 'items': cart_items_data,
-                'total_items': cart.total_items(),
-                'total_price': float(cart.total_price()),
+                'total_items': total_items,
+                'total_price': float(total_price),
                 'created_at': cart.created_at.isoformat(),
                 'updated_at': cart.updated_at.isoformat()
             }
@@ -190,6 +197,9 @@ def add_to_cart_api(request):
         else:
             action = 'added'
         
+        invalidate_cart_summary(user.pk)
+        totals = cart.totals()
+        
         return JsonResponse({
             'success': True,
             'message': f'Item {action} to cart successfully',
@@ -199,8 +209,8 @@ def add_to_cart_api(request):
                 'product_title': product.title,
                 'quantity': cart_item.quantity,
                 'subtotal': float(cart_item.subtotal()),
-                'total_items': cart.total_items(),
-                'total_price': float(cart.total_price()),
+                'total_items': totals['total_items'],
+                'total_price': float(totals['total_price']),
                 'action': action
             }
         }, status=201 if item_created else 200)
@@ -279,6 +289,9 @@ def update_cart_item_api(request, item_id):
         cart_item.quantity = quantity
         cart_item.save()
         
+        invalidate_cart_summary(user.pk)
+        totals = cart_item.cart.totals()
+        
         return JsonResponse({
             'success': True,
             'message': 'Cart item updated successfully',
@@ -287,8 +300,8 @@ def update_cart_item_api(request, item_id):
                 'product_id': cart_item.product.id,
                 'quantity': cart_item.quantity,
                 'subtotal': float(cart_item.subtotal()),
-                'total_items': cart_item.cart.total_items(),
-                'total_price': float(cart_item.cart.total_price())
+                'total_items': totals['total_items'],
+                'total_price': float(totals['total_price'])
             }
         }, status=200)
         
@@ -328,13 +341,16 @@ def remove_from_cart_api(request, item_id):
         # Delete cart item
         cart_item.delete()
         
+        invalidate_cart_summary(user.pk)
+        totals = cart.totals()
+        
         return JsonResponse({
             'success': True,
             'message': f'{product_title} removed from cart',
             'data': {
                 'removed_item_id': item_id,
-                'total_items': cart.total_items(),
-                'total_price': float(cart.total_price())
+                'total_items': totals['total_items'],
+                'total_price': float(totals['total_price'])
             }
         }, status=200)
         
@@ -402,3 +418,37 @@ def clear_cart_api(request):
             'errors': {'server': [str(e)]}
         }, status=500)
 
+
+@csrf_exempt
+@require_http_methods(['GET'])
+def cart_summary_api(request):
+    """
+    API endpoint for the cart badge: item count, total and stock warning.
+    
+    Served from the cached cart summary (products/cart_cache.py); the token is
+    verified but the user itself is not loaded.
+    """
+    auth_header = request.headers.get('Authorization')
+    user_id = None
+    if auth_header and auth_header.startswith('Bearer '):
+        user_id = get_user_id_from_token(auth_header.replace('Bearer ', ''))
+    if not user_id:
+        return JsonResponse({
+            'success': False,
+            'message': 'Authentication required',
+            'errors': {'auth': ['Please provide valid authentication credentials']}
+        }, status=401)
+    
+    try:
+        return JsonResponse({
+            'success': True,
+            'message': 'Cart summary retrieved successfully',
+            'data': get_summary(user_id)
+        }, status=200)
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': 'Error retrieving cart summary',
+            'errors': {'server': [str(e)]}
+        }, status=500)
@@ -0,0 +1,130 @@
+"""
+Vendor balance ledger.
+
+What the platform owes each vendor is kept in an append-only double-entry
+ledger (LedgerEntry) with a running VendorBalance row per vendor, so one
+vendor's outstanding balance, or every vendor due a payout, is read from one
+indexed table instead of summing their unpaid purchases. record_sales() runs
+in the transaction that completes purchases and record_payout() in the one
+that pays a vendor; the reconcile_ledger command checks the ledger against
+Purchase.
+"""
+import uuid
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import LedgerEntry, Purchase, VendorBalance, VendorPayout
+
+
+def _locked_balances(vendor_ids):
+    """VendorBalance rows by vendor id, created if missing and locked until the transaction ends."""
+    existing = set(VendorBalance.objects.filter(vendor_id__in=vendor_ids).values_list('vendor_id', flat=True))
+    for vendor_id in sorted(set(vendor_ids) - existing):
+        try:
+            with transaction.atomic():
+                VendorBalance.objects.create(vendor_id=vendor_id)
+        except IntegrityError:
+            pass  # Created by a concurrent request
+
+    # A consistent order keeps concurrent batches from deadlocking
+    locked = VendorBalance.objects.select_for_update().filter(vendor_id__in=vendor_ids).order_by('vendor_id')
+    return {balance.vendor_id: balance for balance in locked}
+
+
+def _save_balances(balances, entries):
+    for entry in entries:
+        if entry.account == 'vendor_payable':
+            balances[entry.vendor_id].last_entry = entry
+    for balance in balances.values():
+        balance.save(update_fields=['balance', 'total_earned', 'total_paid', 'last_entry', 'updated_at'])
+
+
+def record_sales(purchases):
+    """
+    Post newly completed purchases to the ledger.
+
+    Each purchase becomes one transaction: cash is debited with what the buyer
+    paid, and the vendor's payable and the agaseke commission are credited
+    with its payment split. Amounts are read back as stored, so the ledger
+    matches Purchase to the cent. Purchases already posted are skipped (and
+    the ledger's constraint refuses a second sale). Call it in the
+    transaction that completes the purchases.
+    """
+    stored = list(
+        Purchase.objects.filter(pk__in=[purchase.pk for purchase in purchases], status='completed')
+        .exclude(ledger_entries__entry_type='sale')
+        .values_list('pk', 'product__user_id', 'vendor_payment_amount', 'agaseke_commission_amount')
+        .order_by('product__user_id', 'pk')
+    )
+    if not stored:
+        return
+
+    with transaction.atomic():
+        balances = _locked_balances({vendor_id for _, vendor_id, _, _ in stored})
+        entries = []
+        for purchase_id, vendor_id, vendor_amount, commission in stored:
+            vendor_amount = vendor_amount or Decimal('0')
+            commission = commission or Decimal('0')
+            balance = balances[vendor_id]
+            balance.balance += vendor_amount
+            balance.total_earned += vendor_amount
+
+            legs = {'transaction_id': uuid.uuid4(), 'entry_type': 'sale', 'purchase_id': purchase_id}
+            entries += [
+                LedgerEntry(account='cash', amount=-(vendor_amount + commission), **legs),
+                LedgerEntry(account='vendor_payable', vendor_id=vendor_id, amount=vendor_amount,
+                            balance_after=balance.balance, **legs),
+                LedgerEntry(account='commission', amount=commission, **legs),
+            ]
+
+        LedgerEntry.objects.bulk_create(entries)
+        _save_balances(balances, entries)
+
+
+def record_payout(vendor_id, reference=''):
+    """
+    Pay out a vendor's whole outstanding balance.
+
+    Debits the vendor's payable and credits cash, and flags the vendor's
+    completed purchases as paid. Returns the VendorPayout, or None when
+    nothing is owed.
+    """
+    with transaction.atomic():
+        balance = VendorBalance.objects.select_for_update().filter(vendor_id=vendor_id).first()
+        if balance is None or balance.balance <= 0:
+            return None
+
+        amount = balance.balance
+        payout = VendorPayout.objects.create(vendor_id=vendor_id, amount=amount, reference=reference)
+        balance.balance -= amount
+        balance.total_paid += amount
+
+        legs = {'transaction_id': uuid.uuid4(), 'entry_type': 'payout', 'payout': payout}
+        entries = [
+            LedgerEntry(account='vendor_payable', vendor_id=vendor_id, amount=-amount,
+                        balance_after=balance.balance, **legs),
+            LedgerEntry(account='cash', amount=amount, **legs),
+        ]
+        LedgerEntry.objects.bulk_create(entries)
+        _save_balances({vendor_id: balance}, entries)
+
+        # Sales are posted under the same lock, so everything completed so far
+        # is covered by this payout
+        Purchase.objects.filter(
+            product__user_id=vendor_id, status='completed', vendor_payment_sent=False
+        ).update(vendor_payment_sent=True, updated_at=timezone.now())
+    return payout
+
+
+def outstanding_balances(min_amount=Decimal('0.01')):
+    """Vendors owed at least min_amount, largest balance first (uses the balance index)."""
+    return VendorBalance.objects.filter(balance__gte=min_amount).select_related('vendor').order_by('-balance')
+
+
+def vendor_balance(vendor):
+    """What is currently owed to a vendor (user or id)."""
+    vendor_id = getattr(vendor, 'pk', vendor)
+    balance = VendorBalance.objects.filter(vendor_id=vendor_id).values_list('balance', flat=True).first()
+    return balance or Decimal('0')
@@ -0,0 +1,75 @@
+"""
+Pay out the outstanding balance of every vendor due a payout.
+
+The batch is read from VendorBalance in one indexed query. Each vendor is
+then paid in its own transaction, which appends the payout to the ledger and
+flags the vendor's completed purchases as paid.
+
+Usage:
+    python manage.py pay_vendors --dry-run
+    python manage.py pay_vendors --min-amount 1000 --reference BATCH-2025-01
+    python manage.py pay_vendors --vendor 12
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.ledger import outstanding_balances, record_payout
+
+
+class Command(BaseCommand):
+    help = 'Record payouts of outstanding vendor balances'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-amount',
+            default='0.01',
+            help='Only pay vendors owed at least this much (default: 0.01)',
+        )
+        parser.add_argument(
+            '--vendor',
+            type=int,
+            action='append',
+            dest='vendor_ids',
+            help='Only pay this vendor id (can be repeated)',
+        )
+        parser.add_argument(
+            '--reference',
+            default='',
+            help='Transfer reference stored on every payout of this batch',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only list the vendors that would be paid',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            min_amount = Decimal(options['min_amount'])
+        except InvalidOperation:
+            raise CommandError('--min-amount must be a number')
+
+        batch = outstanding_balances(min_amount)
+        if options['vendor_ids']:
+            batch = batch.filter(vendor_id__in=options['vendor_ids'])
+        batch = list(batch)
+
+        if options['dry_run']:
+            for balance in batch:
+                self.stdout.write(f"  {balance.vendor.username}: {balance.balance}")
+            self.stdout.write(f"Would pay {len(batch)} vendor(s) "
+                              f"a total of {sum((balance.balance for balance in batch), Decimal('0'))}")
+            return
+
+        paid = 0
+        total = Decimal('0')
+        for balance in batch:
+            payout = record_payout(balance.vendor_id, reference=options['reference'])
+            if payout is None:
+                continue  # Paid by a concurrent run
+            paid += 1
+            total += payout.amount
+            self.stdout.write(f"  paid {payout.amount} to {balance.vendor.username}")
+
+        self.stdout.write(self.style.SUCCESS(f"Paid {paid} vendor(s) a total of {total}"))
@@ -0,0 +1,37 @@
+"""
+Recompute the VendorDailyStats rollup from completed purchases.
+
+The rollup is kept up to date as purchases complete; run this after importing
+or editing purchases outside the API, or to check for drift.
+
+Usage:
+    python manage.py rebuild_vendor_stats
+    python manage.py rebuild_vendor_stats --vendor 12 --vendor 15
+"""
+from django.core.management.base import BaseCommand
+
+from products.models import VendorDailyStats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-vendor daily sales rollup from completed purchases'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--vendor',
+            type=int,
+            action='append',
+            dest='vendor_ids',
+            help='Only rebuild this vendor id (can be repeated)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows inserted per query (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        written = VendorDailyStats.rebuild(options['vendor_ids'], batch_size=options['batch_size'])
+        scope = f"{len(options['vendor_ids'])} vendor(s)" if options['vendor_ids'] else 'all vendors'
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} daily row(s) for {scope}"))
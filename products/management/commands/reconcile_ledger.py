@@ -0,0 +1,153 @@
+"""
+Check the vendor ledger against Purchase.
+
+For every vendor, the ledger's credits must equal the vendor payments of
+their completed purchases, its debits the payments of those flagged as sent,
+and the VendorBalance snapshot (and the balance_after of its last entry) the
+ledger's sum. Every ledger transaction must also sum to zero. Each check is
+one grouped query.
+
+The ledger itself is append-only and never changed here; --fix-balances only
+rewrites VendorBalance snapshots from it. Exits with an error while any
+mismatch remains, so it can alert from cron.
+
+Usage:
+    python manage.py reconcile_ledger
+    python manage.py reconcile_ledger --vendor 12 --fix-balances
+"""
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import Round
+
+from products.models import LedgerEntry, Purchase, VendorBalance
+
+ZERO = Decimal('0.00')
+
+# Sums are compared to the cent; SQLite adds decimals as floats
+CENT = Decimal('0.01')
+
+
+def cents(value):
+    return Decimal(value or 0).quantize(CENT)
+
+
+class Command(BaseCommand):
+    help = 'Verify vendor ledger balances against completed purchases'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--vendor',
+            type=int,
+            action='append',
+            dest='vendor_ids',
+            help='Only check this vendor id (can be repeated)',
+        )
+        parser.add_argument(
+            '--fix-balances',
+            action='store_true',
+            help='Rewrite VendorBalance rows that disagree with the ledger',
+        )
+
+    def handle(self, *args, **options):
+        vendor_ids = options['vendor_ids']
+        problems = []
+
+        unbalanced = (
+            LedgerEntry.objects.values('transaction_id')
+            .annotate(total=Sum('amount'))
+            .filter(Q(total__gte=CENT / 2) | Q(total__lte=-CENT / 2))
+            .order_by()
+        )
+        if vendor_ids:
+            unbalanced = unbalanced.filter(
+                transaction_id__in=LedgerEntry.objects.filter(vendor_id__in=vendor_ids).values('transaction_id')
+            )
+        for row in unbalanced:
+            problems.append(f"transaction {row['transaction_id']} is off by {cents(row['total'])}")
+
+        ledger = self.ledger_totals(vendor_ids)
+        purchases = self.purchase_totals(vendor_ids)
+        balances = self.balance_snapshots(vendor_ids)
+
+        to_fix = []
+        for vendor_id in sorted(set(ledger) | set(purchases) | set(balances)):
+            earned, paid, total = ledger.get(vendor_id, (ZERO, ZERO, ZERO))
+            purchase_earned, purchase_paid = purchases.get(vendor_id, (ZERO, ZERO))
+            if earned != purchase_earned:
+                problems.append(f"vendor {vendor_id}: ledger credits {earned}, completed purchases {purchase_earned}")
+            if paid != purchase_paid:
+                problems.append(f"vendor {vendor_id}: ledger payouts {paid}, purchases flagged paid {purchase_paid}")
+
+            if vendor_id in ledger and balances.get(vendor_id, {}).get('last_balance_after') != total:
+                problems.append(f"vendor {vendor_id}: running balance of the last entry differs from the ledger sum {total}")
+
+            snapshot = balances.get(vendor_id, {}).get('totals')
+            if snapshot != (total, earned, paid):
+                to_fix.append((vendor_id, total, earned, paid))
+                if not options['fix_balances']:
+                    problems.append(f"vendor {vendor_id}: balance snapshot {snapshot}, ledger {(total, earned, paid)}")
+
+        if options['fix_balances'] and to_fix:
+            self.fix_balances(to_fix)
+            self.stdout.write(f"Rewrote {len(to_fix)} balance snapshot(s)")
+
+        for problem in problems:
+            self.stderr.write(f"  {problem}")
+        checked = len(set(ledger) | set(purchases))
+        if problems:
+            raise CommandError(f"{len(problems)} mismatch(es) across {checked} vendor(s)")
+        self.stdout.write(self.style.SUCCESS(f"Ledger matches purchases for {checked} vendor(s)"))
+
+    def ledger_totals(self, vendor_ids):
+        """vendor id -> (credits, debits, balance) of their payable account."""
+        entries = LedgerEntry.objects.filter(account='vendor_payable')
+        if vendor_ids:
+            entries = entries.filter(vendor_id__in=vendor_ids)
+        rows = entries.values('vendor_id').annotate(
+            earned=Sum('amount', filter=Q(amount__gt=0)),
+            paid=Sum('amount', filter=Q(amount__lt=0)),
+            total=Sum('amount'),
+        ).order_by()
+        return {
+            row['vendor_id']: (cents(row['earned']), -cents(row['paid']), cents(row['total']))
+            for row in rows
+        }
+
+    def purchase_totals(self, vendor_ids):
+        """vendor id -> (vendor payments of completed purchases, of those flagged as sent)."""
+        completed = Purchase.objects.filter(status='completed')
+        if vendor_ids:
+            completed = completed.filter(product__user_id__in=vendor_ids)
+        # Rounded per purchase, as the ledger stores them
+        payment = Round('vendor_payment_amount', 2)
+        rows = completed.values('product__user_id').annotate(
+            earned=Sum(payment),
+            paid=Sum(payment, filter=Q(vendor_payment_sent=True)),
+        ).order_by()
+        return {row['product__user_id']: (cents(row['earned']), cents(row['paid'])) for row in rows}
+
+    def balance_snapshots(self, vendor_ids):
+        """vendor id -> {'totals': (balance, total_earned, total_paid), 'last_balance_after': ...}."""
+        snapshots = VendorBalance.objects.all()
+        if vendor_ids:
+            snapshots = snapshots.filter(vendor_id__in=vendor_ids)
+        rows = snapshots.values_list('vendor_id', 'balance', 'total_earned', 'total_paid', 'last_entry__balance_after')
+        return {
+            vendor_id: {'totals': (balance, earned, paid), 'last_balance_after': last_balance_after}
+            for vendor_id, balance, earned, paid, last_balance_after in rows
+        }
+
+    def fix_balances(self, to_fix):
+        with transaction.atomic():
+            for vendor_id, total, earned, paid in to_fix:
+                last_entry = (
+                    LedgerEntry.objects.filter(account='vendor_payable', vendor_id=vendor_id)
+                    .order_by('-id').values_list('id', flat=True).first()
+                )
+                VendorBalance.objects.update_or_create(
+                    vendor_id=vendor_id,
+                    defaults={'balance': total, 'total_earned': earned, 'total_paid': paid, 'last_entry_id': last_entry},
+                )
@@ -0,0 +1,117 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill_vendor_stats(apps, schema_editor):
+    Purchase = apps.get_model("products", "Purchase")
+    VendorDailyStats = apps.get_model("products", "VendorDailyStats")
+
+    grouped = (
+        Purchase.objects.filter(status="completed")
+        .annotate(day=TruncDate(Coalesce("pickup_confirmed_at", "created_at")))
+        .values("product__user_id", "day")
+        .annotate(
+            sales_count=models.Count("id"),
+            quantity=models.Sum("quantity"),
+            product_amount=models.Sum("purchase_price"),
+            delivery_fees=models.Sum("delivery_fee"),
+            revenue=models.Sum("vendor_payment_amount"),
+            commission=models.Sum("agaseke_commission_amount"),
+        )
+        .order_by()
+    )
+    fields = ("sales_count", "quantity", "product_amount", "delivery_fees", "revenue", "commission")
+    VendorDailyStats.objects.bulk_create(
+        [
+            VendorDailyStats(
+                vendor_id=row["product__user_id"],
+                date=row["day"],
+                **{field: row[field] or 0 for field in fields},
+            )
+            for row in grouped
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0003_add_cart_models"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VendorDailyStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "date",
+                    models.DateField(
+                        help_text="Local date the purchases were completed"
+                    ),
+                ),
+                ("sales_count", models.PositiveIntegerField(default=0)),
+                ("quantity", models.PositiveIntegerField(default=0)),
+                (
+                    "product_amount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        help_text="Sum of purchase prices",
+                        max_digits=12,
+                    ),
+                ),
+                (
+                    "delivery_fees",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        help_text="Sum of vendor payments",
+                        max_digits=12,
+                    ),
+                ),
+                (
+                    "commission",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        help_text="Sum of agaseke commissions",
+                        max_digits=12,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "vendor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_stats",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Vendor daily stats",
+                "ordering": ["-date"],
+                "unique_together": {("vendor", "date")},
+            },
+        ),
+        migrations.RunPython(backfill_vendor_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,273 @@
+# Generated by Django 5.2.8 on 2026-10-18 22:04
+
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Round
+
+
+def open_vendor_balances(apps, schema_editor):
+    """Post each vendor's completed purchases so far as opening ledger transactions."""
+    Purchase = apps.get_model("products", "Purchase")
+    LedgerEntry = apps.get_model("products", "LedgerEntry")
+    VendorBalance = apps.get_model("products", "VendorBalance")
+
+    grouped = (
+        Purchase.objects.filter(status="completed")
+        .values("product__user_id")
+        .annotate(
+            earned=models.Sum(Round("vendor_payment_amount", 2)),
+            commission=models.Sum(Round("agaseke_commission_amount", 2)),
+            paid=models.Sum(
+                Round("vendor_payment_amount", 2),
+                filter=models.Q(vendor_payment_sent=True),
+            ),
+        )
+        .order_by("product__user_id")
+    )
+    for row in grouped:
+        vendor_id = row["product__user_id"]
+        earned = row["earned"] or 0
+        commission = row["commission"] or 0
+        paid = row["paid"] or 0
+
+        sale = uuid.uuid4()
+        LedgerEntry.objects.create(
+            transaction_id=sale,
+            entry_type="opening",
+            account="cash",
+            amount=-(earned + commission),
+        )
+        last_entry = LedgerEntry.objects.create(
+            transaction_id=sale,
+            entry_type="opening",
+            account="vendor_payable",
+            vendor_id=vendor_id,
+            amount=earned,
+            balance_after=earned,
+        )
+        LedgerEntry.objects.create(
+            transaction_id=sale,
+            entry_type="opening",
+            account="commission",
+            amount=commission,
+        )
+        if paid:
+            payout = uuid.uuid4()
+            last_entry = LedgerEntry.objects.create(
+                transaction_id=payout,
+                entry_type="opening",
+                account="vendor_payable",
+                vendor_id=vendor_id,
+                amount=-paid,
+                balance_after=earned - paid,
+            )
+            LedgerEntry.objects.create(
+                transaction_id=payout,
+                entry_type="opening",
+                account="cash",
+                amount=paid,
+            )
+
+        VendorBalance.objects.create(
+            vendor_id=vendor_id,
+            balance=earned - paid,
+            total_earned=earned,
+            total_paid=paid,
+            last_entry=last_entry,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0004_vendordailystats"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VendorPayout",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=12)),
+                (
+                    "reference",
+                    models.CharField(
+                        blank=True,
+                        help_text="Mobile money or bank transfer reference",
+                        max_length=100,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "vendor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="payouts",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="LedgerEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "transaction_id",
+                    models.UUIDField(
+                        db_index=True, help_text="Shared by the legs of one transaction"
+                    ),
+                ),
+                (
+                    "entry_type",
+                    models.CharField(
+                        choices=[
+                            ("sale", "Sale"),
+                            ("payout", "Payout"),
+                            ("opening", "Opening balance"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "account",
+                    models.CharField(
+                        choices=[
+                            ("cash", "Cash"),
+                            ("vendor_payable", "Owed to vendor"),
+                            ("commission", "Agaseke commission"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=12)),
+                (
+                    "balance_after",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=2,
+                        help_text="Vendor's balance after this entry (vendor payable legs only)",
+                        max_digits=12,
+                        null=True,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "purchase",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="ledger_entries",
+                        to="products.purchase",
+                    ),
+                ),
+                (
+                    "vendor",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="ledger_entries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "payout",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="ledger_entries",
+                        to="products.vendorpayout",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Ledger entries",
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        fields=["account", "vendor", "id"],
+                        name="products_le_account_f7dd32_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="VendorBalance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "balance",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "total_earned",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "total_paid",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "last_entry",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="products.ledgerentry",
+                    ),
+                ),
+                (
+                    "vendor",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ledger_balance",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["balance"], name="products_ve_balance_cc08e2_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(open_vendor_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_vendorpayout_ledgerentry_vendorbalance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='ledgerentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('entry_type', 'sale')), fields=('purchase', 'account'), name='unique_sale_entry_per_purchase_account'),
+        ),
+    ]
@@ -48,7 +48,41 @@ class Purchase(models.Model):
     vendor_payment_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     agaseke_commission_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     
-    def save(self, *args, **kwargs):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the values as loaded so changes can be detected without
+        # another query when the instance is saved
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def _snapshot_loaded_values(self, field_names=None):
+        """Record the current in-memory values as the persisted ones."""
+        loaded = getattr(self, '_loaded_values', {})
+        for field in self._meta.concrete_fields:
+            if field_names is not None and field.attname not in field_names and field.name not in field_names:
+                continue
+            if field.attname in self.__dict__:
+                loaded[field.attname] = self.__dict__[field.attname]
+        self._loaded_values = loaded
+    
+    @property
+    def previous_status(self):
+        """Status as last loaded from or saved to the database (None if unknown)."""
+        return getattr(self, '_loaded_values', {}).get('status')
+    
+    @property
+    def status_changed(self):
+        """Whether status differs from the value last loaded or saved."""
+        return self.previous_status != self.status
+    
+    def populate_defaults(self):
+        """
+        Fill in the derived fields save() relies on.
+        
+        Called by save(), and directly for purchases written with bulk_create(),
+        which bypasses save().
+        """
         if not self.order_id:
             # Generate a unique order ID
             self.order_id = f"ORD-{uuid.uuid4().hex[:8].upper()}"
@@ -65,8 +99,62 @@ class Purchase(models.Model):
             product_amount = self.purchase_price
             self.vendor_payment_amount = product_amount * Decimal('0.8')  # 80% of product price to vendor
             self.agaseke_commission_amount = (product_amount * Decimal('0.2')) + self.delivery_fee  # 20% of product + full delivery fee to agaseke
-        
+    
+    def save(self, *args, **kwargs):
+        self.populate_defaults()
         super().save(*args, **kwargs)
+        
+        # post_save receivers have seen the old snapshot; the saved values are
+        # what the next save compares against
+        self._snapshot_loaded_values(kwargs.get('update_fields'))
+    
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._snapshot_loaded_values(fields)
+    
+    @classmethod
+    def complete_many(cls, purchases, agaseke_user):
+        """
+        Mark a batch of awaiting purchases as completed with one UPDATE.
+        
+        The in-memory objects are updated as save() would (including the
+        payment split), and only rows still awaiting pickup or delivery are
+        written. Returns False if any of them was changed by someone else in
+        the meantime; run it inside transaction.atomic() and roll back then.
+        """
+        if not purchases:
+            return True
+        
+        from django.utils import timezone
+        
+        now = timezone.now()
+        vendor_amounts = []
+        commission_amounts = []
+        for purchase in purchases:
+            purchase.status = 'completed'
+            purchase.agaseke_user = agaseke_user
+            purchase.pickup_confirmed_at = now
+            purchase.updated_at = now
+            purchase.populate_defaults()
+            vendor_amounts.append(models.When(pk=purchase.pk, then=models.Value(purchase.vendor_payment_amount)))
+            commission_amounts.append(models.When(pk=purchase.pk, then=models.Value(purchase.agaseke_commission_amount)))
+        
+        updated = cls.objects.filter(
+            pk__in=[purchase.pk for purchase in purchases],
+            status__in=['awaiting_pickup', 'awaiting_delivery'],
+        ).update(
+            status='completed',
+            agaseke_user=agaseke_user,
+            pickup_confirmed_at=now,
+            updated_at=now,
+            vendor_payment_amount=models.Case(*vendor_amounts, output_field=cls._meta.get_field('vendor_payment_amount')),
+            agaseke_commission_amount=models.Case(*commission_amounts, output_field=cls._meta.get_field('agaseke_commission_amount')),
+        )
+        if updated == len(purchases):
+            for purchase in purchases:
+                purchase._snapshot_loaded_values()
+            return True
+        return False
     
     def calculate_payment_split(self):
         """Calculate the 80/20 payment split including delivery fees"""
@@ -109,21 +197,24 @@ class Cart(models.Model):
     def __str__(self):
         return f"Cart for {self.user.username}"
     
+    def totals(self):
+        """Item count and total price of the cart in one aggregate query (see cart_cache.cart_totals)."""
+        from .cart_cache import cart_totals
+        return cart_totals(self.items.all())
+    
     def total_items(self):
         """Get total number of items in cart"""
-        return sum(item.quantity for item in self.items.all())
+        return self.totals()['total_items']
     
     def total_price(self):
         """Calculate total price of all items in cart"""
-        from decimal import Decimal
-        total = Decimal('0.00')
-        for item in self.items.all():
-            total += item.subtotal()
-        return total
+        return self.totals()['total_price']
     
     def clear(self):
         """Remove all items from cart"""
+        from .cart_cache import invalidate
         self.items.all().delete()
+        invalidate(self.user_id)
 
 
 class CartItem(models.Model):
@@ -143,9 +234,210 @@ class CartItem(models.Model):
     
     def subtotal(self):
         """Calculate subtotal for this cart item"""
-        from decimal import Decimal
-        return Decimal(str(self.product.price)) * Decimal(str(self.quantity))
+        return self.product.price * self.quantity
     
     def is_available(self):
         """Check if product has enough inventory"""
-        return self.product.inventory >= self.quantity
\ No newline at end of file
+        return self.product.inventory >= self.quantity
+
+class VendorDailyStats(models.Model):
+    """
+    Completed sales per vendor per day.
+    
+    Rows are incremented as purchases complete (see record()) so vendor
+    statistics (products.statistics) read a handful of rollup rows instead of
+    aggregating every completed purchase. rebuild_vendor_stats recomputes
+    them from Purchase.
+    """
+    vendor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField(help_text="Local date the purchases were completed")
+    sales_count = models.PositiveIntegerField(default=0)
+    quantity = models.PositiveIntegerField(default=0)
+    product_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0,
+                                         help_text="Sum of purchase prices")
+    delivery_fees = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0,
+                                  help_text="Sum of vendor payments")
+    commission = models.DecimalField(max_digits=12, decimal_places=2, default=0,
+                                     help_text="Sum of agaseke commissions")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    # Summed columns, in the order record() and rebuild_vendor_stats fill them
+    TOTAL_FIELDS = ('sales_count', 'quantity', 'product_amount', 'delivery_fees', 'revenue', 'commission')
+    
+    class Meta:
+        unique_together = ['vendor', 'date']
+        ordering = ['-date']
+        verbose_name_plural = 'Vendor daily stats'
+    
+    def __str__(self):
+        return f"{self.vendor.username} - {self.date}"
+    
+    @staticmethod
+    def completion_date(purchase):
+        from django.utils import timezone
+        return timezone.localdate(purchase.pickup_confirmed_at or purchase.created_at)
+    
+    @classmethod
+    def record(cls, purchases):
+        """
+        Add newly completed purchases to their vendors' daily rows.
+        
+        Purchases must have product loaded (or product.user_id available) and
+        their payment split filled in. Each (vendor, day) row gets one UPDATE
+        with F() increments; missing rows are created. Call it in the same
+        transaction that completes the purchases.
+        """
+        from decimal import Decimal
+        from django.db import IntegrityError, transaction
+        
+        deltas = {}
+        for purchase in purchases:
+            key = (purchase.product.user_id, cls.completion_date(purchase))
+            delta = deltas.setdefault(key, dict.fromkeys(cls.TOTAL_FIELDS, 0))
+            delta['sales_count'] += 1
+            delta['quantity'] += purchase.quantity
+            delta['product_amount'] += purchase.purchase_price
+            delta['delivery_fees'] += Decimal(purchase.delivery_fee)
+            delta['revenue'] += purchase.vendor_payment_amount or 0
+            delta['commission'] += purchase.agaseke_commission_amount or 0
+        
+        # A consistent order keeps concurrent batches from deadlocking
+        for (vendor_id, date), delta in sorted(deltas.items()):
+            increments = {field: models.F(field) + value for field, value in delta.items()}
+            if cls.objects.filter(vendor_id=vendor_id, date=date).update(**increments):
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(vendor_id=vendor_id, date=date, **delta)
+            except IntegrityError:
+                # Another request created the row first
+                cls.objects.filter(vendor_id=vendor_id, date=date).update(**increments)
+    
+    @classmethod
+    def rebuild(cls, vendor_ids=None, batch_size=1000):
+        """
+        Recompute daily rows from completed purchases with one grouped query.
+        
+        Rebuilds every vendor, or only vendor_ids. Returns the number of rows
+        written.
+        """
+        from django.db import transaction
+        from django.db.models.functions import Coalesce, TruncDate
+        
+        purchases = Purchase.objects.filter(status='completed')
+        rows = cls.objects.all()
+        if vendor_ids is not None:
+            purchases = purchases.filter(product__user_id__in=vendor_ids)
+            rows = rows.filter(vendor_id__in=vendor_ids)
+        
+        grouped = purchases.annotate(
+            day=TruncDate(Coalesce('pickup_confirmed_at', 'created_at'))
+        ).values('product__user_id', 'day').annotate(
+            sales_count=models.Count('id'),
+            quantity=models.Sum('quantity'),
+            product_amount=models.Sum('purchase_price'),
+            delivery_fees=models.Sum('delivery_fee'),
+            revenue=models.Sum('vendor_payment_amount'),
+            commission=models.Sum('agaseke_commission_amount'),
+        ).order_by()
+        
+        stats = [
+            cls(
+                vendor_id=group['product__user_id'],
+                date=group['day'],
+                **{field: group[field] or 0 for field in cls.TOTAL_FIELDS},
+            )
+            for group in grouped
+        ]
+        with transaction.atomic():
+            rows.delete()
+            cls.objects.bulk_create(stats, batch_size=batch_size)
+        return len(stats)
+
+
+class VendorPayout(models.Model):
+    """A transfer of a vendor's outstanding balance (see products/ledger.py)."""
+    vendor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='payouts')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    reference = models.CharField(max_length=100, blank=True, help_text="Mobile money or bank transfer reference")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Payout of {self.amount} to {self.vendor.username}"
+
+
+class LedgerEntry(models.Model):
+    """
+    One leg of a double-entry ledger transaction.
+    
+    Entries are only ever appended (see products/ledger.py). Amounts are
+    signed, credits positive and debits negative, and the legs of one
+    transaction always sum to zero: a completed purchase debits cash and
+    credits the vendor's payable and the agaseke commission; a payout debits
+    the vendor's payable and credits cash. Vendor payable legs carry the
+    vendor's balance after the entry.
+    """
+    ACCOUNT_CHOICES = (
+        ('cash', 'Cash'),
+        ('vendor_payable', 'Owed to vendor'),
+        ('commission', 'Agaseke commission'),
+    )
+    
+    ENTRY_TYPE_CHOICES = (
+        ('sale', 'Sale'),
+        ('payout', 'Payout'),
+        ('opening', 'Opening balance'),
+    )
+    
+    transaction_id = models.UUIDField(db_index=True, help_text="Shared by the legs of one transaction")
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPE_CHOICES)
+    account = models.CharField(max_length=20, choices=ACCOUNT_CHOICES)
+    vendor = models.ForeignKey(User, on_delete=models.PROTECT, null=True, blank=True, related_name='ledger_entries')
+    purchase = models.ForeignKey(Purchase, on_delete=models.PROTECT, null=True, blank=True, related_name='ledger_entries')
+    payout = models.ForeignKey(VendorPayout, on_delete=models.PROTECT, null=True, blank=True, related_name='ledger_entries')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    balance_after = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True,
+                                        help_text="Vendor's balance after this entry (vendor payable legs only)")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
+        verbose_name_plural = 'Ledger entries'
+        indexes = [models.Index(fields=['account', 'vendor', 'id'])]
+        constraints = [
+            # A purchase is posted as a sale at most once
+            models.UniqueConstraint(
+                fields=['purchase', 'account'],
+                condition=models.Q(entry_type='sale'),
+                name='unique_sale_entry_per_purchase_account',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_entry_type_display()}: {self.account} {self.amount}"
+
+
+class VendorBalance(models.Model):
+    """
+    Running balance of what is owed to a vendor.
+    
+    Updated in the same transaction as the ledger entries it summarizes; the
+    row is locked while entries are added, which also orders each vendor's
+    balance_after values.
+    """
+    vendor = models.OneToOneField(User, on_delete=models.CASCADE, related_name='ledger_balance')
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_earned = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    last_entry = models.ForeignKey(LedgerEntry, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [models.Index(fields=['balance'])]
+    
+    def __str__(self):
+        return f"{self.vendor.username}: {self.balance}"
@@ -0,0 +1,17 @@
+"""
+Custom signals for purchase events that bypass Model.save().
+
+Set-based code paths (bulk_create, queryset.update) never fire pre_save or
+post_save, so they send one of these once per batch instead. Like post_save,
+they are sent inside the transaction that writes the purchases: receivers
+should only do transactional work there (e.g. the notification outbox) and
+defer anything else with transaction.on_commit().
+"""
+from django.dispatch import Signal
+
+# Sent once per checkout. Args: purchases (list of created Purchase objects)
+purchases_created = Signal()
+
+# Sent once per batch status change. Args: purchases (list of Purchase objects
+# with their new status), previous_statuses (dict of purchase pk -> old status)
+purchases_status_changed = Signal()
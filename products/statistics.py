@@ -0,0 +1,202 @@
+"""
+Sales statistics for a vendor, an agaseke operator, a buyer or the platform.
+
+compute_statistics() returns every total, the current month's subtotals and the
+commission breakdown for one scope in a single aggregate query. sales_trend()
+returns the same figures bucketed by day, week or month from one GROUP BY
+query. Date filters are plain >=/< ranges on the scope's date column, so they
+can use its index (unlike __month/__year lookups). Vendor and platform figures
+are read from the VendorDailyStats rollup instead of the purchases themselves.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import Purchase, VendorDailyStats
+
+# Figures reported for every scope, as total_<field> and monthly_<field>
+FIELDS = VendorDailyStats.TOTAL_FIELDS
+
+# How each figure is computed from completed purchases
+PURCHASE_AGGREGATES = {
+    'sales_count': (Count, 'id'),
+    'quantity': (Sum, 'quantity'),
+    'product_amount': (Sum, 'purchase_price'),
+    'delivery_fees': (Sum, 'delivery_fee'),
+    'revenue': (Sum, 'vendor_payment_amount'),
+    'commission': (Sum, 'agaseke_commission_amount'),
+}
+
+# ... and from the vendor rollup, which already holds them per day
+ROLLUP_AGGREGATES = {field: (Sum, field) for field in FIELDS}
+
+# scope -> (owner lookup, date column); platform covers every vendor
+SCOPES = {
+    'vendor': ('vendor', 'date'),
+    'agaseke': ('agaseke_user', 'pickup_confirmed_at'),
+    'buyer': ('buyer', 'created_at'),
+    'platform': (None, 'date'),
+}
+
+ROLLUP_SCOPES = ('vendor', 'platform')
+
+GRANULARITIES = ('day', 'week', 'month')
+
+
+def start_of_day(day):
+    """Aware datetime for local midnight at the start of a date."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def month_range(today=None):
+    """First day of the current month and of the next one."""
+    today = today or timezone.localdate()
+    first = today.replace(day=1)
+    return first, (first + timedelta(days=32)).replace(day=1)
+
+
+def date_range_filter(column, start=None, end=None, dates=False):
+    """
+    Q for start <= column < end (either bound optional).
+
+    start and end are dates; for datetime columns they are turned into local
+    midnight so the comparison stays a plain range.
+    """
+    condition = Q()
+    if start:
+        condition &= Q(**{f'{column}__gte': start if dates else start_of_day(start)})
+    if end:
+        condition &= Q(**{f'{column}__lt': end if dates else start_of_day(end)})
+    return condition
+
+
+def _scope_source(scope, user):
+    """Queryset, aggregates, date column and whether it is a DateField for a scope."""
+    if scope not in SCOPES:
+        raise ValueError(f"Unknown statistics scope: {scope}")
+    owner, column = SCOPES[scope]
+
+    if scope in ROLLUP_SCOPES:
+        queryset, aggregates, dates = VendorDailyStats.objects.all(), ROLLUP_AGGREGATES, True
+    else:
+        queryset, aggregates, dates = Purchase.objects.filter(status='completed'), PURCHASE_AGGREGATES, False
+    if owner:
+        queryset = queryset.filter(**{owner: user})
+    return queryset, aggregates, column, dates
+
+
+def bucket_start(day, granularity):
+    """First day of the day/week (Monday)/month bucket containing a date."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(day, granularity):
+    if granularity == 'week':
+        return day + timedelta(days=7)
+    if granularity == 'month':
+        return (day + timedelta(days=32)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def compute_statistics(scope, user, start=None, end=None, today=None):
+    """
+    Totals and this month's subtotals of completed sales for one scope.
+
+    Args:
+        scope: 'vendor' (sales of the user's products), 'agaseke' (purchases
+            the operator completed), 'buyer' (the user's own purchases) or
+            'platform' (every sale; user is ignored)
+        user: User instance or id
+        start, end: optional dates limiting the totals to start <= day < end
+        today: date the current month is taken from (defaults to today)
+
+    Returns:
+        Dict with total_<field> and monthly_<field> for every field in
+        FIELDS (0 when there are none) and a commission_breakdown dict
+    """
+    queryset, aggregates, column, dates = _scope_source(scope, user)
+    queryset = queryset.filter(date_range_filter(column, start, end, dates))
+    this_month = date_range_filter(column, *month_range(today), dates)
+
+    expressions = {}
+    for field, (function, source) in aggregates.items():
+        expressions[f'total_{field}'] = function(source)
+        expressions[f'monthly_{field}'] = function(source, filter=this_month)
+
+    statistics = {name: value or 0 for name, value in queryset.order_by().aggregate(**expressions).items()}
+    statistics['commission_breakdown'] = {
+        'vendor_earnings': statistics['total_revenue'],
+        'agaseke_commission': statistics['total_commission'],
+        'product_commission': statistics['total_product_amount'] * Decimal('0.2'),
+        'delivery_fees': statistics['total_delivery_fees'],
+        'total_transaction_value': statistics['total_product_amount'] + statistics['total_delivery_fees'],
+    }
+    return statistics
+
+
+def sales_trend(scope, user, start, end, granularity='day', use_cache=True):
+    """
+    Sales, revenue and commission per day, week or month.
+
+    Computed with one truncated GROUP BY query; empty buckets are filled with
+    zeros here. Results are cached for SALES_TREND_CACHE_TTL seconds per
+    scope, user, range and granularity.
+
+    Args:
+        scope: as for compute_statistics()
+        user: User instance or id
+        start, end: dates, start <= day < end
+        granularity: 'day', 'week' or 'month'
+        use_cache: False to skip the cache, e.g. when the trend is shown next
+            to live totals that must agree with it
+
+    Returns:
+        List of {'date', 'sales', 'revenue', 'commission'} dicts, oldest
+        first, where date is the ISO date the bucket starts on
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    user_id = getattr(user, 'pk', user) if SCOPES.get(scope, (None,))[0] else None
+    key = f'sales-trend:{scope}:{user_id}:{start.isoformat()}:{end.isoformat()}:{granularity}'
+    trend = cache.get(key) if use_cache else None
+    if trend is not None:
+        return trend
+
+    queryset, aggregates, column, dates = _scope_source(scope, user)
+    rows = (
+        queryset.filter(date_range_filter(column, start, end, dates))
+        .annotate(bucket=Trunc(column, granularity, output_field=DateField()))
+        .values('bucket')
+        .annotate(**{
+            f'{field}_sum': function(source)
+            for field, (function, source) in aggregates.items()
+            if field in ('sales_count', 'revenue', 'commission')
+        })
+        .order_by()
+    )
+    buckets = {row['bucket']: row for row in rows}
+
+    trend = []
+    day = bucket_start(start, granularity)
+    while day < end:
+        row = buckets.get(day, {})
+        trend.append({
+            'date': day.isoformat(),
+            'sales': row.get('sales_count_sum') or 0,
+            'revenue': float(row.get('revenue_sum') or 0),
+            'commission': float(row.get('commission_sum') or 0),
+        })
+        day = next_bucket(day, granularity)
+
+    if use_cache:
+        cache.set(key, trend, getattr(settings, 'SALES_TREND_CACHE_TTL', 300))
+    return trend
@@ -0,0 +1,115 @@
+import json
+import threading
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.test import Client, TestCase, TransactionTestCase
+
+from authentication.jwt_utils import get_tokens_for_user
+from posts.models import Post
+from users.models import User
+
+from .ledger import record_sales
+from .models import LedgerEntry, Purchase, VendorBalance, VendorDailyStats
+
+
+def create_user(username, **kwargs):
+    return User.objects.create_user(username=username, email=f'{username}@example.com', password='pw12345678', **kwargs)
+
+
+def auth_header(user):
+    return {'HTTP_AUTHORIZATION': f"Bearer {get_tokens_for_user(user)['access']}"}
+
+
+class CompletePurchaseTwiceTests(TestCase):
+    """A purchase completed twice is counted once in the daily rollup and the ledger."""
+
+    def setUp(self):
+        self.vendor = create_user('vendor', is_vendor_role=True)
+        self.buyer = create_user('buyer')
+        self.agaseke = create_user('agaseke', role='agaseke')
+        self.product = Post.objects.create(
+            title='Basket', description='Woven', image='posts/basket.png',
+            user=self.vendor, price=Decimal('10.00'), inventory=5,
+        )
+        self.purchase = Purchase.objects.create(
+            buyer=self.buyer, product=self.product, purchase_price=Decimal('10.00'),
+            quantity=1, status='awaiting_pickup',
+        )
+
+    def complete(self):
+        return self.client.post(
+            '/auth/api/complete-purchase/',
+            json.dumps({'purchase_id': self.purchase.id}),
+            content_type='application/json',
+            **auth_header(self.agaseke),
+        )
+
+    def assertPostedOnce(self):
+        self.assertEqual(
+            LedgerEntry.objects.filter(purchase=self.purchase, entry_type='sale', account='vendor_payable').count(), 1
+        )
+        self.assertEqual(VendorBalance.objects.get(vendor=self.vendor).balance, Decimal('8.00'))
+        stats = VendorDailyStats.objects.get(vendor=self.vendor)
+        self.assertEqual(stats.sales_count, 1)
+        self.assertEqual(stats.revenue, Decimal('8.00'))
+
+    def test_second_confirmation_is_rejected(self):
+        self.assertEqual(self.complete().status_code, 200)
+        self.assertEqual(self.complete().status_code, 400)
+        self.assertPostedOnce()
+
+    def test_concurrent_confirmation_loses(self):
+        # Read before the first confirmation commits, as a racing request would
+        stale = Purchase.objects.select_related('product').get(pk=self.purchase.pk)
+        self.assertEqual(self.complete().status_code, 200)
+
+        with transaction.atomic():
+            self.assertFalse(Purchase.complete_many([stale], self.agaseke))
+        record_sales([stale])
+        self.assertPostedOnce()
+
+
+class ConcurrentPurchaseTests(TransactionTestCase):
+    """Simultaneous buyers of one product never take more than its stock."""
+
+    buyers = 20
+    stock = 5
+
+    def test_simultaneous_buyers_cannot_oversell(self):
+        vendor = create_user('vendor', is_vendor_role=True)
+        product = Post.objects.create(
+            title='Basket', description='Woven', image='posts/basket.png',
+            user=vendor, price=Decimal('10.00'), inventory=self.stock,
+        )
+        headers = [auth_header(create_user(f'buyer{i}')) for i in range(self.buyers)]
+        start = threading.Barrier(self.buyers)
+        statuses = []
+
+        def buy(header):
+            try:
+                start.wait()
+                response = Client().post(
+                    f'/auth/v1/posts/{product.id}/purchase/',
+                    json.dumps({'quantity': 1}),
+                    content_type='application/json',
+                    **header,
+                )
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(header,)) for header in headers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        purchases = Purchase.objects.filter(product=product).count()
+        self.assertEqual(len(statuses), self.buyers)
+        self.assertGreater(purchases, 0)
+        self.assertLessEqual(purchases, self.stock)
+        self.assertGreaterEqual(product.inventory, 0)
+        self.assertEqual(product.inventory, self.stock - purchases)
+        self.assertEqual(product.total_purchases, purchases)
@@ -1,17 +1,23 @@
 from decimal import Decimal
 import json
+import logging
+import time
 
 from django.shortcuts import get_object_or_404
 from django.http import JsonResponse
+from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
 from posts.models import Post, Bookmark, Category
 from products.models import Purchase, ProductImage
-from authentication.qr_utils import update_user_qr_code
+from products.signals import purchases_created
+from authentication.qr_utils import mark_user_qr_code_dirty
 from authentication.utils import get_token_user
 from authentication.serializers_helpers import serialize_post, serialize_purchase
 
+logger = logging.getLogger(__name__)
+
 
 @csrf_exempt
 @require_http_methods(['GET'])
@@ -115,8 +121,7 @@ def purchase_product_api(request, post_id):
                 'errors': {'quantity': ['Please enter a valid quantity']}
             }, status=400)
         
-        # Check if enough inventory
-        product.refresh_from_db()
+        # Check if enough inventory (re-checked atomically when stock is reserved)
         if product.inventory < quantity:
             return JsonResponse({
                 'success': False,
@@ -176,15 +181,23 @@ def purchase_product_api(request, post_id):
             except (ValueError, TypeError):
                 pass
         
-        purchase.save()
+        # Reserve stock with a conditional UPDATE and record the purchase in the
+        # same transaction; the purchase only exists if the decrement succeeded
+        with transaction.atomic():
+            reserved = product.reserve_stock(quantity)
+            if reserved:
+                purchase.save()
         
-        # Update inventory
-        product.inventory -= quantity
-        product.total_purchases += 1
-        product.save()
+        if not reserved:
+            product.refresh_from_db(fields=['inventory'])
+            return JsonResponse({
+                'success': False,
+                'message': 'Insufficient inventory',
+                'errors': {'inventory': [f'Only {product.inventory} items available']}
+            }, status=400)
         
-        # Update QR code
-        update_user_qr_code(user)
+        # Flag the buyer's QR code; it is regenerated on its next read
+        mark_user_qr_code_dirty(user)
         
         # Serialize purchase for response
         purchase_data = serialize_purchase(purchase)
@@ -235,8 +248,6 @@ def bulk_purchase_api(request):
     }
     """
     try:
-        from django.db import transaction
-        
         # Get user from token
         user = get_token_user(request)
         if not user:
@@ -291,27 +302,26 @@ def bulk_purchase_api(request):
             from products.models import Cart, CartItem
             try:
                 cart = Cart.objects.get(user=user)
-                cart_items = cart.items.select_related('product').all()
-                
-                if not cart_items.exists():
-                    return JsonResponse({
-                        'success': False,
-                        'message': 'Cart is empty',
-                        'errors': {'cart': ['Your cart is empty']}
-                    }, status=400)
-                
-                for cart_item in cart_items:
-                    items_to_purchase.append({
-                        'product': cart_item.product,
-                        'quantity': cart_item.quantity
-                    })
-                    
             except Cart.DoesNotExist:
                 return JsonResponse({
                     'success': False,
                     'message': 'Cart not found',
                     'errors': {'cart': ['Cart does not exist']}
                 }, status=404)
+            
+            # One query for the cart lines, their products and vendors
+            for cart_item in cart.items.select_related('product', 'product__user'):
+                items_to_purchase.append({
+                    'product': cart_item.product,
+                    'quantity': cart_item.quantity
+                })
+            
+            if not items_to_purchase:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Cart is empty',
+                    'errors': {'cart': ['Your cart is empty']}
+                }, status=400)
         else:
             # Purchase specific items
             items_data = data.get('items', [])
@@ -323,7 +333,8 @@ def bulk_purchase_api(request):
                     'errors': {'items': ['Please provide items to purchase']}
                 }, status=400)
             
-            # Validate and fetch products
+            # Validate the request lines before touching the database
+            requested = []
             for item_data in items_data:
                 product_id = item_data.get('product_id')
                 quantity = item_data.get('quantity', 1)
@@ -346,28 +357,50 @@ def bulk_purchase_api(request):
                         'errors': {'items': [f'Invalid quantity for product {product_id}']}
                     }, status=400)
                 
+                requested.append((product_id, quantity))
+            
+            # Fetch the whole basket in one query
+            try:
+                products = Post.objects.select_related('user').in_bulk(
+                    {product_id for product_id, _ in requested}
+                )
+            except (ValueError, TypeError):
+                products = {}
+            
+            for product_id, quantity in requested:
                 try:
-                    product = Post.objects.get(id=product_id)
-                    items_to_purchase.append({
-                        'product': product,
-                        'quantity': quantity
-                    })
-                except Post.DoesNotExist:
+                    product = products[int(product_id)]
+                except (KeyError, ValueError, TypeError):
                     return JsonResponse({
                         'success': False,
                         'message': 'Product not found',
                         'errors': {'items': [f'Product with ID {product_id} not found']}
                     }, status=404)
+                
+                items_to_purchase.append({
+                    'product': product,
+                    'quantity': quantity
+                })
         
         # Validation checks before creating purchases
         validation_errors = []
         
+        # Quantities per product, so duplicate lines are checked against the combined amount
+        basket = {}
+        for item in items_to_purchase:
+            quantity, line_count = basket.get(item['product'].id, (0, 0))
+            basket[item['product'].id] = (quantity + item['quantity'], line_count + 1)
+        
+        checked = set()
         for item in items_to_purchase:
             product = item['product']
-            quantity = item['quantity']
+            if product.id in checked:
+                continue
+            checked.add(product.id)
+            quantity = basket[product.id][0]
             
             # Check if buying own product
-            if product.user == user:
+            if product.user_id == user.id:
                 validation_errors.append(f'Cannot purchase your own product: {product.title}')
             
             # Check if product has valid price
@@ -394,58 +427,74 @@ def bulk_purchase_api(request):
         delivery_fee = Decimal('5.00') if delivery_method == 'delivery' else Decimal('0.00')
         initial_status = 'awaiting_delivery' if delivery_method == 'delivery' else 'awaiting_pickup'
         
+        latitude = longitude = None
+        if delivery_latitude and delivery_longitude:
+            try:
+                latitude = float(delivery_latitude)
+                longitude = float(delivery_longitude)
+            except (ValueError, TypeError):
+                latitude = longitude = None
+        
+        for index, item in enumerate(items_to_purchase):
+            product = item['product']
+            quantity = item['quantity']
+            
+            # Calculate price for this item
+            item_total = product.price * quantity
+            total_amount += item_total
+            
+            purchase = Purchase(
+                buyer=user,
+                product=product,
+                quantity=quantity,
+                purchase_price=item_total,
+                delivery_method=delivery_method,
+                payment_method=payment_method,
+                delivery_fee=delivery_fee if index == len(items_to_purchase) - 1 else Decimal('0.00'),  # Add delivery fee to last item only
+                delivery_address=delivery_address,
+                delivery_latitude=latitude,
+                delivery_longitude=longitude,
+                status=initial_status
+            )
+            # bulk_create() skips save(), so fill in order_id and fees here
+            purchase.populate_defaults()
+            created_purchases.append(purchase)
+        
+        # Locks are held from the stock UPDATE to COMMIT, so keep this block to
+        # a fixed handful of statements regardless of basket size
+        started = time.perf_counter()
         with transaction.atomic():
-            # Create purchases for each item
-            for item in items_to_purchase:
-                product = item['product']
-                quantity = item['quantity']
-                
-                # Refresh product to get latest inventory (prevent race conditions)
-                product.refresh_from_db()
-                
-                # Double-check inventory
-                if product.inventory < quantity:
-                    raise ValueError(f'Insufficient inventory for {product.title}')
-                
-                # Calculate price for this item
-                item_total = product.price * quantity
-                total_amount += item_total
-                
-                # Create purchase
-                purchase = Purchase(
-                    buyer=user,
-                    product=product,
-                    quantity=quantity,
-                    purchase_price=item_total,
-                    delivery_method=delivery_method,
-                    payment_method=payment_method,
-                    delivery_fee=delivery_fee if len(items_to_purchase) == 1 or item == items_to_purchase[-1] else Decimal('0.00'),  # Add delivery fee to last item only
-                    delivery_address=delivery_address,
-                    status=initial_status
-                )
-                
-                # Add location coordinates if provided
-                if delivery_latitude and delivery_longitude:
-                    try:
-                        purchase.delivery_latitude = float(delivery_latitude)
-                        purchase.delivery_longitude = float(delivery_longitude)
-                    except (ValueError, TypeError):
-                        pass
-                
-                purchase.save()
-                created_purchases.append(purchase)
-                
-                # Update product inventory and stats
-                product.inventory -= quantity
-                product.total_purchases += 1
-                product.save()
+            # Reserve every product in one conditional UPDATE; if any of them
+            # sold out since validation, nothing is written
+            if not Post.reserve_basket(basket):
+                raise ValueError('Insufficient inventory for one or more items in your basket')
+            
+            Purchase.objects.bulk_create(created_purchases)
             
             # Clear cart if requested
             if clear_cart and from_cart:
                 cart.clear()
+            
+            # Notification events are queued in this same transaction
+            purchases_created.send(sender=Purchase, purchases=created_purchases)
+        logger.debug(
+            "Bulk purchase of %d item(s) for %s committed in %.1f ms",
+            len(created_purchases), user.username, (time.perf_counter() - started) * 1000
+        )
         
-        # Update user's QR code after all purchases
-        update_user_qr_code(user)
+        # Report the post-purchase stock levels in the response
+        stock = {
+            row['id']: row
+            for row in Post.objects.filter(id__in=basket).values('id', 'inventory', 'total_purchases')
+        }
+        for item in items_to_purchase:
+            row = stock.get(item['product'].id)
+            if row:
+                item['product'].inventory = row['inventory']
+                item['product'].total_purchases = row['total_purchases']
+        
+        # Flag the buyer's QR code; it is regenerated on its next read
+        mark_user_qr_code_dirty(user)
         
         # Prepare response data
         purchases_data = [serialize_purchase(purchase) for purchase in created_purchases]
@@ -479,9 +528,7 @@ def bulk_purchase_api(request):
             'errors': {'transaction': [str(e)]}
         }, status=400)
     except Exception as e:
-        import logging
         import traceback
-        logger = logging.getLogger(__name__)
         logger.error(f"Bulk purchase error: {str(e)}")
         logger.error(traceback.format_exc())
         
@@ -749,13 +796,19 @@ def edit_product_api(request, post_id):
             main_image = request.FILES.get('main_image')  # Optional for updates
             auxiliary_images = request.FILES.getlist('auxiliary_images')
         
+        # Fields this request changes; only these are saved, so counters
+        # reserved since the product was read are not written back
+        updated_fields = []
+        
         # Update title if provided
         if title is not None:
             post.title = title
+            updated_fields.append('title')
         
         # Update description if provided
         if description is not None:
             post.description = description
+            updated_fields.append('description')
         
         # Validate and update price if provided
         if price is not None:
@@ -764,6 +817,7 @@ def edit_product_api(request, post_id):
                 if price_decimal <= 0:
                     raise ValueError("Price must be positive")
                 post.price = price_decimal
+                updated_fields.append('price')
             except (ValueError, TypeError):
                 return JsonResponse({
                     'success': False,
@@ -778,6 +832,7 @@ def edit_product_api(request, post_id):
                 if inventory_int < 0:
                     inventory_int = 0
                 post.inventory = inventory_int
+                updated_fields.append('inventory')
             except (ValueError, TypeError):
                 return JsonResponse({
                     'success': False,
@@ -810,6 +865,7 @@ def edit_product_api(request, post_id):
                     'message': 'Error updating category',
                     'errors': {'category': [str(e)]}
                 }, status=400)
+            updated_fields.append('category')
         
         # Handle great_deal toggle if provided
         if is_great_deal_input is not None:
@@ -818,6 +874,7 @@ def edit_product_api(request, post_id):
                 post.is_great_deal = is_great_deal_input
             else:
                 post.is_great_deal = str(is_great_deal_input).lower() in ['true', '1', 'yes']
+            updated_fields.append('is_great_deal')
         
         # Handle original_price if provided
         if original_price_input is not None:
@@ -831,6 +888,7 @@ def edit_product_api(request, post_id):
                         'errors': {'original_price': ['Original price must be greater than discounted price']}
                     }, status=400)
                 post.original_price = original_price_decimal
+                updated_fields.append('original_price')
             except (ValueError, TypeError):
                 return JsonResponse({
                     'success': False,
@@ -841,12 +899,14 @@ def edit_product_api(request, post_id):
         # If great_deal is explicitly disabled, clear original_price
         if is_great_deal_input is not None and not post.is_great_deal:
             post.original_price = None
+            updated_fields.append('original_price')
         
         # Update main image if provided
         if main_image:
             post.image = main_image
+            updated_fields.append('image')
         
-        post.save()
+        post.save(update_fields=updated_fields + ['updated_at'])
         
         # Handle auxiliary images if provided
         if auxiliary_images:
@@ -0,0 +1,66 @@
+"""
+Atomic updates of denormalized counters.
+
+User.total_sales / total_purchases and Post.inventory / total_purchases are
+only ever changed here, with UPDATE ... SET col = col + delta: concurrent
+changes can't overwrite each other, and no other column of the row (password,
+last_login, ...) is written back from a stale copy. The repair_counters
+command recomputes them from Purchase when they have drifted.
+"""
+from django.db import models
+
+
+def increment(instance, condition=None, **deltas):
+    """
+    Add deltas to counter fields of one row in a single UPDATE.
+
+    Args:
+        instance: model instance whose row is updated
+        condition: optional Q the row must still match (e.g. enough stock)
+        **deltas: field name -> amount to add (negative to subtract)
+
+    Returns:
+        True if the row was updated; the instance's counter fields are then
+        refreshed from the database
+    """
+    rows = type(instance)._default_manager.filter(pk=instance.pk)
+    if condition is not None:
+        rows = rows.filter(condition)
+    updated = rows.update(**{field: models.F(field) + delta for field, delta in deltas.items()})
+    if updated:
+        instance.refresh_from_db(fields=list(deltas))
+    return bool(updated)
+
+
+def increment_many(model, deltas, condition=None):
+    """
+    Add per-row deltas to counter fields of many rows in a single UPDATE.
+
+    Args:
+        model: model class
+        deltas: pk -> {field name: amount to add}
+        condition: optional Q each row must match to be updated
+
+    Returns:
+        Number of rows updated
+    """
+    if not deltas:
+        return 0
+
+    fields = {field for row in deltas.values() for field in row}
+    changes = {}
+    for field in fields:
+        output_field = model._meta.get_field(field)
+        cases = [
+            models.When(pk=pk, then=models.Value(row[field], output_field=output_field))
+            for pk, row in deltas.items()
+            if field in row
+        ]
+        changes[field] = models.F(field) + models.Case(
+            *cases, default=models.Value(0, output_field=output_field), output_field=output_field
+        )
+
+    rows = model._default_manager.filter(pk__in=list(deltas))
+    if condition is not None:
+        rows = rows.filter(condition)
+    return rows.update(**changes)
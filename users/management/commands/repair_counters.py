@@ -0,0 +1,94 @@
+"""
+Recompute denormalized counters from Purchase and fix the ones that drifted.
+
+Each counter is checked and repaired with set-based queries (a correlated
+subquery per row, one UPDATE per counter), never by loading rows:
+
+    User.total_sales      vendor payments of completed purchases of their products
+    User.total_purchases  price x quantity of their completed purchases
+    Post.total_purchases  purchases ever made of the product
+
+Post.inventory is not derived from purchases (restocks are never recorded),
+so it cannot be recomputed here.
+
+Usage:
+    python manage.py repair_counters --dry-run
+    python manage.py repair_counters
+"""
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from posts.models import Post
+from products.models import Purchase
+from users.models import User
+
+# Decimal counters within half a cent of the expected value are left alone
+TOLERANCE = Decimal('0.005')
+
+
+def _total(purchases, group_by, aggregate, output_field):
+    """Correlated subquery of aggregate over purchases grouped by group_by = the outer pk."""
+    return Coalesce(
+        Subquery(
+            purchases.filter(**{group_by: OuterRef('pk')})
+            .order_by()
+            .values(group_by)
+            .annotate(total=aggregate)
+            .values('total'),
+            output_field=output_field,
+        ),
+        Value(0, output_field=output_field),
+        output_field=output_field,
+    )
+
+
+def counter_definitions():
+    """(label, model, field, expected value expression) for every counter that can be recomputed."""
+    money = DecimalField(max_digits=12, decimal_places=2)
+    completed = Purchase.objects.filter(status='completed')
+    return [
+        ('User.total_sales', User, 'total_sales',
+         _total(completed, 'product__user', Sum('vendor_payment_amount'), money)),
+        ('User.total_purchases', User, 'total_purchases',
+         _total(completed, 'buyer', Sum(ExpressionWrapper(F('purchase_price') * F('quantity'), output_field=money)),
+                money)),
+        ('Post.total_purchases', Post, 'total_purchases',
+         _total(Purchase.objects.all(), 'product', Count('id'), IntegerField())),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Recompute User and Post counters from purchases and repair drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows have drifted',
+        )
+
+    def handle(self, *args, **options):
+        repaired = 0
+        for label, model, field, expected in counter_definitions():
+            output_field = model._meta.get_field(field)
+            tolerance = TOLERANCE if isinstance(output_field, DecimalField) else 1
+            drifted = model.objects.annotate(
+                expected=expected,
+                drift=ExpressionWrapper(F(field) - F('expected'), output_field=output_field),
+            ).filter(Q(drift__gte=tolerance) | Q(drift__lte=-tolerance))
+
+            if options['dry_run']:
+                self.stdout.write(f"{label}: {drifted.count()} row(s) drifted")
+                continue
+
+            with transaction.atomic():
+                fixed = model.objects.filter(pk__in=drifted.values('pk')).update(**{field: expected})
+            repaired += fixed
+            self.stdout.write(f"{label}: repaired {fixed} row(s)")
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Repaired {repaired} counter(s)"))
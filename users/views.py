@@ -1,6 +1,5 @@
 import csv
 from datetime import datetime
-from decimal import Decimal
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
@@ -13,9 +12,14 @@ from django.views.decorators.http import require_http_methods
 
 from users.models import User
 from posts.models import Post
+from products.ledger import vendor_balance
 from products.models import Purchase
-from authentication.utils import generate_csv_report, generate_pdf_report, get_token_user
+from products.statistics import compute_statistics
+from authentication.utils import (
+    CSV_EXPORT_CHUNK_SIZE, generate_csv_report, get_token_user, stream_csv_report
+)
 from authentication.serializers_helpers import serialize_purchase, serialize_user
+from authentication.reports import data_version, request_pdf_report
 
 @login_required
 def purchase_history(request):
@@ -24,39 +28,65 @@ def purchase_history(request):
     
     # Check if export is requested
     export_format = request.GET.get('export')
-    if export_format in ['csv', 'pdf']:
-        # Prepare data for export
+    if export_format == 'csv':
+        # Stream straight from the database instead of building the whole history in memory
         headers = ['Order ID', 'Product', 'Seller', 'Date', 'Price', 'Status', 'Quantity', 'Delivery Method']
-        data = []
-        
-        for purchase in purchases:
-            data.append([
-                purchase.order_id,
-                purchase.product.title,
-                f"{purchase.product.user.first_name} {purchase.product.user.last_name}",
-                purchase.created_at.strftime('%Y-%m-%d %H:%M'),
-                f"RWF {purchase.purchase_price:,.1f}",
-                purchase.status.title(),
-                purchase.quantity,
-                purchase.delivery_method.title()
-            ])
-        
-        # Summary data for PDF
-        summary_data = {
-            'Total Purchases': purchases.count(),
-            'Total Spent': f"RWF {(purchases.aggregate(total=Sum('purchase_price'))['total'] or 0):,.1f}",
-            'Completed Orders': purchases.filter(status='completed').count(),
-            'Pending Orders': purchases.filter(status__in=['pending', 'processing']).count(),
-            'Report Generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        
+        rows = purchases.values_list(
+            'order_id', 'product__title', 'product__user__first_name', 'product__user__last_name',
+            'created_at', 'purchase_price', 'status', 'quantity', 'delivery_method'
+        ).iterator(chunk_size=CSV_EXPORT_CHUNK_SIZE)
         filename = f"purchase_history_{request.user.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        title = f"Purchase History Report - {request.user.get_full_name() or request.user.username}"
+        return stream_csv_report(
+            (
+                [
+                    order_id,
+                    title,
+                    f"{first_name} {last_name}",
+                    created_at.strftime('%Y-%m-%d %H:%M'),
+                    f"RWF {price:,.1f}",
+                    status.title(),
+                    quantity,
+                    delivery_method.title()
+                ]
+                for order_id, title, first_name, last_name, created_at, price, status, quantity, delivery_method in rows
+            ),
+            filename,
+            headers
+        )
+    elif export_format == 'pdf':
+        def build():
+            # Prepare data for export
+            headers = ['Order ID', 'Product', 'Seller', 'Date', 'Price', 'Status', 'Quantity', 'Delivery Method']
+            data = []
+            
+            for purchase in purchases.select_related('product', 'product__user'):
+                data.append([
+                    purchase.order_id,
+                    purchase.product.title,
+                    f"{purchase.product.user.first_name} {purchase.product.user.last_name}",
+                    purchase.created_at.strftime('%Y-%m-%d %H:%M'),
+                    f"RWF {purchase.purchase_price:,.1f}",
+                    purchase.status.title(),
+                    purchase.quantity,
+                    purchase.delivery_method.title()
+                ])
+            
+            # Summary data for PDF
+            summary_data = {
+                'Total Purchases': purchases.count(),
+                'Total Spent': f"RWF {(purchases.aggregate(total=Sum('purchase_price'))['total'] or 0):,.1f}",
+                'Completed Orders': purchases.filter(status='completed').count(),
+                'Pending Orders': purchases.filter(status__in=['pending', 'processing']).count(),
+                'Report Generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+            
+            filename = f"purchase_history_{request.user.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            title = f"Purchase History Report - {request.user.get_full_name() or request.user.username}"
+            
+            return {'data': data, 'filename': filename, 'title': title, 'headers': headers, 'summary_data': summary_data}
         
-        if export_format == 'csv':
-            return generate_csv_report(data, filename, headers)
-        elif export_format == 'pdf':
-            return generate_pdf_report(data, filename, title, headers, summary_data)
+        # Rendered in the background; unchanged history reuses the last file
+        return request_pdf_report(request.user, 'purchase_history', data_version(purchases), build)
     
     context = {
         'purchases': purchases
@@ -193,20 +223,7 @@ def vendor_dashboard_api(request):
         # Get purchases for vendor's products
         purchases = Purchase.objects.filter(product__user=user)
         
-        # Calculate statistics
-        completed_purchases = purchases.filter(status='completed')
-        total_sales = completed_purchases.count()
-        total_revenue = float(user.total_sales) if user.total_sales else 0.0
-        
-        # Monthly statistics
-        current_month = timezone.now().month
-        current_year = timezone.now().year
-        monthly_purchases = completed_purchases.filter(
-            pickup_confirmed_at__month=current_month,
-            pickup_confirmed_at__year=current_year
-        )
-        monthly_revenue = float(monthly_purchases.aggregate(total=Sum('vendor_payment_amount'))['total'] or 0)
-        monthly_sales = monthly_purchases.count()
+        stats = compute_statistics('vendor', user)
         
         # Get recent purchases
         recent_purchases = purchases.order_by('-created_at')[:10]
@@ -223,10 +240,11 @@ def vendor_dashboard_api(request):
                 'vendor': serialize_user(user),
                 'statistics': {
                     'total_products': products.count(),
-                    'total_sales': total_sales,
-                    'total_revenue': total_revenue,
-                    'monthly_revenue': monthly_revenue,
-                    'monthly_sales': monthly_sales,
+                    'total_sales': stats['total_sales_count'],
+                    'total_revenue': float(stats['total_revenue']),
+                    'monthly_revenue': float(stats['monthly_revenue']),
+                    'monthly_sales': stats['monthly_sales_count'],
+                    'outstanding_balance': float(vendor_balance(user)),
                 },
                 'products': products_data,
                 'recent_purchases': recent_purchases_data,
@@ -503,21 +521,10 @@ def sales_statistics(request):
         ).select_related('product', 'buyer')
         
         # Calculate vendor statistics
-        total_sales = purchases.count()
-        total_revenue = purchases.aggregate(
-            total=Sum('vendor_payment_amount')
-        )['total'] or 0
-        
-        # Monthly statistics
-        current_month = timezone.now().month
-        current_year = timezone.now().year
-        monthly_purchases = purchases.filter(
-            pickup_confirmed_at__month=current_month,
-            pickup_confirmed_at__year=current_year
-        )
-        monthly_revenue = monthly_purchases.aggregate(
-            total=Sum('vendor_payment_amount')
-        )['total'] or 0
+        stats = compute_statistics('vendor', request.user)
+        total_sales = stats['total_sales_count']
+        total_revenue = stats['total_revenue']
+        monthly_revenue = stats['monthly_revenue']
         
         # Product-wise breakdown
         product_stats = purchases.values('product__title').annotate(
@@ -533,43 +540,48 @@ def sales_statistics(request):
         if export_format in ['csv', 'pdf']:
             if export_format == 'csv':
                 headers = ['Product', 'Total Sales', 'Total Revenue', 'Average Price']
-                data = []
-                for product in product_stats:
-                    data.append([
+                rows = (
+                    [
                         product['product__title'],
                         product['total_sales'],
                         f"RWF {product['total_revenue']:,.1f}",
                         f"RWF {product['avg_price']:,.1f}"
-                    ])
+                    ]
+                    for product in product_stats.iterator(chunk_size=CSV_EXPORT_CHUNK_SIZE)
+                )
                 filename = f"vendor_sales_{request.user.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                return generate_csv_report(data, filename, headers)
+                return stream_csv_report(rows, filename, headers)
             elif export_format == 'pdf':
-                headers = ['Product', 'Total Sales', 'Total Revenue', 'Average Price']
-                data = []
-                for product in product_stats:
-                    data.append([
-                        product['product__title'],
-                        product['total_sales'],
-                        f"RWF {product['total_revenue']:,.1f}",
-                        f"RWF {product['avg_price']:,.1f}"
-                    ])
-                summary_data = {
-                    'Total Sales': total_sales,
-                    'Total Revenue': f"RWF {total_revenue:,.1f}",
-                    'Monthly Revenue': f"RWF {monthly_revenue:,.1f}",
-                    'Commission Rate': '80%',
-                    'Report Generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
-                filename = f"vendor_sales_{request.user.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                title = f"Vendor Sales Report - {request.user.get_full_name() or request.user.username}"
-                return generate_pdf_report(data, filename, title, headers, summary_data)
+                def build():
+                    headers = ['Product', 'Total Sales', 'Total Revenue', 'Average Price']
+                    data = []
+                    for product in product_stats:
+                        data.append([
+                            product['product__title'],
+                            product['total_sales'],
+                            f"RWF {product['total_revenue']:,.1f}",
+                            f"RWF {product['avg_price']:,.1f}"
+                        ])
+                    summary_data = {
+                        'Total Sales': total_sales,
+                        'Total Revenue': f"RWF {total_revenue:,.1f}",
+                        'Monthly Revenue': f"RWF {monthly_revenue:,.1f}",
+                        'Commission Rate': '80%',
+                        'Report Generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    }
+                    filename = f"vendor_sales_{request.user.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                    title = f"Vendor Sales Report - {request.user.get_full_name() or request.user.username}"
+                    return {'data': data, 'filename': filename, 'title': title, 'headers': headers, 'summary_data': summary_data}
+                
+                version = data_version(purchases, timezone.localdate().strftime('%Y-%m'))
+                return request_pdf_report(request.user, 'vendor_sales', version, build)
         
         context = {
             'user_type': 'vendor',
             'total_sales': total_sales,
             'total_revenue': total_revenue,
             'monthly_revenue': monthly_revenue,
-            'monthly_sales': monthly_purchases.count(),
+            'monthly_sales': stats['monthly_sales_count'],
             'product_stats': product_stats,
             'recent_transactions': recent_transactions,
             'commission_rate': 80,  # Vendor gets 80%
@@ -584,31 +596,16 @@ def sales_statistics(request):
         ).select_related('product', 'buyer', 'product__user')
         
         # Calculate agaseke statistics
-        total_transactions = purchases.count()
-        total_commission = purchases.aggregate(
-            total=Sum('agaseke_commission_amount')
-        )['total'] or 0
-        
-        # Monthly statistics
-        current_month = timezone.now().month
-        current_year = timezone.now().year
-        monthly_purchases = purchases.filter(
-            pickup_confirmed_at__month=current_month,
-            pickup_confirmed_at__year=current_year
-        )
-        monthly_commission = monthly_purchases.aggregate(
-            total=Sum('agaseke_commission_amount')
-        )['total'] or 0
+        stats = compute_statistics('agaseke', request.user)
+        total_transactions = stats['total_sales_count']
+        total_commission = stats['total_commission']
+        monthly_commission = stats['monthly_commission']
         
         # Breakdown by commission type
-        total_product_price = purchases.aggregate(total=Sum('purchase_price'))['total'] or 0
-        total_delivery_fees = purchases.aggregate(total=Sum('delivery_fee'))['total'] or 0
-        total_commission_amount = purchases.aggregate(total=Sum('agaseke_commission_amount'))['total'] or 0
-        
         commission_breakdown = {
-            'product_commission': total_product_price * Decimal('0.2'),
-            'delivery_fees': total_delivery_fees,
-            'total_commission': total_commission_amount
+            'product_commission': stats['commission_breakdown']['product_commission'],
+            'delivery_fees': stats['total_delivery_fees'],
+            'total_commission': total_commission
         }
         
         # Vendor-wise breakdown - get unique vendors with their stats
@@ -650,32 +647,36 @@ def sales_statistics(request):
                 filename = f"agaseke_commission_{request.user.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
                 return generate_csv_report(data, filename, headers)
             elif export_format == 'pdf':
-                headers = ['Vendor', 'Transactions', 'Total Commission', 'Average Commission']
-                data = []
-                for vendor in vendor_stats:
-                    data.append([
-                        vendor['vendor_username'],
-                        vendor['total_transactions'],
-                        f"RWF {vendor['total_commission']:,.1f}",
-                        f"RWF {vendor['avg_commission']:,.1f}"
-                    ])
-                summary_data = {
-                    'Total Transactions': total_transactions,
-                    'Total Commission': f"RWF {total_commission:,.1f}",
-                    'Monthly Commission': f"RWF {monthly_commission:,.1f}",
-                    'Commission Rate': '20% + Delivery Fees',
-                    'Report Generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
-                filename = f"agaseke_commission_{request.user.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                title = f"agaseke Commission Report - {request.user.get_full_name() or request.user.username}"
-                return generate_pdf_report(data, filename, title, headers, summary_data)
+                def build():
+                    headers = ['Vendor', 'Transactions', 'Total Commission', 'Average Commission']
+                    data = []
+                    for vendor in vendor_stats:
+                        data.append([
+                            vendor['vendor_username'],
+                            vendor['total_transactions'],
+                            f"RWF {vendor['total_commission']:,.1f}",
+                            f"RWF {vendor['avg_commission']:,.1f}"
+                        ])
+                    summary_data = {
+                        'Total Transactions': total_transactions,
+                        'Total Commission': f"RWF {total_commission:,.1f}",
+                        'Monthly Commission': f"RWF {monthly_commission:,.1f}",
+                        'Commission Rate': '20% + Delivery Fees',
+                        'Report Generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    }
+                    filename = f"agaseke_commission_{request.user.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                    title = f"agaseke Commission Report - {request.user.get_full_name() or request.user.username}"
+                    return {'data': data, 'filename': filename, 'title': title, 'headers': headers, 'summary_data': summary_data}
+                
+                version = data_version(purchases, timezone.localdate().strftime('%Y-%m'))
+                return request_pdf_report(request.user, 'agaseke_commission', version, build)
         
         context = {
             'user_type': 'agaseke',
             'total_transactions': total_transactions,
             'total_commission': total_commission,
             'monthly_commission': monthly_commission,
-            'monthly_transactions': monthly_purchases.count(),
+            'monthly_transactions': stats['monthly_sales_count'],
             'commission_breakdown': commission_breakdown,
             'vendor_stats': vendor_stats,
             'recent_transactions': recent_transactions,
@@ -690,51 +691,65 @@ def sales_statistics(request):
             status='completed'
         ).select_related('product', 'product__user')
         
-        total_spent = purchases.aggregate(
-            total=Sum('purchase_price')
-        )['total'] or 0
-        
-        monthly_purchases = purchases.filter(
-            created_at__month=timezone.now().month,
-            created_at__year=timezone.now().year
-        )
-        monthly_spent = monthly_purchases.aggregate(
-            total=Sum('purchase_price')
-        )['total'] or 0
+        stats = compute_statistics('buyer', request.user)
+        total_spent = stats['total_product_amount']
+        monthly_spent = stats['monthly_product_amount']
         
         # Handle export for customer
         if export_format in ['csv', 'pdf']:
             headers = ['Product', 'Seller', 'Date', 'Price', 'Status']
-            data = []
-            for purchase in purchases:
-                data.append([
-                    purchase.product.title,
-                    f"{purchase.product.user.first_name} {purchase.product.user.last_name}",
-                    purchase.created_at.strftime('%Y-%m-%d %H:%M'),
-                    f"RWF {purchase.purchase_price:,.1f}",
-                    purchase.status.title()
-                ])
             
             if export_format == 'csv':
+                rows = purchases.values_list(
+                    'product__title', 'product__user__first_name', 'product__user__last_name',
+                    'created_at', 'purchase_price', 'status'
+                ).iterator(chunk_size=CSV_EXPORT_CHUNK_SIZE)
                 filename = f"customer_purchases_{request.user.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                return generate_csv_report(data, filename, headers)
+                return stream_csv_report(
+                    (
+                        [
+                            title,
+                            f"{first_name} {last_name}",
+                            created_at.strftime('%Y-%m-%d %H:%M'),
+                            f"RWF {price:,.1f}",
+                            status.title()
+                        ]
+                        for title, first_name, last_name, created_at, price, status in rows
+                    ),
+                    filename,
+                    headers
+                )
             elif export_format == 'pdf':
-                summary_data = {
-                    'Total Purchases': purchases.count(),
-                    'Total Spent': f"RWF {total_spent:,.1f}",
-                    'Monthly Spent': f"RWF {monthly_spent:,.1f}",
-                    'Report Generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
-                filename = f"customer_purchases_{request.user.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                title = f"Customer Purchase Report - {request.user.get_full_name() or request.user.username}"
-                return generate_pdf_report(data, filename, title, headers, summary_data)
+                def build():
+                    data = []
+                    for purchase in purchases:
+                        data.append([
+                            purchase.product.title,
+                            f"{purchase.product.user.first_name} {purchase.product.user.last_name}",
+                            purchase.created_at.strftime('%Y-%m-%d %H:%M'),
+                            f"RWF {purchase.purchase_price:,.1f}",
+                            purchase.status.title()
+                        ])
+
+                    summary_data = {
+                        'Total Purchases': stats['total_sales_count'],
+                        'Total Spent': f"RWF {total_spent:,.1f}",
+                        'Monthly Spent': f"RWF {monthly_spent:,.1f}",
+                        'Report Generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    }
+                    filename = f"customer_purchases_{request.user.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                    title = f"Customer Purchase Report - {request.user.get_full_name() or request.user.username}"
+                    return {'data': data, 'filename': filename, 'title': title, 'headers': headers, 'summary_data': summary_data}
+                
+                version = data_version(purchases, timezone.localdate().strftime('%Y-%m'))
+                return request_pdf_report(request.user, 'customer_purchases', version, build)
         
         context = {
             'user_type': 'customer',
-            'total_purchases': purchases.count(),
+            'total_purchases': stats['total_sales_count'],
             'total_spent': total_spent,
             'monthly_spent': monthly_spent,
-            'monthly_purchases': monthly_purchases.count(),
+            'monthly_purchases': stats['monthly_sales_count'],
             'recent_transactions': purchases.order_by('-created_at')[:10],
         }
     
@@ -757,21 +772,7 @@ def vendor_statistics_for_agaseke(request, vendor_id):
     ).select_related('product', 'buyer', 'agaseke_user')
     
     # Calculate vendor statistics (as if agaseke is viewing the vendor's dashboard)
-    total_sales = purchases.count()
-    total_revenue = purchases.aggregate(
-        total=Sum('vendor_payment_amount')
-    )['total'] or 0
-    
-    # Monthly statistics
-    current_month = timezone.now().month
-    current_year = timezone.now().year
-    monthly_purchases = purchases.filter(
-        pickup_confirmed_at__month=current_month,
-        pickup_confirmed_at__year=current_year
-    )
-    monthly_revenue = monthly_purchases.aggregate(
-        total=Sum('vendor_payment_amount')
-    )['total'] or 0
+    stats = compute_statistics('vendor', vendor)
     
     # Product-wise breakdown
     product_stats = purchases.values('product__title').annotate(
@@ -780,42 +781,20 @@ def vendor_statistics_for_agaseke(request, vendor_id):
         avg_price=Avg('vendor_payment_amount')
     ).order_by('-total_revenue')
     
-    # agaseke commission from this vendor
-    agaseke_commission = purchases.aggregate(
-        total=Sum('agaseke_commission_amount')
-    )['total'] or 0
-    
-    # Monthly agaseke commission
-    monthly_agaseke_commission = monthly_purchases.aggregate(
-        total=Sum('agaseke_commission_amount')
-    )['total'] or 0
-    
     # Recent transactions
     recent_transactions = purchases.order_by('-pickup_confirmed_at')[:10]
     
-    # Commission breakdown
-    total_product_price = purchases.aggregate(total=Sum('purchase_price'))['total'] or 0
-    total_delivery_fees = purchases.aggregate(total=Sum('delivery_fee'))['total'] or 0
-    
-    commission_breakdown = {
-        'vendor_earnings': total_revenue,
-        'agaseke_commission': agaseke_commission,
-        'product_commission': total_product_price * Decimal('0.2'),
-        'delivery_fees': total_delivery_fees,
-        'total_transaction_value': total_product_price + total_delivery_fees
-    }
-    
     context = {
         'vendor': vendor,
-        'total_sales': total_sales,
-        'total_revenue': total_revenue,
-        'monthly_revenue': monthly_revenue,
-        'monthly_sales': monthly_purchases.count(),
+        'total_sales': stats['total_sales_count'],
+        'total_revenue': stats['total_revenue'],
+        'monthly_revenue': stats['monthly_revenue'],
+        'monthly_sales': stats['monthly_sales_count'],
         'product_stats': product_stats,
         'recent_transactions': recent_transactions,
-        'agaseke_commission': agaseke_commission,
-        'monthly_agaseke_commission': monthly_agaseke_commission,
-        'commission_breakdown': commission_breakdown,
+        'agaseke_commission': stats['total_commission'],
+        'monthly_agaseke_commission': stats['monthly_commission'],
+        'commission_breakdown': stats['commission_breakdown'],
         'commission_rate': 80,  # Vendor gets 80%
         'agaseke_rate': 20,   # agaseke gets 20%
     }